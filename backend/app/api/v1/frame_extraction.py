@@ -10,7 +10,6 @@ from typing import Dict, List, Optional
 from fastapi import APIRouter, HTTPException, BackgroundTasks, Query
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-import json
 
 from app.services.frame_extraction import (
     extract_frames_from_stream,
@@ -19,6 +18,8 @@ from app.services.frame_extraction import (
     get_extraction_status,
     FrameExtractionError
 )
+from app.services.frame_delta import FrameDeltaEncoder
+from app.core.serialization import dumps_json
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/frame-extraction", tags=["Frame Extraction"])
@@ -31,6 +32,15 @@ class FrameExtractionConfig(BaseModel):
     enhance_frames: bool = Field(default=True, description="Apply frame enhancement for better AI analysis")
     save_frames: bool = Field(default=False, description="Save frames to disk")
     extract_features: bool = Field(default=True, description="Extract frame features for analysis")
+    include_timings: bool = Field(default=False, description="Attach per-stage timings (ms) to each frame")
+    detect_objects: bool = Field(default=False, description="Run batched object detection on each frame")
+    track_objects: bool = Field(default=False, description="Link detections across frames into tracks (needs detect_objects)")
+    motion_regions: bool = Field(default=False, description="Run features and detection on the changed region only")
+    skip_static_frames: bool = Field(default=False, description="Drop frames without motion (needs motion_regions)")
+    decoder: Optional[str] = Field(default=None, description="Decoder backend (opencv or ffmpeg), defaults to the server setting")
+    encode_format: Optional[str] = Field(default=None, pattern="^(jpeg|webp)$", description="Frame payload format, defaults to the server setting")
+    encode_quality: Optional[int] = Field(default=None, ge=1, le=100, description="Payload quality, or its ceiling when encode_target_bytes is set")
+    encode_target_bytes: Optional[int] = Field(default=None, ge=0, description="Per-frame payload size target in bytes (0 disables)")
 
 class FrameExtractionRequest(BaseModel):
     """Request model for starting frame extraction"""
@@ -50,15 +60,23 @@ class FrameData(BaseModel):
     frame_number: int
     timestamp: str
     frame_base64: str
+    frame_encoding: Optional[Dict] = None
     frame_path: Optional[str]
     features: Dict
     processing_config: Dict
+    timings: Optional[Dict[str, float]] = None
+    detections: Optional[List[Dict]] = None
+    tracks: Optional[List[Dict]] = None
+    motion: Optional[Dict] = None
 
 class ExtractionStatus(BaseModel):
     """Response model for extraction status"""
     active_extractions: int
     cached_frames: int
     extraction_ids: List[str]
+    stage_timings: Dict[str, Dict[str, Dict[str, float]]] = Field(
+        default_factory=dict, description="Rolling per-stage timing percentiles (ms) per stream"
+    )
 
 # Global storage for active extraction tasks
 active_extraction_tasks: Dict[str, asyncio.Task] = {}
@@ -218,7 +236,8 @@ async def stream_frames(
     stream_url: str = Query(..., description="URL of the video stream"),
     interval_seconds: float = Query(default=2.0, ge=0.1, le=60.0, description="Interval between frames"),
     max_frames: int = Query(default=100, ge=1, le=1000, description="Maximum frames to stream"),
-    enhance_frames: bool = Query(default=True, description="Apply frame enhancement")
+    enhance_frames: bool = Query(default=True, description="Apply frame enhancement"),
+    compact: bool = Query(default=False, description="Send a header event followed by quantized feature deltas")
 ):
     """
     Stream frames from a video source in real-time
@@ -229,6 +248,9 @@ async def stream_frames(
         interval_seconds: Interval between frame extractions
         max_frames: Maximum number of frames to stream
         enhance_frames: Whether to apply frame enhancement
+        compact: Send static fields once in an `event: header` and then
+            `event: frame` deltas with only the changed feature values
+            (see app.services.frame_delta)
         
     Returns:
         Server-sent events stream of frame data
@@ -248,20 +270,27 @@ async def stream_frames(
         
         async def generate_frame_stream():
             """Generate server-sent events for frame data"""
+            encoder = FrameDeltaEncoder(stream_id, config) if compact else None
             try:
                 async for frame_data in extract_frames_from_stream(stream_url, stream_id, config):
+                    if encoder is not None:
+                        if encoder.started is None:
+                            yield f"event: header\ndata: {dumps_json(encoder.header(frame_data))}\n\n"
+                        yield f"event: frame\ndata: {dumps_json(encoder.encode(frame_data))}\n\n"
+                        continue
+                    
                     # Remove base64 data for streaming to reduce bandwidth
                     stream_data = frame_data.copy()
                     stream_data.pop('frame_base64', None)
                     
                     # Format as server-sent event
-                    yield f"data: {json.dumps(stream_data)}\n\n"
+                    yield f"data: {dumps_json(stream_data)}\n\n"
                     
             except Exception as e:
                 logger.error(f"Frame streaming error: {e}")
-                yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+                yield f"event: error\ndata: {dumps_json({'error': str(e)})}\n\n"
             finally:
-                yield f"event: end\ndata: {json.dumps({'message': 'Stream ended'})}\n\n"
+                yield f"event: end\ndata: {dumps_json({'message': 'Stream ended'})}\n\n"
         
         return StreamingResponse(
             generate_frame_stream(),
@@ -4,13 +4,24 @@ Video Proxy API
 Handles proxying video streams and segments to bypass CORS restrictions
 """
 
-import aiohttp
 import asyncio
+import time
+from datetime import datetime
+from typing import TYPE_CHECKING, Optional
 from fastapi import APIRouter, Request, Response, HTTPException, Query
 from fastapi.responses import StreamingResponse
 from urllib.parse import unquote
 from loguru import logger
 
+from ...core.config import settings
+from ...core.metrics import PROXY_UPSTREAM_TTFB, PROXY_UPSTREAM_BYTES, PROXY_UPSTREAM_ERRORS
+from ...services.stream_refresher import stream_refresher
+from ...services.youtube_service import hls_url_expiry, hls_url_video_id, is_hls_manifest_url
+
+# aiohttp is imported by the handlers on first use; it is one of the slowest imports at boot
+if TYPE_CHECKING:
+    import aiohttp
+
 router = APIRouter(tags=["Video Proxy"])
 
 
@@ -32,31 +43,165 @@ YOUTUBE_HEADERS = {
 }
 
 
-async def stream_content(session: aiohttp.ClientSession, url: str):
+async def renew_manifest_url(url: str, stream_id: Optional[str] = None, rejected: bool = False) -> str:
+    """
+    Swap a googlevideo manifest URL for a fresh one when it is expiring or was rejected
+    
+    Renewals are coalesced per stream by the refresh scheduler, so a burst of
+    players hitting an expiring manifest results in a single yt-dlp extraction.
+    """
+    if not is_hls_manifest_url(url):
+        return url
+    
+    video_id = stream_id or hls_url_video_id(url)
+    if not video_id:
+        return url
+    
+    if not rejected:
+        expires_at = hls_url_expiry(url)
+        if expires_at is None or (expires_at - datetime.now()).total_seconds() > settings.hls_renewal_margin:
+            return url
+    
+    try:
+        renewed = await stream_refresher.renew_hls_url(video_id, stale_url=url)
+    except Exception as e:
+        logger.error(f"Failed to renew manifest for stream {video_id}: {e}")
+        return url
+    
+    if renewed and renewed != url:
+        logger.debug(f"Serving renewed manifest URL for stream {video_id}")
+        return renewed
+    return url
+
+
+# Background renewals; referenced here so they aren't garbage-collected mid-flight
+_renewal_tasks: set = set()
+
+
+def trigger_segment_renewal(url: str, stream_id: Optional[str] = None):
+    """Start renewing a stream's manifest in the background after a rejected segment"""
+    video_id = stream_id or hls_url_video_id(url)
+    if video_id:
+        task = asyncio.create_task(renew_manifest_url_for_stream(video_id))
+        _renewal_tasks.add(task)
+        task.add_done_callback(_renewal_tasks.discard)
+
+
+async def renew_manifest_url_for_stream(video_id: str):
+    """Renew a stream's manifest URL, logging instead of raising"""
+    try:
+        # A rejected segment means the URL was revoked, even if it isn't near its expiry
+        await stream_refresher.renew_hls_url(video_id, force=True)
+    except Exception as e:
+        logger.error(f"Background manifest renewal failed for stream {video_id}: {e}")
+
+
+async def fetch_manifest(url: str, stream_id: Optional[str] = None) -> Response:
+    """
+    Fetch a playlist, re-resolving the stream once if googlevideo rejects it
+    
+    Transport errors and timeouts are retried with backoff, then reported
+    as 502/504 rather than surfacing as a bare 500.
+    """
+    import aiohttp
+
+    url = await renew_manifest_url(url, stream_id)
+    timeout = aiohttp.ClientTimeout(total=30, connect=10)
+    max_retries = 3
+    retry_delay = 1
+    renewed_once = False
+    
+    async with aiohttp.ClientSession(timeout=timeout, headers=YOUTUBE_HEADERS) as session:
+        attempt = 0
+        while True:
+            attempt += 1
+            start = time.perf_counter()
+            try:
+                async with session.get(url) as response:
+                    PROXY_UPSTREAM_TTFB.labels(kind='manifest').observe(time.perf_counter() - start)
+                    status = response.status
+                    if status == 200:
+                        content = await response.read()
+                        PROXY_UPSTREAM_BYTES.labels(kind='manifest').inc(len(content))
+                        break
+            except asyncio.TimeoutError:
+                PROXY_UPSTREAM_ERRORS.labels(kind='manifest', status='timeout').inc()
+                logger.warning(f"Timeout fetching playlist (attempt {attempt}/{max_retries})")
+                if attempt >= max_retries:
+                    raise HTTPException(status_code=504, detail="Timed out fetching playlist")
+                await asyncio.sleep(retry_delay * attempt)
+                continue
+            except aiohttp.ClientError as e:
+                PROXY_UPSTREAM_ERRORS.labels(kind='manifest', status='error').inc()
+                logger.warning(f"Error fetching playlist (attempt {attempt}/{max_retries}): {e}")
+                if attempt >= max_retries:
+                    raise HTTPException(status_code=502, detail=f"Failed to fetch playlist: {e}")
+                await asyncio.sleep(retry_delay * attempt)
+                continue
+            
+            PROXY_UPSTREAM_ERRORS.labels(kind='manifest', status=str(status)).inc()
+            
+            if status == 403 and not renewed_once:
+                renewed_once = True
+                renewed = await renew_manifest_url(url, stream_id, rejected=True)
+                if renewed != url:
+                    url = renewed
+                    continue
+            
+            logger.error(f"Failed to fetch playlist: HTTP {status}")
+            raise HTTPException(status_code=status, detail="Failed to fetch playlist")
+    
+    headers = {
+        'Content-Type': 'application/vnd.apple.mpegurl',
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Allow-Methods': 'GET, OPTIONS',
+        'Access-Control-Allow-Headers': '*',
+        'Cache-Control': 'no-cache'
+    }
+    return Response(content=content, media_type='application/vnd.apple.mpegurl', headers=headers)
+
+
+async def stream_content(session: "aiohttp.ClientSession", url: str):
     """Stream content from URL with error handling"""
+    import aiohttp
+
     try:
+        start = time.perf_counter()
         async with session.get(url, headers=YOUTUBE_HEADERS, timeout=aiohttp.ClientTimeout(total=30)) as response:
+            PROXY_UPSTREAM_TTFB.labels(kind='segment').observe(time.perf_counter() - start)
             if response.status != 200:
                 logger.error(f"Failed to fetch {url}: HTTP {response.status}")
+                PROXY_UPSTREAM_ERRORS.labels(kind='segment', status=str(response.status)).inc()
                 return
             
             async for chunk in response.content.iter_chunked(8192):
+                PROXY_UPSTREAM_BYTES.labels(kind='segment').inc(len(chunk))
                 yield chunk
                 
     except asyncio.TimeoutError:
         logger.error(f"Timeout fetching {url}")
+        PROXY_UPSTREAM_ERRORS.labels(kind='segment', status='timeout').inc()
         return
     except Exception as e:
         logger.error(f"Error streaming {url}: {e}")
+        PROXY_UPSTREAM_ERRORS.labels(kind='segment', status='error').inc()
         return
 
 
 @router.get("/proxy/video/")
 @router.head("/proxy/video/")
-async def proxy_video_with_query(url: str = Query(..., description="URL to proxy")):
+async def proxy_video_with_query(
+    url: str = Query(..., description="URL to proxy"),
+    stream_id: Optional[str] = Query(None, description="Stream the URL belongs to, used for manifest renewal")
+):
     """
     Proxy video segments using query parameter (preferred method for frontend)
     """
+    if is_hls_manifest_url(url):
+        return await fetch_manifest(url, stream_id)
+    
+    import aiohttp
+    
     max_retries = 3
     retry_delay = 1
     
@@ -110,13 +255,20 @@ async def proxy_video_with_query(url: str = Query(..., description="URL to proxy
                             timeout=stream_timeout,
                             headers=YOUTUBE_HEADERS
                         ) as stream_session:
+                            start = time.perf_counter()
                             async with stream_session.get(url) as response:
+                                PROXY_UPSTREAM_TTFB.labels(kind='segment').observe(time.perf_counter() - start)
+                                if response.status != 200:
+                                    PROXY_UPSTREAM_ERRORS.labels(kind='segment', status=str(response.status)).inc()
+                                
                                 if response.status == 200:
                                     logger.debug(f"Successfully fetching segment: {response.status}")
                                     async for chunk in response.content.iter_chunked(8192):
+                                        PROXY_UPSTREAM_BYTES.labels(kind='segment').inc(len(chunk))
                                         yield chunk
                                 elif response.status == 403:
                                     logger.error(f"Access forbidden (403) for URL: {url}")
+                                    trigger_segment_renewal(url, stream_id)
                                     # Return empty stream to avoid breaking the video player
                                     return
                                 elif response.status == 404:
@@ -127,6 +279,7 @@ async def proxy_video_with_query(url: str = Query(..., description="URL to proxy
                                     return
                     except Exception as stream_error:
                         logger.error(f"Error in stream generation: {stream_error}")
+                        PROXY_UPSTREAM_ERRORS.labels(kind='segment', status='error').inc()
                         return
                 
                 # Set enhanced response headers
@@ -163,6 +316,8 @@ async def proxy_video_segment(path: str, request: Request):
     """
     Proxy video segments (.ts files) from YouTube with proper headers (legacy path-based method)
     """
+    import aiohttp
+    
     try:
         # Decode the URL-encoded path
         decoded_path = unquote(path)
@@ -209,7 +364,11 @@ async def proxy_video_segment(path: str, request: Request):
 
 
 @router.get("/proxy/playlist/{path:path}")
-async def proxy_playlist(path: str, request: Request):
+async def proxy_playlist(
+    path: str,
+    request: Request,
+    stream_id: Optional[str] = Query(None, description="Stream the playlist belongs to, used for renewal")
+):
     """
     Proxy playlist files (.m3u8) from YouTube with proper headers
     """
@@ -218,33 +377,7 @@ async def proxy_playlist(path: str, request: Request):
         decoded_path = unquote(path)
         logger.info(f"Proxying playlist: {decoded_path}")
         
-        # Create aiohttp session
-        connector = aiohttp.TCPConnector(limit=100, limit_per_host=10)
-        timeout = aiohttp.ClientTimeout(total=30, connect=10)
-        
-        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
-            async with session.get(decoded_path, headers=YOUTUBE_HEADERS) as response:
-                if response.status != 200:
-                    logger.error(f"Failed to fetch playlist: HTTP {response.status}")
-                    raise HTTPException(status_code=response.status, detail="Failed to fetch playlist")
-                
-                # Read the playlist content
-                content = await response.text()
-                
-                # Set proper headers for m3u8 content
-                headers = {
-                    'Content-Type': 'application/vnd.apple.mpegurl',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Methods': 'GET, OPTIONS',
-                    'Access-Control-Allow-Headers': '*',
-                    'Cache-Control': 'no-cache'
-                }
-                
-                return StreamingResponse(
-                    iter([content.encode()]),
-                    media_type='application/vnd.apple.mpegurl',
-                    headers=headers
-                )
+        return await fetch_manifest(decoded_path, stream_id)
                 
     except HTTPException:
         raise
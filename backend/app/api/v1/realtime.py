@@ -0,0 +1,89 @@
+import asyncio
+from typing import Any, Dict, List
+
+from fastapi import APIRouter, Query, WebSocket, WebSocketDisconnect
+from loguru import logger
+
+from ...core.config import settings
+from ...core.serialization import loads_json
+from ...services.realtime_hub import RealtimeClient, available_encodings, msgpack, realtime_hub
+
+router = APIRouter(prefix="/realtime", tags=["realtime"])
+
+
+def _stream_ids(message: Dict[str, Any]) -> List[str]:
+    streams = message.get('streams') or []
+    if isinstance(streams, str):
+        streams = [streams]
+    return [str(s) for s in streams]
+
+
+@router.websocket("/ws")
+async def realtime_socket(
+    websocket: WebSocket,
+    encoding: str = Query("json", description="Frame encoding: json or msgpack")
+):
+    """
+    Multiplexed push channel for detections, narration and stream status
+
+    Client operations (JSON text, or msgpack binary when encoding=msgpack):
+        {"op": "subscribe", "streams": ["id1", "id2"]}
+        {"op": "unsubscribe", "streams": ["id1"]}
+        {"op": "ping"}
+
+    Server frames are lists of messages {"t": type, "s": stream_id, "q": seq, ...}
+    where type is "d" (detections as [class, confidence %, x1, y1, x2, y2]
+    rows), "n" (narration text) or "s" (status); replies to operations are
+    single objects with an "op" field.
+    """
+    await websocket.accept()
+    if encoding not in available_encodings():
+        await websocket.send_json({'op': 'error', 'error': f"Unsupported encoding {encoding}",
+                                   'encodings': available_encodings()})
+        await websocket.close(code=1003)
+        return
+
+    client = RealtimeClient(websocket, encoding)
+    realtime_hub.register(client)
+    sender = asyncio.create_task(client.run_sender(realtime_hub.flush_interval))
+    await client.send({'op': 'hello', 'encoding': encoding, 'budget': settings.realtime_send_budget})
+
+    try:
+        while True:
+            raw = await websocket.receive()
+            if raw['type'] == 'websocket.disconnect':
+                break
+            try:
+                if raw.get('bytes') is not None and msgpack is not None:
+                    message = msgpack.unpackb(raw['bytes'], raw=False)
+                else:
+                    message = loads_json(raw.get('text') or raw.get('bytes') or b'')
+                op = message.get('op')
+            except Exception:
+                await client.send({'op': 'error', 'error': 'Malformed message'})
+                continue
+
+            if op == 'subscribe':
+                streams = _stream_ids(message)
+                if len(client.subscriptions | set(streams)) > settings.realtime_max_subscriptions:
+                    await client.send({'op': 'error', 'error': 'Too many subscriptions',
+                                       'limit': settings.realtime_max_subscriptions})
+                    continue
+                realtime_hub.subscribe(client, streams)
+                await client.send({'op': 'subscribed', 'streams': sorted(client.subscriptions)})
+            elif op == 'unsubscribe':
+                realtime_hub.unsubscribe(client, _stream_ids(message))
+                await client.send({'op': 'subscribed', 'streams': sorted(client.subscriptions)})
+            elif op == 'ping':
+                await client.send({'op': 'pong'})
+            else:
+                await client.send({'op': 'error', 'error': f"Unknown op {op}"})
+
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Realtime socket error: {e}")
+    finally:
+        sender.cancel()
+        await asyncio.gather(sender, return_exceptions=True)
+        realtime_hub.unregister(client)
@@ -1,12 +1,19 @@
-from typing import List, Optional
+from typing import Dict, List, Optional
 from fastapi import APIRouter, HTTPException, Query, BackgroundTasks
 from fastapi.responses import JSONResponse
 
 from ...models.stream import (
     StreamInfo, StreamRequest, StreamResponse, StreamListResponse,
-    StreamCategory, StreamStatus
+    StreamCategory, StreamStatus, StreamPurpose, StreamQuality, StreamVariantResponse
 )
-from ...services.youtube_service import youtube_service
+from ...services.youtube_service import default_quality, select_variant, youtube_service
+from ...services.stream_refresher import stream_refresher
+from ...services.frame_profiling import frame_profiler
+from ...services.object_detection import detection_service
+from ...services.narration import narration_scheduler
+from ...services.realtime_hub import realtime_hub
+from ...services.thumbnails import thumbnail_service
+from ...services.youtube_urls import YouTubeURL, parse_youtube_url
 from ...core.config import settings
 
 router = APIRouter(prefix="/streams", tags=["streams"])
@@ -14,6 +21,44 @@ router = APIRouter(prefix="/streams", tags=["streams"])
 # In-memory storage for demo (replace with database later)
 streams_db: List[StreamInfo] = []
 
+# Canonical source URL key -> stream ID, so channel live URLs resolve without yt-dlp.
+# Channel keys ('channel:...', 'handle:...') point at the broadcast they resolved to last.
+source_index: Dict[str, str] = {}
+
+
+def find_existing_stream(source: YouTubeURL, video_id: Optional[str] = None) -> Optional[StreamInfo]:
+    """
+    Look up an already added stream by video ID, or by the channel URL it was added from
+
+    A channel URL only matches while the broadcast it resolved to is still live; once that
+    broadcast ends the channel may be on a new one, so the URL has to be resolved again.
+    """
+    if video_id is None and source.is_video:
+        video_id = source.id
+    if video_id is not None:
+        return next((s for s in streams_db if s.id == video_id), None)
+
+    stream_id = source_index.get(source.key)
+    stream = next((s for s in streams_db if s.id == stream_id), None) if stream_id else None
+    if stream is None or stream.status != StreamStatus.LIVE:
+        return None
+    return stream
+
+
+def forget_sources(stream_id: str):
+    """Drop the source URL keys that resolve to a stream"""
+    for key in [k for k, v in source_index.items() if v == stream_id]:
+        del source_index[key]
+
+
+def duplicate_stream_response(stream: StreamInfo) -> StreamResponse:
+    return StreamResponse(
+        success=False,
+        message="Stream already exists",
+        error=f"Stream with ID {stream.id} is already in the database",
+        stream=stream
+    )
+
 
 @router.get("/", response_model=StreamListResponse)
 async def list_streams(
@@ -69,13 +114,19 @@ async def add_stream(stream_request: StreamRequest, background_tasks: Background
     """Add a new stream from YouTube URL"""
     
     # Validate YouTube URL
-    if not youtube_service.is_valid_youtube_url(str(stream_request.url)):
+    parsed_url = parse_youtube_url(str(stream_request.url))
+    if parsed_url is None:
         return StreamResponse(
             success=False,
             message="Invalid YouTube URL",
             error="The provided URL is not a valid YouTube URL"
         )
     
+    # Short-circuit duplicates before any network extraction
+    existing_stream = find_existing_stream(parsed_url)
+    if existing_stream:
+        return duplicate_stream_response(existing_stream)
+    
     try:
         # Extract metadata
         metadata = await youtube_service.get_stream_metadata(str(stream_request.url))
@@ -86,15 +137,12 @@ async def add_stream(stream_request: StreamRequest, background_tasks: Background
                 error="Could not retrieve information from the provided URL"
             )
         
-        # Check if stream already exists
-        existing_stream = next((s for s in streams_db if s.id == metadata.id), None)
+        # Check if stream already exists (channel URLs only resolve to an ID here)
+        source_index[parsed_url.key] = metadata.id
+        source_index[f"video:{metadata.id}"] = metadata.id
+        existing_stream = find_existing_stream(parsed_url, metadata.id)
         if existing_stream:
-            return StreamResponse(
-                success=False,
-                message="Stream already exists",
-                error=f"Stream with ID {metadata.id} is already in the database",
-                stream=existing_stream
-            )
+            return duplicate_stream_response(existing_stream)
         
         # Convert to StreamInfo
         category = stream_request.category
@@ -181,6 +229,14 @@ async def delete_stream(stream_id: str):
         raise HTTPException(status_code=404, detail="Stream not found")
     
     deleted_stream = streams_db.pop(stream_idx)
+    # Drop per-stream state so deleted streams don't linger in the push channel or narration
+    realtime_hub.forget(stream_id)
+    narration_scheduler.forget(stream_id)
+    forget_sources(stream_id)
+    frame_profiler.reset(stream_id)
+    detection_service.forget(stream_id)
+    youtube_service.forget(stream_id)
+    thumbnail_service.forget(stream_id)
     
     return StreamResponse(
         success=True,
@@ -225,6 +281,7 @@ async def refresh_stream(stream_id: str):
         
         # Update in database
         streams_db[stream_idx] = refreshed_stream
+        stream_refresher.schedule(refreshed_stream)
         
         return StreamResponse(
             success=True,
@@ -240,6 +297,36 @@ async def refresh_stream(stream_id: str):
         )
 
 
+@router.get("/{stream_id}/variants", response_model=StreamVariantResponse)
+async def get_stream_variant(
+    stream_id: str,
+    purpose: StreamPurpose = Query(StreamPurpose.PLAYBACK, description="What the URL will be used for"),
+    quality: Optional[StreamQuality] = Query(None, description="Defaults to best for playback, "
+                                                                 "frame_extraction_quality for analysis, low for thumbnails")
+):
+    """Pick the HLS variant for a purpose from the stream's variant ladder"""
+    stream = next((s for s in streams_db if s.id == stream_id), None)
+    if not stream:
+        raise HTTPException(status_code=404, detail="Stream not found")
+    
+    ladder = youtube_service.variant_ladders.get(stream_id)
+    if not ladder and stream.webpage_url:
+        # Not extracted since startup; fetch once to build the ladder
+        await youtube_service.get_stream_metadata(str(stream.webpage_url))
+        ladder = youtube_service.variant_ladders.get(stream_id)
+    if not ladder:
+        raise HTTPException(status_code=404, detail="No HLS variants known for this stream")
+    
+    quality = quality or default_quality(purpose)
+    return StreamVariantResponse(
+        stream_id=stream_id,
+        purpose=purpose,
+        quality=quality,
+        selected=select_variant(ladder, purpose, quality),
+        variants=ladder
+    )
+
+
 @router.get("/categories/", response_model=List[str])
 async def get_categories():
     """Get all available stream categories"""
@@ -251,9 +338,22 @@ async def bulk_add_streams(urls: List[str]):
     """Add multiple streams from a list of YouTube URLs"""
     
     results = []
+    seen_keys = set()
     
     for url in urls:
         try:
+            # Skip URLs repeated within the same request without extracting them again
+            parsed_url = parse_youtube_url(url)
+            if parsed_url is not None:
+                if parsed_url.key in seen_keys:
+                    results.append(StreamResponse(
+                        success=False,
+                        message=f"Duplicate URL in request: {url}",
+                        error=f"{parsed_url.key} was already processed in this request"
+                    ))
+                    continue
+                seen_keys.add(parsed_url.key)
+            
             stream_request = StreamRequest(url=url)
             result = await add_stream(stream_request, BackgroundTasks())
             results.append(result)
@@ -0,0 +1,96 @@
+"""
+Thumbnail API
+
+Small WebP/JPEG stream thumbnails for grid cards. The per-stream URL is
+cached briefly and revalidated with ETags; each encoded variant also has an
+immutable, content-addressed URL that can be cached for a year.
+"""
+
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query, Request, Response
+
+from ...core.config import settings
+from ...services.thumbnails import THUMBNAIL_FORMATS, THUMBNAIL_SIZES, Thumbnail, thumbnail_service
+from .streams import streams_db
+
+router = APIRouter(prefix="/thumbnails", tags=["thumbnails"])
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+_EXTENSIONS = {ext.lstrip('.'): name for name, (ext, _) in THUMBNAIL_FORMATS.items()}
+
+
+def _negotiate_format(image_format: Optional[str], accept: Optional[str]) -> str:
+    from ...services.frame_encoder import webp_supported
+    if not image_format:
+        image_format = 'webp' if accept and 'image/webp' in accept else 'jpeg'
+    # Like EncodeSpec.resolved(): WebP falls back to JPEG when OpenCV cannot write it
+    if image_format == 'webp' and not webp_supported():
+        return 'jpeg'
+    return image_format
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {tag.strip().removeprefix('W/').strip('"') for tag in if_none_match.split(',')}
+    return etag in candidates or '*' in candidates
+
+
+def _thumbnail_response(thumbnail: Thumbnail, if_none_match: Optional[str], cache_control: str,
+                        headers: Optional[dict] = None) -> Response:
+    headers = {'ETag': f'"{thumbnail.etag}"', 'Cache-Control': cache_control, **(headers or {})}
+    if _etag_matches(if_none_match, thumbnail.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=thumbnail.data, media_type=thumbnail.media_type, headers=headers)
+
+
+@router.get("/{stream_id}")
+async def get_thumbnail(
+    request: Request,
+    stream_id: str,
+    size: str = Query('medium', pattern=f"^({'|'.join(THUMBNAIL_SIZES)})$", description="Thumbnail width"),
+    image_format: Optional[str] = Query(None, alias="format", pattern=f"^({'|'.join(THUMBNAIL_FORMATS)})$",
+                                        description="Defaults to webp when the Accept header allows it"),
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None)
+):
+    """Current thumbnail of a stream, from its latest analyzed frame or the YouTube thumbnail"""
+    stream = next((s for s in streams_db if s.id == stream_id), None)
+    if not stream:
+        raise HTTPException(status_code=404, detail="Stream not found")
+
+    image_format = _negotiate_format(image_format, accept)
+    fallback_url = str(stream.thumbnail) if stream.thumbnail else None
+    try:
+        thumbnail = await thumbnail_service.get(stream_id, THUMBNAIL_SIZES[size], image_format, fallback_url)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if thumbnail is None:
+        raise HTTPException(status_code=404, detail="No thumbnail available for this stream")
+
+    immutable_url = request.url_for(
+        'get_thumbnail_variant', stream_id=stream_id, etag=thumbnail.etag, extension=thumbnail.extension.lstrip('.')
+    ).path
+    return _thumbnail_response(
+        thumbnail, if_none_match,
+        f"public, max-age={settings.thumbnail_max_age}, stale-while-revalidate={settings.thumbnail_max_age}",
+        {'Content-Location': immutable_url, 'Vary': 'Accept'}
+    )
+
+
+@router.get("/{stream_id}/{etag}.{extension}")
+async def get_thumbnail_variant(
+    stream_id: str,
+    etag: str,
+    extension: str,
+    if_none_match: Optional[str] = Header(None)
+):
+    """Immutable, content-addressed thumbnail variant"""
+    image_format = _EXTENSIONS.get(extension)
+    if image_format is None:
+        raise HTTPException(status_code=404, detail="Unknown thumbnail format")
+    thumbnail = await thumbnail_service.get_by_etag(stream_id, etag, image_format)
+    if thumbnail is None:
+        raise HTTPException(status_code=404, detail="Thumbnail not found")
+    return _thumbnail_response(thumbnail, if_none_match, IMMUTABLE_CACHE_CONTROL)
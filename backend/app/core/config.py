@@ -39,17 +39,104 @@ class Settings(BaseSettings):
     default_llm_model: str = "gpt-3.5-turbo"
     yolo_model_path: str = "yolov8n.pt"
     embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2"
+    embedding_backend: str = "sentence-transformers"  # sentence-transformers or hashing
+    embedding_batch_size: int = 64
+
+    # Knowledge Index
+    vector_index_path: str = "data/vectors/knowledge"
+    vector_query_cache_size: int = 1024
     
     # Video Processing
     max_frame_rate: int = 2
     frame_extraction_quality: str = "medium"
     max_concurrent_streams: int = 5
-    
+    frame_decode_width: int = 1280  # frames are decoded no larger than this box, 0 = source size
+    frame_decode_height: int = 720
+    video_decoder_backend: str = "opencv"  # opencv or ffmpeg
+    ffmpeg_path: str = "ffmpeg"
+    ffmpeg_threads: int = 0  # 0 lets ffmpeg decide
+    ffmpeg_reconnect_attempts: int = 5
+
+    # Frame Encoding
+    frame_encode_format: str = "jpeg"  # jpeg or webp (JPEG when OpenCV lacks a WebP writer)
+    frame_encode_quality: int = 85  # fixed quality, or the ceiling when a byte target is set
+    frame_encode_min_quality: int = 40
+    frame_encode_target_bytes: int = 0  # per-frame size target, 0 disables
+
+    # Frame Archive
+    frame_archive_dir: str = "data/frames"
+    frame_archive_format: str = "files"  # files (one JPEG each) or pack (hourly segments + index)
+    frame_archive_jpeg_quality: int = 0  # 0 archives the JPEG payload bytes as sent
+    frame_archive_batch_size: int = 32
+    frame_archive_flush_interval: float = 0.5
+    frame_archive_max_queue: int = 256
+    frame_archive_quota_mb: int = 10240  # 0 disables retention
+
+    # Thumbnails
+    thumbnail_dir: str = "data/thumbnails"
+    thumbnail_memory_items: int = 512  # encoded variants kept in memory
+    thumbnail_frame_interval: float = 30.0  # seconds between frames taken as a stream's thumbnail
+    thumbnail_max_age: int = 300  # Cache-Control max-age of the per-stream thumbnail URL
+    thumbnail_webp_quality: int = 75
+    thumbnail_jpeg_quality: int = 80
+
+    # Motion Regions
+    motion_process_width: int = 320
+    motion_learning_rate: float = 0.05
+    motion_threshold: int = 25
+    motion_min_area_ratio: float = 0.002
+    motion_keyframe_interval: int = 30  # full-frame pass every N frames, 0 disables
+
+    # Object Detection
+    detection_backend: str = "ultralytics"  # ultralytics, onnx or stub
+    detection_confidence: float = 0.35
+    detection_image_size: int = 640
+    detection_max_batch_size: int = 8
+    detection_max_latency_ms: int = 100
+    detection_max_queue_size: int = 64
+    detection_load_retry_seconds: float = 60.0  # cooldown after a detector fails to load
+
+    # Object Tracking
+    tracking_max_age: int = 5  # frames a track survives without a match
+    tracking_min_hits: int = 3
+    tracking_iou_threshold: float = 0.3
+    tracking_history_size: int = 64
+
+    # Stream Refresh
+    stream_refresh_enabled: bool = True
+    stream_refresh_live_interval: int = 300
+    stream_refresh_upcoming_interval: int = 120
+    stream_refresh_offline_interval: int = 900
+    stream_refresh_expiry_margin: int = 600
+    stream_refresh_jitter: float = 0.1
+    stream_refresh_concurrency: int = 2
+    hls_renewal_margin: int = 120
+    category_keywords_file: str = ""
+
+    # Startup
+    startup_budget_seconds: float = 2.0  # import + lifespan startup, 0 disables the warning
+
+    # Event Loop Monitoring
+    event_loop_lag_interval: float = 0.5
+    event_loop_block_threshold: float = 0.25  # seconds, 0 disables the watchdog
+
     # Narration
     default_narration_style: str = "field-scientist"
     max_narration_length: int = 500
     narration_update_interval: int = 5
+    narration_llm_backend: str = "openai"  # openai or fake
+    narration_max_in_flight: int = 4
+    narration_cache_size: int = 512
+    narration_min_confidence: float = 0.4
+    narration_use_knowledge: bool = False
     
+    # Realtime WebSocket
+    realtime_send_budget: int = 32768  # bytes per second per client
+    realtime_max_batch: int = 50  # messages per frame
+    realtime_max_queued: int = 100  # queued narration messages per client
+    realtime_flush_interval: float = 0.05
+    realtime_max_subscriptions: int = 20
+
     # Security
     secret_key: str = "your_secret_key_here_change_in_production"
     algorithm: str = "HS256"
@@ -80,6 +167,3 @@ def ensure_directories():
     
     for directory in directories:
         Path(directory).mkdir(parents=True, exist_ok=True)
-
-# Initialize directories on import
-ensure_directories() 
\ No newline at end of file
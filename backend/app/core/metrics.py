@@ -0,0 +1,321 @@
+"""
+Prometheus Metrics
+
+Definitions of the application's Prometheus series and the
+middleware and background samplers that feed the generic ones.
+"""
+
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Request, Response
+from loguru import logger
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+)
+
+from .config import settings
+
+# HTTP
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'HTTP request latency by route',
+    ['method', 'route', 'status']
+)
+
+# Video proxy
+PROXY_UPSTREAM_TTFB = Histogram(
+    'proxy_upstream_ttfb_seconds', 'Time to first byte from the proxied upstream',
+    ['kind'],
+    buckets=(0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+PROXY_UPSTREAM_BYTES = Counter(
+    'proxy_upstream_bytes_total', 'Bytes relayed from the proxied upstream',
+    ['kind']
+)
+PROXY_UPSTREAM_ERRORS = Counter(
+    'proxy_upstream_errors_total', 'Non-200 upstream responses and transport errors',
+    ['kind', 'status']
+)
+
+# yt-dlp
+YTDLP_EXTRACTION_DURATION = Histogram(
+    'ytdlp_extraction_duration_seconds', 'yt-dlp metadata extraction duration',
+    buckets=(0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+)
+YTDLP_EXTRACTION_FAILURES = Counter(
+    'ytdlp_extraction_failures_total', 'Failed yt-dlp metadata extractions'
+)
+
+# Frame extraction
+FRAME_STAGE_DURATION = Histogram(
+    'frame_stage_duration_seconds', 'Frame extraction pipeline stage duration',
+    ['stage'],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+FRAME_ENCODE_ATTEMPTS = Histogram(
+    'frame_encode_attempts', 'Encodes needed to meet a frame byte-size target',
+    buckets=(1, 2, 3, 4, 5, 6, 8)
+)
+
+# Object detection
+DETECTION_BATCH_SIZE = Histogram(
+    'detection_batch_size', 'Frames per detector batch',
+    buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+DETECTION_QUEUE_WAIT = Histogram(
+    'detection_queue_wait_seconds', 'Time a frame waited for its detection batch to start',
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+DETECTION_INFERENCE_DURATION = Histogram(
+    'detection_inference_duration_seconds', 'Detector inference time per batch',
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+
+# Frame archive
+FRAME_ARCHIVE_FRAMES = Counter(
+    'frame_archive_frames_total', 'Frames handed to the archive writer by outcome (written, dropped, error)',
+    ['result']
+)
+FRAME_ARCHIVE_BYTES = Gauge(
+    'frame_archive_bytes', 'Disk space used by the frame archive'
+)
+
+# Narration
+NARRATION_REQUESTS = Counter(
+    'narration_requests_total', 'Narration windows by outcome (generated, cached, unchanged, error)',
+    ['result']
+)
+NARRATION_LLM_DURATION = Histogram(
+    'narration_llm_duration_seconds', 'LLM call duration for narration',
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+NARRATION_LATENCY = Histogram(
+    'narration_frame_to_text_seconds', 'Time from frame capture to narration text',
+    ['since'],
+    buckets=(0.25, 0.5, 1.0, 2.5, 5.0, 7.5, 10.0, 15.0, 30.0, 60.0)
+)
+
+# Realtime WebSocket
+REALTIME_CLIENTS = Gauge(
+    'realtime_clients', 'Connected realtime WebSocket clients'
+)
+REALTIME_MESSAGES = Counter(
+    'realtime_messages_total', 'Messages delivered to realtime clients'
+)
+REALTIME_SENT_BYTES = Counter(
+    'realtime_sent_bytes_total', 'Bytes sent to realtime clients by encoding',
+    ['encoding']
+)
+
+# Caches
+CACHE_REQUESTS = Counter(
+    'cache_requests_total', 'Cache lookups by cache and result (hit or miss)',
+    ['cache', 'result']
+)
+
+# Startup
+STARTUP_DURATION = Gauge(
+    'app_startup_seconds', 'Time spent starting the API process by phase (imports, lifespan, total)',
+    ['phase']
+)
+
+# Event loop
+EVENT_LOOP_LAG = Histogram(
+    'event_loop_lag_seconds', 'Delay between scheduled and actual wake-up of the event loop',
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+EVENT_LOOP_LAG_LAST = Gauge(
+    'event_loop_lag_last_seconds', 'Most recently measured event loop lag'
+)
+EVENT_LOOP_BLOCKS = Counter(
+    'event_loop_blocks_total', 'Callbacks that blocked the event loop past the threshold, by code site',
+    ['site']
+)
+EVENT_LOOP_BLOCK_DURATION = Histogram(
+    'event_loop_block_duration_seconds', 'How long a blocking callback held the event loop',
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+
+# Frames from files under app/ are preferred when naming the blocking site
+_APP_ROOT = str(Path(__file__).resolve().parent.parent)
+
+
+def record_cache_lookup(cache: str, hit: bool):
+    """Count a cache hit or miss"""
+    CACHE_REQUESTS.labels(cache=cache, result='hit' if hit else 'miss').inc()
+
+
+def install_metrics(app: FastAPI):
+    """Add the request latency middleware and the /metrics endpoint"""
+
+    @app.middleware("http")
+    async def record_request_latency(request: Request, call_next):
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            # Use the route template so path parameters don't explode cardinality
+            route = request.scope.get('route')
+            REQUEST_LATENCY.labels(
+                method=request.method,
+                route=getattr(route, 'path', 'unmatched'),
+                status=str(status)
+            ).observe(time.perf_counter() - start)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+class EventLoopLagMonitor:
+    """
+    Samples event loop lag by measuring how late a periodic sleep wakes up,
+    and runs a watchdog thread that catches callbacks blocking the loop.
+
+    The watchdog pings the loop with call_soon_threadsafe; when the ping
+    is not answered within block_threshold it captures the loop thread's
+    stack and the current task, then waits for the loop to recover and
+    reports the offender with its total blocked time.
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.5,
+        block_threshold: float = 0.25,
+        check_interval: float = 0.1,
+        stack_log_interval: float = 60.0
+    ):
+        self.interval = interval
+        self.block_threshold = block_threshold
+        self.check_interval = check_interval
+        self.stack_log_interval = stack_log_interval
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._offenders: Dict[str, Dict[str, Any]] = {}
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+        if self.block_threshold > 0 and (self._watchdog is None or not self._watchdog.is_alive()):
+            self._loop = asyncio.get_running_loop()
+            self._loop_thread_id = threading.get_ident()
+            self._stop_event.clear()
+            self._watchdog = threading.Thread(target=self._watch, name="event-loop-watchdog", daemon=True)
+            self._watchdog.start()
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+        if self._watchdog:
+            self._stop_event.set()
+            self._watchdog.join(timeout=1.0)
+            self._watchdog = None
+
+    def get_offenders(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Blocking sites seen so far, worst total blocked time first"""
+        offenders = sorted(self._offenders.values(), key=lambda o: o['total_seconds'], reverse=True)
+        return [{k: v for k, v in o.items() if k != 'last_stack_logged'} for o in offenders[:limit]]
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - start - self.interval)
+            EVENT_LOOP_LAG.observe(lag)
+            EVENT_LOOP_LAG_LAST.set(lag)
+
+    def _watch(self):
+        while not self._stop_event.is_set():
+            answered = threading.Event()
+            sent = time.monotonic()
+            try:
+                self._loop.call_soon_threadsafe(answered.set)
+            except RuntimeError:
+                return  # Loop closed
+
+            if not answered.wait(self.block_threshold):
+                offender = self._capture()
+                while not answered.wait(self.check_interval):
+                    if self._stop_event.is_set():
+                        return
+                self._report(offender, time.monotonic() - sent)
+
+            self._stop_event.wait(self.check_interval)
+
+    def _capture(self) -> Dict[str, Any]:
+        """Snapshot what the loop thread is running right now"""
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = traceback.extract_stack(frame) if frame else traceback.StackSummary()
+
+        task = None
+        try:
+            task = asyncio.current_task(self._loop)
+        except RuntimeError:
+            pass
+
+        # Name the innermost frame in our own code, since the innermost frame
+        # overall is usually inside cv2, yt-dlp or the standard library
+        site_frame = next((f for f in reversed(stack) if f.filename.startswith(_APP_ROOT)), None)
+        if site_frame is None and stack:
+            site_frame = stack[-1]
+        if site_frame is None:
+            site = "unknown"
+        elif site_frame.filename.startswith(_APP_ROOT):
+            site = f"{Path(site_frame.filename).relative_to(_APP_ROOT).as_posix()}:{site_frame.name}"
+        else:
+            site = f"{Path(site_frame.filename).name}:{site_frame.name}"
+
+        return {
+            'site': site,
+            'task': task.get_name() if task else None,
+            'coroutine': getattr(task.get_coro(), '__qualname__', None) if task else None,
+            'stack': ''.join(stack.format()),
+        }
+
+    def _report(self, offender: Dict[str, Any], blocked: float):
+        site = offender['site']
+        EVENT_LOOP_BLOCKS.labels(site=site).inc()
+        EVENT_LOOP_BLOCK_DURATION.observe(blocked)
+
+        now = time.time()
+        entry = self._offenders.setdefault(site, {
+            'site': site, 'count': 0, 'total_seconds': 0.0, 'max_seconds': 0.0,
+            'task': None, 'coroutine': None, 'last_seen': None, 'last_stack_logged': 0.0
+        })
+        entry['count'] += 1
+        entry['total_seconds'] = round(entry['total_seconds'] + blocked, 3)
+        entry['max_seconds'] = round(max(entry['max_seconds'], blocked), 3)
+        entry['task'] = offender['task']
+        entry['coroutine'] = offender['coroutine']
+        entry['last_seen'] = now
+
+        message = (f"🐢 Event loop blocked for {blocked * 1000:.0f} ms in {site} "
+                   f"(task={offender['task']}, coroutine={offender['coroutine']}, seen {entry['count']}x)")
+        # Full stacks once per site per interval so a hot offender doesn't flood the logs
+        if now - entry['last_stack_logged'] >= self.stack_log_interval:
+            entry['last_stack_logged'] = now
+            logger.warning(f"{message}\n{offender['stack']}")
+        else:
+            logger.warning(message)
+
+
+# Global lag monitor instance
+event_loop_monitor = EventLoopLagMonitor(
+    interval=settings.event_loop_lag_interval,
+    block_threshold=settings.event_loop_block_threshold
+)
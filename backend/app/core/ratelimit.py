@@ -0,0 +1,40 @@
+"""
+Rate Limiting
+
+Token bucket shared by the stream scanner (request starts) and the
+realtime hub (bytes sent per client).
+"""
+
+import asyncio
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """Async token bucket limiting how often requests may start (or how many bytes may be sent)"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, amount: float = 1):
+        """Wait until amount tokens are available and take them"""
+        if self.rate <= 0:
+            return
+
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                # Requests larger than the bucket wait for a full bucket and run into debt
+                needed = min(amount, self.capacity)
+                if self._tokens >= needed:
+                    self._tokens -= amount
+                    return
+
+                await asyncio.sleep((needed - self._tokens) / self.rate)
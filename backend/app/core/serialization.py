@@ -0,0 +1,27 @@
+"""
+JSON Serialization
+
+Compact JSON helpers used on hot paths (SSE and WebSocket pushes), backed
+by orjson when it is installed and the standard library otherwise.
+"""
+
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the standard library
+    orjson = None
+    import json
+
+
+def dumps_json(obj: Any) -> str:
+    """Serialize without whitespace"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+    return json.dumps(obj, separators=(',', ':'))
+
+
+def loads_json(data: Any) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
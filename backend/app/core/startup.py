@@ -0,0 +1,147 @@
+"""
+Startup Budget
+
+Boot-time accounting for the API process. app.main marks when its imports
+start; once the lifespan startup has finished, the startup report logs
+how long importing and starting took, exports it as the
+app_startup_seconds gauge, and warns when the total exceeds
+settings.startup_budget_seconds or when heavy modules (cv2, numpy,
+yt-dlp, ...) were loaded during boot. Heavy modules are meant to be loaded
+on first use only.
+
+The import-time report runs `python -X importtime -c "import app.main"` in
+a fresh interpreter and lists the slowest imports. It exits non-zero when
+the import exceeds the budget, so it can run as a CI check:
+
+    python -m app.core.startup --top 20
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from loguru import logger
+
+from .config import settings
+from .metrics import STARTUP_DURATION
+
+# Modules that should only be imported by the code paths that use them
+HEAVY_MODULES = (
+    'cv2', 'numpy', 'PIL', 'yt_dlp', 'aiohttp', 'torch', 'ultralytics',
+    'onnxruntime', 'faiss', 'sentence_transformers', 'openai', 'ffmpeg',
+)
+
+_BACKEND_ROOT = Path(__file__).resolve().parents[2]
+
+
+class StartupReport:
+    """Measures import and lifespan startup time against the budget"""
+
+    def __init__(self):
+        self.import_started: Optional[float] = None
+        self.import_finished: Optional[float] = None
+        self.lifespan_started: Optional[float] = None
+
+    def mark_import_started(self, at: Optional[float] = None):
+        self.import_started = at if at is not None else time.perf_counter()
+
+    def mark_import_finished(self):
+        self.import_finished = time.perf_counter()
+
+    def mark_lifespan_started(self):
+        self.lifespan_started = time.perf_counter()
+
+    def finish(self) -> dict:
+        """Log and export the startup timings; call at the end of the lifespan startup"""
+        now = time.perf_counter()
+        imports = (self.import_finished - self.import_started
+                   if self.import_started is not None and self.import_finished is not None else 0.0)
+        lifespan = now - self.lifespan_started if self.lifespan_started is not None else 0.0
+        total = imports + lifespan
+        heavy = loaded_heavy_modules()
+
+        STARTUP_DURATION.labels(phase='imports').set(imports)
+        STARTUP_DURATION.labels(phase='lifespan').set(lifespan)
+        STARTUP_DURATION.labels(phase='total').set(total)
+
+        budget = settings.startup_budget_seconds
+        logger.info(f"⏱️ Startup took {total:.2f}s (imports {imports:.2f}s, lifespan {lifespan:.2f}s, "
+                    f"budget {budget:.2f}s)")
+        if budget and total > budget:
+            logger.warning(f"Startup exceeded its {budget:.2f}s budget; "
+                           f"run `python -m app.core.startup` for an import-time report")
+        if heavy:
+            logger.warning(f"Heavy modules loaded during startup: {', '.join(heavy)}")
+        return {'imports': imports, 'lifespan': lifespan, 'total': total, 'heavy_modules': heavy}
+
+
+def loaded_heavy_modules() -> List[str]:
+    return [name for name in HEAVY_MODULES if name in sys.modules]
+
+
+def loaded_service(module: str, name: str):
+    """A module-level service instance if its module was imported, else None (doesn't import it)"""
+    loaded = sys.modules.get(module)
+    return getattr(loaded, name, None) if loaded is not None else None
+
+
+def measure_imports(target: str = "app.main") -> Tuple[float, List[Tuple[str, float, float]]]:
+    """
+    Import a module in a fresh interpreter with -X importtime
+
+    Returns:
+        (total seconds, [(module, self seconds, cumulative seconds)] slowest first)
+    """
+    env = {**os.environ, 'PYTHONPATH': os.pathsep.join(filter(None, [str(_BACKEND_ROOT),
+                                                                     os.environ.get('PYTHONPATH')]))}
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f"import {target}"],
+        capture_output=True, text=True, env=env, cwd=_BACKEND_ROOT
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {target} failed:\n{result.stderr[-2000:]}")
+
+    entries = []
+    total = 0.0
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = (part.strip() for part in line[len('import time:'):].split('|'))
+        entries.append((name.strip(), int(own) / 1e6, int(cumulative) / 1e6))
+        if name.strip() == target:
+            total = int(cumulative) / 1e6
+    entries.sort(key=lambda e: e[2], reverse=True)
+    return total, entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time report for the API process")
+    parser.add_argument('--module', default='app.main', help="Module to import")
+    parser.add_argument('--top', type=int, default=25, help="Slowest imports to list")
+    parser.add_argument('--budget', type=float, default=settings.startup_budget_seconds,
+                        help="Import budget in seconds, 0 disables the check")
+    args = parser.parse_args()
+
+    total, entries = measure_imports(args.module)
+    print(f"{'cumulative':>10}  {'self':>8}  module")
+    for name, own, cumulative in entries[:args.top]:
+        print(f"{cumulative * 1000:>8.1f}ms  {own * 1000:>6.1f}ms  {name}")
+    heavy = [name for name, _, _ in entries if name in HEAVY_MODULES]
+    print(f"\nimport {args.module}: {total:.3f}s (budget {args.budget:.3f}s)")
+    if heavy:
+        print(f"heavy modules imported: {', '.join(heavy)}")
+    if args.budget and total > args.budget:
+        print("over budget")
+        sys.exit(1)
+
+
+# Global startup report instance
+startup_report = StartupReport()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,9 @@
+import time
+
+_IMPORT_STARTED = time.perf_counter()
+
+import asyncio
+
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
@@ -5,22 +11,54 @@ from contextlib import asynccontextmanager
 import uvicorn
 from loguru import logger
 
-from .core.config import settings
+from .core.config import ensure_directories, settings
+from .core.metrics import install_metrics, event_loop_monitor
+from .core.startup import loaded_service, startup_report
 from .api.v1.streams import router as streams_router
 from .api.v1.proxy import router as proxy_router
+from .api.v1.realtime import router as realtime_router
+from .api.v1.thumbnails import router as thumbnails_router
+from .api.v1.streams import streams_db
+from .services.stream_refresher import stream_refresher
+from .services.object_detection import detection_service
+from .services.narration import narration_scheduler
+from .services.realtime_hub import realtime_hub
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan events"""
     # Startup
+    startup_report.mark_lifespan_started()
+    ensure_directories()
     logger.info(f"🦁 Starting {settings.app_name} v{settings.app_version}")
     logger.info(f"🌐 Server will be available at: http://{settings.host}:{settings.port}")
     logger.info(f"📚 API Documentation: http://{settings.host}:{settings.port}/docs")
     logger.info(f"🔧 Debug mode: {settings.debug}")
     logger.info("=" * 50)
+    event_loop_monitor.start()
+    narration_scheduler.start()
+    detection_service.add_listener(narration_scheduler.submit)
+    detection_service.add_listener(realtime_hub.on_analysis)
+    narration_scheduler.add_listener(realtime_hub.on_narration)
+    stream_refresher.add_listener(realtime_hub.on_stream_update)
+    if settings.stream_refresh_enabled:
+        await stream_refresher.start(streams_db)
+    startup_report.finish()
     yield
     # Shutdown
+    await stream_refresher.stop()
+    await detection_service.stop()
+    detection_service.remove_listener(narration_scheduler.submit)
+    detection_service.remove_listener(realtime_hub.on_analysis)
+    narration_scheduler.remove_listener(realtime_hub.on_narration)
+    stream_refresher.remove_listener(realtime_hub.on_stream_update)
+    await narration_scheduler.stop()
+    # Only loaded once a stream saved frames; don't import it just to close it
+    frame_archive = loaded_service(f"{__package__}.services.frame_archive", 'frame_archive')
+    if frame_archive is not None:
+        await asyncio.to_thread(frame_archive.close)
+    await event_loop_monitor.stop()
     logger.info("🛑 Shutting down Wildlife Narration API")
 
 
@@ -41,9 +79,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Prometheus metrics
+install_metrics(app)
+
 # Include routers
 app.include_router(streams_router, prefix="/api/v1")
 app.include_router(proxy_router, prefix="/api/v1")
+app.include_router(realtime_router, prefix="/api/v1")
+app.include_router(thumbnails_router, prefix="/api/v1")
+
+startup_report.mark_import_started(_IMPORT_STARTED)
+startup_report.mark_import_finished()
 
 
 @app.get("/")
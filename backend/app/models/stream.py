@@ -1,5 +1,5 @@
 from typing import Optional, List, Dict, Any
-from pydantic import BaseModel, HttpUrl, field_validator, Field, ConfigDict
+from pydantic import BaseModel, HttpUrl, computed_field, field_validator, Field, ConfigDict
 from datetime import datetime
 from enum import Enum
 
@@ -29,6 +29,24 @@ class StreamQuality(str, Enum):
     BEST = "best"
 
 
+class StreamPurpose(str, Enum):
+    """What a stream URL is used for; decides which HLS variant is picked"""
+    PLAYBACK = "playback"
+    ANALYSIS = "analysis"
+    THUMBNAIL = "thumbnail"
+
+
+class StreamVariant(BaseModel):
+    """One rendition of a stream's HLS ladder"""
+    format_id: str
+    url: str
+    width: Optional[int] = None
+    height: Optional[int] = None
+    fps: Optional[float] = None
+    tbr: Optional[float] = None  # total bitrate, kbps
+    vcodec: Optional[str] = None
+
+
 class StreamMetadata(BaseModel):
     """Basic stream metadata from yt-dlp"""
     model_config = ConfigDict(use_enum_values=True)
@@ -54,6 +72,8 @@ class StreamMetadata(BaseModel):
     formats: Optional[List[Dict[str, Any]]] = None
     best_video_url: Optional[HttpUrl] = None
     best_audio_url: Optional[HttpUrl] = None
+    hls_expires_at: Optional[datetime] = None
+    variants: Optional[List[StreamVariant]] = None  # HLS ladder, smallest first
 
 
 class StreamInfo(BaseModel):
@@ -84,8 +104,15 @@ class StreamInfo(BaseModel):
     
     # URLs
     hls_url: Optional[HttpUrl] = None
+    hls_expires_at: Optional[datetime] = None
     webpage_url: Optional[HttpUrl] = None
     
+    @computed_field
+    @property
+    def thumbnail_url(self) -> str:
+        """Cached, resized thumbnail served by the API (falls back to `thumbnail`)"""
+        return f"/api/v1/thumbnails/{self.id}"
+    
     @field_validator('viewer_count', mode='before')
     @classmethod
     def validate_viewer_count(cls, v):
@@ -108,6 +135,15 @@ class StreamResponse(BaseModel):
     error: Optional[str] = None
 
 
+class StreamVariantResponse(BaseModel):
+    """Variant chosen for a purpose, with the full ladder"""
+    stream_id: str
+    purpose: StreamPurpose
+    quality: StreamQuality
+    selected: StreamVariant
+    variants: List[StreamVariant]
+
+
 class StreamListResponse(BaseModel):
     """Response model for listing streams"""
     streams: List[StreamInfo]
@@ -0,0 +1,120 @@
+"""
+Stream Category Classifier
+
+Assigns a StreamCategory to a stream from its title and description using
+weighted keyword sets compiled once into a single alternation regex.
+"""
+
+import json
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+
+from ..models.stream import StreamCategory
+from ..core.config import settings
+
+
+# Keyword weights per category; a keyword may appear under several categories
+DEFAULT_CATEGORY_KEYWORDS: Dict[StreamCategory, Dict[str, float]] = {
+    StreamCategory.SAFARI: {'safari': 1.0, 'kruger': 1.0, 'serengeti': 1.0, 'africa': 1.0,
+                            'lion': 1.0, 'elephant': 1.0, 'rhino': 1.0},
+    StreamCategory.AQUARIUM: {'aquarium': 1.0, 'fish': 1.0, 'coral': 1.0, 'reef': 1.0,
+                              'underwater': 1.0, 'marine life': 1.0},
+    StreamCategory.BIRDS: {'bird': 1.0, 'eagle': 1.0, 'nest': 1.0, 'hawk': 1.0, 'owl': 1.0,
+                           'falcon': 1.0, 'avian': 1.0},
+    StreamCategory.ZOO: {'zoo': 1.0, 'panda': 1.0, 'tiger': 1.0, 'bear': 1.0, 'monkey': 1.0,
+                         'giraffe': 1.0},
+    StreamCategory.MARINE: {'ocean': 1.0, 'whale': 1.0, 'dolphin': 1.0, 'shark': 1.0, 'sea': 1.0,
+                            'marine': 1.0},
+    StreamCategory.WILDLIFE: {'wildlife': 1.0, 'nature': 1.0, 'wild': 1.0, 'forest': 1.0,
+                              'jungle': 1.0},
+    StreamCategory.CONSERVATION: {'conservation': 1.0, 'rescue': 1.0, 'sanctuary': 1.0,
+                                  'rehabilitation': 1.0},
+}
+
+
+class CategoryClassifier:
+    """Keyword-based stream category classifier"""
+
+    def __init__(
+        self,
+        keywords: Optional[Dict[StreamCategory, Dict[str, float]]] = None,
+        default: StreamCategory = StreamCategory.WILDLIFE
+    ):
+        self.default = default
+        self.categories: List[StreamCategory] = []
+        self._weights: Dict[str, List[Tuple[int, float]]] = {}
+
+        for category, category_keywords in (keywords or DEFAULT_CATEGORY_KEYWORDS).items():
+            self.categories.append(StreamCategory(category))
+            index = len(self.categories) - 1
+            for keyword, weight in category_keywords.items():
+                key = self._normalize(keyword)
+                self._weights.setdefault(key, []).append((index, float(weight)))
+
+        # Longest keywords first so phrases win over their own prefixes
+        alternatives = sorted(self._weights, key=len, reverse=True)
+        escaped = [r'\s+'.join(re.escape(word) for word in key.split(' ')) for key in alternatives]
+        self._pattern = re.compile(
+            r'\b(' + '|'.join(escaped) + r')(?:e?s)?\b',
+            re.IGNORECASE
+        ) if escaped else None
+
+    @staticmethod
+    def _normalize(keyword: str) -> str:
+        return ' '.join(keyword.lower().split())
+
+    def score(self, title: str, description: str = "") -> Dict[StreamCategory, float]:
+        """Return the keyword score of every matching category"""
+        if self._pattern is None:
+            return {}
+
+        # Each keyword counts once, however often it appears
+        found = set()
+        for text in (title, description):
+            if text:
+                found.update(self._normalize(m.group(1)) for m in self._pattern.finditer(text))
+
+        scores = [0.0] * len(self.categories)
+        for keyword in found:
+            for index, weight in self._weights[keyword]:
+                scores[index] += weight
+
+        return {self.categories[i]: score for i, score in enumerate(scores) if score > 0}
+
+    def classify(self, title: str, description: str = "") -> StreamCategory:
+        """Return the best-scoring category, or the default if nothing matches"""
+        scores = self.score(title, description)
+        if scores:
+            return max(scores, key=scores.get)
+        return self.default
+
+    def classify_batch(self, items: Iterable[Tuple[str, str]]) -> List[StreamCategory]:
+        """Classify many (title, description) pairs in one call"""
+        return [self.classify(title, description) for title, description in items]
+
+
+def load_category_keywords(path: str) -> Optional[Dict[StreamCategory, Dict[str, float]]]:
+    """
+    Load weighted keyword sets from a JSON file
+
+    The file maps category names to {keyword: weight} objects, e.g.
+    {"birds": {"eagle": 2.0, "nest": 0.5}}.
+    """
+    try:
+        raw = json.loads(Path(path).read_text())
+        return {
+            StreamCategory(category): {keyword: float(weight) for keyword, weight in keywords.items()}
+            for category, keywords in raw.items()
+        }
+    except Exception as e:
+        logger.error(f"Failed to load category keywords from {path}: {e}")
+        return None
+
+
+# Global classifier instance
+category_classifier = CategoryClassifier(
+    load_category_keywords(settings.category_keywords_file) if settings.category_keywords_file else None
+)
@@ -0,0 +1,333 @@
+"""
+Frame Archive
+
+Stores saved frames off the event loop. Frames are queued as EncodedFrames
+and a dedicated writer thread writes them in batches, so the extraction
+loop never waits on the filesystem. The JPEG bytes already encoded for the
+frame payload are reused; only an archive-specific quality
+(settings.frame_archive_jpeg_quality) is encoded, on the writer thread.
+
+Layout under settings.frame_archive_dir (partitioned by UTC date, then stream):
+
+    files format:  <date>/<stream>/<frame_id>.jpg
+    pack format:   <date>/<stream>/<HH>.pack   concatenated JPEGs
+                   <date>/<stream>/<HH>.idx    one INDEX_DTYPE record per frame
+
+Pack segments are append-only and roll over every UTC hour, which keeps
+the file count low for long-running streams. Retention deletes the oldest
+files or segments whenever the archive grows beyond the disk quota.
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from ..core.config import settings
+from ..core.metrics import FRAME_ARCHIVE_BYTES, FRAME_ARCHIVE_FRAMES
+from .frame_encoder import EncodedFrame, EncodeSpec
+
+logger = logging.getLogger(__name__)
+
+PACK_SUFFIX = ".pack"
+INDEX_SUFFIX = ".idx"
+
+# One record per packed frame; timestamps are UTC epoch seconds
+INDEX_DTYPE = np.dtype([
+    ('timestamp', '<f8'),
+    ('offset', '<u8'),
+    ('length', '<u4'),
+    ('frame_number', '<u4'),
+])
+
+
+def utc_timestamp(timestamp: datetime) -> float:
+    """Epoch seconds, treating naive datetimes (datetime.utcnow()) as UTC"""
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.timestamp()
+
+
+def partition_dir(root: Path, stream_id: str, timestamp: float) -> Path:
+    day = datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%d")
+    return root / day / stream_id
+
+
+def segment_name(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%H")
+
+
+@dataclass
+class _PendingFrame:
+    stream_id: str
+    frame_id: str
+    frame_number: int
+    timestamp: float
+    frame: Optional[EncodedFrame]  # only kept while the archive encoding is still pending
+    data: Optional[memoryview]  # archive bytes, when they were already encoded
+    spec: EncodeSpec
+    target: Path  # jpg file, or pack segment
+
+
+class FrameArchiveWriter:
+    """Batched background writer for saved frames with quota-based retention"""
+
+    def __init__(
+        self,
+        root: Optional[str] = None,
+        storage_format: Optional[str] = None,
+        jpeg_quality: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        max_queue: Optional[int] = None,
+        quota_bytes: Optional[int] = None
+    ):
+        self.root = Path(root or settings.frame_archive_dir)
+        self.storage_format = (storage_format or settings.frame_archive_format).lower()
+        if self.storage_format not in ('files', 'pack'):
+            raise ValueError(f"Unknown frame archive format: {self.storage_format}")
+        self.jpeg_quality = jpeg_quality or settings.frame_archive_jpeg_quality
+        self.batch_size = batch_size or settings.frame_archive_batch_size
+        self.flush_interval = flush_interval if flush_interval is not None else settings.frame_archive_flush_interval
+        self.quota_bytes = quota_bytes if quota_bytes is not None else settings.frame_archive_quota_mb * 1024 * 1024
+
+        self._queue: "queue.Queue[Optional[_PendingFrame]]" = queue.Queue(
+            maxsize=max_queue or settings.frame_archive_max_queue
+        )
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        # Open pack segments: segment path -> (pack file, index file)
+        self._segments: Dict[Path, Tuple] = {}
+        self._known_dirs: set = set()
+        self._total_bytes: Optional[int] = None
+        self.dropped = 0
+
+    def submit(self, stream_id: str, frame_id: str, frame_number: int,
+               timestamp: datetime, frame: Union[np.ndarray, EncodedFrame]) -> Optional[Path]:
+        """
+        Queue a frame for writing
+
+        The frame array must not be modified afterwards (arrays borrowed from
+        a decoder buffer are copied if they still need encoding). Returns the
+        file (or pack segment) the frame will be written to, or None if the
+        queue is full and the frame was dropped.
+        """
+        if not isinstance(frame, EncodedFrame):
+            frame = EncodedFrame(frame, stream_id=stream_id)
+        spec = self._spec(frame)
+        # Queue only the bytes when they exist, so backlogged frames don't pin full-size images
+        data = None
+        if frame.has(spec):
+            data, frame = frame.get(spec), None
+        else:
+            frame.detach()
+
+        ts = utc_timestamp(timestamp)
+        directory = partition_dir(self.root, stream_id, ts)
+        if self.storage_format == 'pack':
+            target = directory / f"{segment_name(ts)}{PACK_SUFFIX}"
+        else:
+            target = directory / f"{frame_id}.jpg"
+
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(_PendingFrame(stream_id, frame_id, frame_number, ts, frame, data, spec, target))
+        except queue.Full:
+            self.dropped += 1
+            FRAME_ARCHIVE_FRAMES.labels(result='dropped').inc()
+            return None
+        return target
+
+    def _spec(self, frame: EncodedFrame) -> EncodeSpec:
+        # Files are .jpg and the reader expects JPEG; the payload's JPEG is reused when it is one
+        if self.jpeg_quality:
+            return EncodeSpec('jpeg', quality=self.jpeg_quality)
+        if frame.spec.format == 'jpeg':
+            return frame.spec
+        return EncodeSpec('jpeg', quality=settings.frame_encode_quality)
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="frame-archive", daemon=True)
+                self._thread.start()
+
+    def close(self, timeout: float = 10.0):
+        """Write everything queued so far and stop the writer thread (blocking)"""
+        thread = self._thread
+        if thread is None:
+            return
+        self._queue.put(None)
+        thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        running = True
+        while running:
+            batch: List[_PendingFrame] = []
+            item = self._queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            while item is not None:
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            if item is None:
+                running = False
+
+            if batch:
+                try:
+                    self._write_batch(batch)
+                except Exception as e:
+                    FRAME_ARCHIVE_FRAMES.labels(result='error').inc(len(batch))
+                    logger.error(f"Frame archive batch failed: {e}")
+            if self._queue.empty():
+                # Idle: don't keep segment handles (e.g. last hour's) open between bursts
+                self._flush_segments(close=True)
+
+        self._flush_segments(close=True)
+
+    def _write_batch(self, batch: List[_PendingFrame]):
+        written = 0
+        frames = 0
+        for item in batch:
+            try:
+                data = item.data if item.data is not None else item.frame.get(item.spec)
+            except Exception as e:
+                logger.error(f"Frame archive encoding failed for {item.frame_id}: {e}")
+                FRAME_ARCHIVE_FRAMES.labels(result='error').inc()
+                continue
+            frames += 1
+            self._ensure_dir(item.target.parent)
+            if self.storage_format == 'pack':
+                pack, index = self._segment(item.target)
+                offset = pack.tell()
+                pack.write(data)
+                record = np.array([(item.timestamp, offset, len(data), item.frame_number)], dtype=INDEX_DTYPE)
+                index.write(record.tobytes())
+                written += len(data) + INDEX_DTYPE.itemsize
+            else:
+                with open(item.target, 'wb') as f:
+                    f.write(data)
+                written += len(data)
+
+        self._flush_segments(close=False)
+        FRAME_ARCHIVE_FRAMES.labels(result='written').inc(frames)
+        self._account(written)
+
+    def _ensure_dir(self, directory: Path):
+        if directory not in self._known_dirs:
+            directory.mkdir(parents=True, exist_ok=True)
+            self._known_dirs.add(directory)
+
+    def _segment(self, path: Path) -> Tuple:
+        handles = self._segments.get(path)
+        if handles is None:
+            # Append mode: offsets come from tell(), so bytes left unindexed
+            # by an unclean stop are simply skipped over
+            handles = (open(path, 'ab'), open(path.with_suffix(INDEX_SUFFIX), 'ab'))
+            self._segments[path] = handles
+        return handles
+
+    def _flush_segments(self, close: bool):
+        for path, (pack, index) in list(self._segments.items()):
+            try:
+                pack.flush()
+                index.flush()
+                if close:
+                    pack.close()
+                    index.close()
+            except Exception as e:
+                logger.error(f"Failed to flush frame segment {path}: {e}")
+        if close:
+            self._segments.clear()
+
+    # Retention
+
+    def _account(self, written: int):
+        if self._total_bytes is None:
+            self._total_bytes = self._scan_size()
+        else:
+            self._total_bytes += written
+        FRAME_ARCHIVE_BYTES.set(self._total_bytes)
+        if self.quota_bytes > 0 and self._total_bytes > self.quota_bytes:
+            self._enforce_quota()
+
+    def _scan_size(self) -> int:
+        total = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                try:
+                    total += os.path.getsize(os.path.join(dirpath, name))
+                except OSError:
+                    pass
+        return total
+
+    def _enforce_quota(self):
+        """Delete the oldest files/segments until the archive is 90% of the quota"""
+        target = int(self.quota_bytes * 0.9)
+        units = []  # (mtime, [paths], size) per jpg or pack+idx pair
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path = Path(dirpath) / name
+                if path.suffix == INDEX_SUFFIX:
+                    continue
+                paths = [path]
+                if path.suffix == PACK_SUFFIX:
+                    if path in self._segments:
+                        continue  # never delete the segment being written
+                    paths.append(path.with_suffix(INDEX_SUFFIX))
+                try:
+                    stats = [p.stat() for p in paths if p.exists()]
+                except OSError:
+                    continue
+                units.append((max(s.st_mtime for s in stats), paths, sum(s.st_size for s in stats)))
+
+        units.sort(key=lambda u: u[0])
+        total = self._scan_size()
+        removed = 0
+        for _, paths, size in units:
+            if total <= target:
+                break
+            for path in paths:
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.warning(f"Failed to delete archived frames {path}: {e}")
+            total -= size
+            removed += 1
+
+        self._remove_empty_dirs()
+        self._total_bytes = self._scan_size()
+        FRAME_ARCHIVE_BYTES.set(self._total_bytes)
+        if removed:
+            logger.info(f"Frame archive retention removed {removed} files/segments "
+                        f"({self._total_bytes / 1024 / 1024:.0f} MB kept)")
+
+    def _remove_empty_dirs(self):
+        for dirpath, _, filenames in os.walk(self.root, topdown=False):
+            path = Path(dirpath)
+            if path != self.root and not filenames:
+                try:
+                    path.rmdir()
+                    self._known_dirs.discard(path)
+                except OSError:
+                    pass
+
+
+# Global frame archive writer instance
+frame_archive = FrameArchiveWriter()
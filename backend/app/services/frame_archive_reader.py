@@ -0,0 +1,306 @@
+"""
+Frame Archive Reader
+
+Read-side of the frame archive for offline replay, detector evaluation and
+feature backfills. Pack segments and their indexes are memory-mapped, so a
+time-range lookup is a binary search over the index and frame bytes are
+sliced straight from the page cache. Frames can be decoded lazily one at a
+time or in batches into a preallocated (N, H, W, 3) array.
+
+Archives written in the 'files' format are readable too, using the file
+modification time as the frame timestamp.
+"""
+
+import logging
+import mmap
+import os
+import re
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+
+from ..core.config import settings
+from .frame_archive import INDEX_DTYPE, INDEX_SUFFIX, PACK_SUFFIX, utc_timestamp
+
+logger = logging.getLogger(__name__)
+
+TimeLike = Union[datetime, float, None]
+
+_FRAME_FILE = re.compile(r"_frame_(\d+)\.jpg$")
+
+
+def _epoch(value: TimeLike, default: float) -> float:
+    if value is None:
+        return default
+    if isinstance(value, datetime):
+        return utc_timestamp(value)
+    return float(value)
+
+
+@dataclass
+class ArchivedFrame:
+    """One archived frame; the JPEG is only decoded when asked for"""
+    stream_id: str
+    frame_number: int
+    timestamp: float
+    data: memoryview  # JPEG bytes, valid while the reader is open
+
+    @property
+    def frame_id(self) -> str:
+        return f"{self.stream_id}_frame_{self.frame_number}"
+
+    @property
+    def utc_datetime(self) -> datetime:
+        return datetime.fromtimestamp(self.timestamp, timezone.utc)
+
+    def decode(self) -> np.ndarray:
+        frame = cv2.imdecode(np.frombuffer(self.data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            raise ValueError(f"Corrupt archived frame {self.frame_id}")
+        return frame
+
+
+class _Segment:
+    """Memory-mapped pack segment and its index"""
+
+    def __init__(self, pack_path: Path):
+        self.pack_path = pack_path
+        self.index_path = pack_path.with_suffix(INDEX_SUFFIX)
+        self.pack_size = pack_path.stat().st_size
+        self.index_size = self.index_path.stat().st_size
+        self._pack = self._map(pack_path)
+        self._index = self._map(self.index_path)
+
+        count = self.index_size // INDEX_DTYPE.itemsize  # ignore a partially written record
+        records = np.frombuffer(self._index, dtype=INDEX_DTYPE, count=count) if count else \
+            np.empty(0, dtype=INDEX_DTYPE)
+        # Frames whose bytes didn't fully reach the pack are not readable
+        self.records = records[records['offset'] + records['length'] <= self.pack_size]
+        self.timestamps = self.records['timestamp']
+
+    @staticmethod
+    def _map(path: Path):
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b""
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def is_stale(self) -> bool:
+        """True if the writer appended since this segment was mapped"""
+        try:
+            return self.pack_path.stat().st_size != self.pack_size
+        except FileNotFoundError:
+            return True
+
+    def range(self, start: float, end: float) -> np.ndarray:
+        lo = np.searchsorted(self.timestamps, start, side='left')
+        hi = np.searchsorted(self.timestamps, end, side='right')
+        return self.records[lo:hi]
+
+    def data(self, record) -> memoryview:
+        offset, length = int(record['offset']), int(record['length'])
+        return memoryview(self._pack)[offset:offset + length]
+
+    def close(self):
+        self.records = self.timestamps = None
+        for mapped in (self._pack, self._index):
+            if isinstance(mapped, mmap.mmap):
+                try:
+                    mapped.close()
+                except BufferError:
+                    pass  # an ArchivedFrame still references it; freed with that view
+
+
+class FrameArchiveReader:
+    """Time-range access to archived frames of a stream"""
+
+    def __init__(self, root: Optional[str] = None, max_open_segments: int = 32):
+        self.root = Path(root or settings.frame_archive_dir)
+        self.max_open_segments = max_open_segments
+        self._segments: "OrderedDict[Path, _Segment]" = OrderedDict()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        for segment in self._segments.values():
+            segment.close()
+        self._segments.clear()
+
+    def list_streams(self) -> List[str]:
+        streams = set()
+        if self.root.exists():
+            for day in self.root.iterdir():
+                if day.is_dir():
+                    streams.update(p.name for p in day.iterdir() if p.is_dir())
+        return sorted(streams)
+
+    def time_span(self, stream_id: str) -> Optional[Tuple[float, float]]:
+        """First and last archived timestamp of a stream"""
+        first = last = None
+        for frame in self.iter_frames(stream_id):
+            if first is None:
+                first = frame.timestamp
+            last = frame.timestamp
+        return (first, last) if first is not None else None
+
+    def _partitions(self, stream_id: str, start: float, end: float) -> List[Path]:
+        if not self.root.exists():
+            return []
+        days = sorted(p.name for p in self.root.iterdir() if p.is_dir())
+        first = datetime.fromtimestamp(start, timezone.utc).strftime("%Y-%m-%d") if start > float('-inf') else ""
+        last = datetime.fromtimestamp(end, timezone.utc).strftime("%Y-%m-%d") if end < float('inf') else "9999"
+        return [self.root / day / stream_id for day in days
+                if first <= day <= last and (self.root / day / stream_id).is_dir()]
+
+    def _segment(self, path: Path) -> _Segment:
+        segment = self._segments.get(path)
+        if segment is not None and segment.is_stale():
+            segment.close()
+            segment = None
+        if segment is None:
+            segment = _Segment(path)
+            self._segments[path] = segment
+            while len(self._segments) > self.max_open_segments:
+                self._segments.popitem(last=False)[1].close()
+        self._segments.move_to_end(path)
+        return segment
+
+    def iter_frames(self, stream_id: str, start: TimeLike = None, end: TimeLike = None,
+                    step: int = 1) -> Iterator[ArchivedFrame]:
+        """
+        Yield a stream's archived frames in time order, without decoding them
+
+        Args:
+            stream_id: Stream identifier
+            start: Earliest timestamp (datetime or epoch seconds), inclusive
+            end: Latest timestamp, inclusive
+            step: Yield every step-th frame
+        """
+        start_ts = _epoch(start, float('-inf'))
+        end_ts = _epoch(end, float('inf'))
+        position = 0
+
+        for directory in self._partitions(stream_id, start_ts, end_ts):
+            day_start = datetime.strptime(directory.parent.name, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+            for pack_path in sorted(directory.glob(f"*{PACK_SUFFIX}")):
+                # Skip whole hours outside the range without mapping them
+                hour_start = (day_start + timedelta(hours=int(pack_path.stem))).timestamp()
+                if hour_start > end_ts or hour_start + 3600 <= start_ts:
+                    continue
+                try:
+                    segment = self._segment(pack_path)
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Skipping unreadable frame segment {pack_path}: {e}")
+                    continue
+                for record in segment.range(start_ts, end_ts):
+                    if position % step == 0:
+                        yield ArchivedFrame(stream_id, int(record['frame_number']),
+                                            float(record['timestamp']), segment.data(record))
+                    position += 1
+
+            for frame in self._iter_files(directory, stream_id, start_ts, end_ts):
+                if position % step == 0:
+                    yield frame
+                position += 1
+
+    def _iter_files(self, directory: Path, stream_id: str, start: float, end: float) -> Iterator[ArchivedFrame]:
+        files = []
+        for entry in os.scandir(directory):
+            match = _FRAME_FILE.search(entry.name)
+            if match and entry.is_file():
+                mtime = entry.stat().st_mtime
+                if start <= mtime <= end:
+                    files.append((mtime, int(match.group(1)), entry.path))
+        for mtime, frame_number, path in sorted(files):
+            with open(path, 'rb') as f:
+                yield ArchivedFrame(stream_id, frame_number, mtime, memoryview(f.read()))
+
+    def read_batch(
+        self,
+        frames: List[ArchivedFrame],
+        out: Optional[np.ndarray] = None,
+        size: Optional[Tuple[int, int]] = None,
+        workers: int = 0
+    ) -> np.ndarray:
+        """
+        Decode frames into one (N, H, W, 3) uint8 array
+
+        Args:
+            frames: Frames from iter_frames
+            out: Preallocated array to decode into (reused between batches);
+                its first len(frames) rows are filled and returned
+            size: (width, height) to resize to; defaults to out's shape or the first frame's size
+            workers: Decode threads (OpenCV releases the GIL while decoding)
+        """
+        if not frames:
+            return out[:0] if out is not None else np.empty((0, 0, 0, 3), dtype=np.uint8)
+
+        if out is not None:
+            size = (out.shape[2], out.shape[1])
+        first = None
+        if size is None:
+            first = frames[0].decode()
+            size = (first.shape[1], first.shape[0])
+        if out is None or out.shape[0] < len(frames):
+            out = np.empty((len(frames), size[1], size[0], 3), dtype=np.uint8)
+
+        def decode_into(i: int):
+            image = first if i == 0 and first is not None else frames[i].decode()
+            if image.shape[1] == size[0] and image.shape[0] == size[1]:
+                out[i] = image
+            else:
+                cv2.resize(image, size, dst=out[i], interpolation=cv2.INTER_AREA)
+
+        if workers > 1 and len(frames) > 1:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="archive-decode") as pool:
+                list(pool.map(decode_into, range(len(frames))))
+        else:
+            for i in range(len(frames)):
+                decode_into(i)
+        return out[:len(frames)]
+
+    def iter_batches(
+        self,
+        stream_id: str,
+        start: TimeLike = None,
+        end: TimeLike = None,
+        batch_size: int = 32,
+        size: Optional[Tuple[int, int]] = None,
+        step: int = 1,
+        workers: int = 0
+    ) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Yield (images, timestamps, frame_numbers) batches for a time range
+
+        All batches share one preallocated image buffer, so copy anything
+        that must outlive the next iteration.
+        """
+        buffer: Optional[np.ndarray] = None
+        pending: List[ArchivedFrame] = []
+
+        def flush():
+            nonlocal buffer
+            images = self.read_batch(pending, out=buffer, size=size, workers=workers)
+            if buffer is None:
+                buffer = images  # first batch allocated it with batch_size rows
+            timestamps = np.array([f.timestamp for f in pending], dtype=np.float64)
+            numbers = np.array([f.frame_number for f in pending], dtype=np.int64)
+            return images, timestamps, numbers
+
+        for frame in self.iter_frames(stream_id, start, end, step=step):
+            pending.append(frame)
+            if len(pending) == batch_size:
+                yield flush()
+                pending = []
+        if pending:
+            yield flush()
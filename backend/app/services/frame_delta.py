@@ -0,0 +1,112 @@
+"""
+Compact Frame Deltas
+
+Encodes a stream of frame_data dicts as one header with the fields that
+never change (stream id, frame id prefix, processing config, start time)
+followed by small per-frame events carrying only the features whose
+quantized value changed since the previous frame.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+PROTOCOL_VERSION = 1
+
+# Decimal places kept per feature; anything else uses DEFAULT_PRECISION
+FEATURE_PRECISION = {
+    'mean_brightness': 1,
+    'std_brightness': 1,
+    'edge_density': 3,
+    'mean': 1,  # color_channels.*.mean / std are on the 0-255 scale too
+    'std': 1,
+}
+DEFAULT_PRECISION = 2
+
+# Per-frame fields that are either static (in the header) or redundant
+_SKIPPED_FEATURES = {'timestamp'}
+
+
+def flatten_features(features: Dict[str, Any], prefix: str = "") -> Dict[str, Any]:
+    """{'color_channels': {'blue': {'mean': 1}}} -> {'color_channels.blue.mean': 1}"""
+    flat = {}
+    for key, value in features.items():
+        if not prefix and key in _SKIPPED_FEATURES:
+            continue
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten_features(value, f"{name}."))
+        else:
+            flat[name] = value
+    return flat
+
+
+def quantize(name: str, value: Any) -> Any:
+    if isinstance(value, float):
+        leaf = name.rsplit('.', 1)[-1]
+        digits = FEATURE_PRECISION.get(name, FEATURE_PRECISION.get(leaf, DEFAULT_PRECISION))
+        rounded = round(value, digits)
+        return int(rounded) if digits == 0 else rounded
+    if isinstance(value, tuple):
+        return list(value)
+    return value
+
+
+class FrameDeltaEncoder:
+    """Turns frame_data dicts into a header and per-frame delta payloads for one subscriber"""
+
+    def __init__(self, stream_id: str, config: Dict[str, Any]):
+        self.stream_id = stream_id
+        self.config = config
+        self.started: Optional[datetime] = None
+        self._previous: Dict[str, Any] = {}
+
+    def header(self, first_frame: Dict[str, Any]) -> Dict[str, Any]:
+        self.started = datetime.fromisoformat(first_frame['timestamp'])
+        return {
+            'v': PROTOCOL_VERSION,
+            'stream_id': self.stream_id,
+            'frame_id_prefix': f"{self.stream_id}_frame_",
+            'start': first_frame['timestamp'],
+            'config': self.config,
+        }
+
+    def encode(self, frame_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Delta payload for one frame
+
+        Keys: n = frame number, t = ms since header start, f = changed
+        features (flattened, quantized), x = features that disappeared,
+        plus any of detections/tracks/motion/timings when present.
+        """
+        offset = datetime.fromisoformat(frame_data['timestamp']) - self.started
+        event: Dict[str, Any] = {
+            'n': frame_data['frame_number'],
+            't': int(offset.total_seconds() * 1000),
+        }
+
+        current = {
+            name: quantize(name, value)
+            for name, value in flatten_features(frame_data.get('features') or {}).items()
+        }
+        changed = {name: value for name, value in current.items() if self._previous.get(name) != value}
+        removed = [name for name in self._previous if name not in current]
+        self._previous = current
+        if changed:
+            event['f'] = changed
+        if removed:
+            event['x'] = removed
+
+        if frame_data.get('frame_path'):
+            event['p'] = frame_data['frame_path']
+        for key in ('detections', 'tracks', 'motion', 'timings'):
+            if frame_data.get(key) is not None:
+                event[key] = frame_data[key]
+        return event
+
+
+def apply_delta(state: Dict[str, Any], event: Dict[str, Any]) -> Dict[str, Any]:
+    """Client-side reconstruction of the flattened feature dict (reference implementation)"""
+    for name in event.get('x', ()):
+        state.pop(name, None)
+    state.update(event.get('f', {}))
+    return state
@@ -0,0 +1,202 @@
+"""
+Frame Encoder
+
+Shared image encoding stage of the frame pipeline. A processed frame is
+wrapped in an EncodedFrame once, and every consumer (the base64 payload,
+the frame archive, ...) asks it for bytes in an EncodeSpec. Each spec is
+encoded at most once per frame and the bytes are shared, so a frame that
+is both sent and archived is only encoded once.
+
+A spec either fixes the quality or sets a byte-size target. For a target,
+the quality is found by bisection between min_quality and quality,
+starting from the quality that fit the stream's previous frame:
+consecutive frames compress alike, so that first guess usually fits and
+costs a single encode. WebP is used when requested and OpenCV was built
+with a WebP writer, JPEG otherwise.
+"""
+
+import logging
+import threading
+from dataclasses import dataclass, replace
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from ..core.config import settings
+from ..core.metrics import FRAME_ENCODE_ATTEMPTS
+
+logger = logging.getLogger(__name__)
+
+ENCODE_FORMATS = {'jpeg': '.jpg', 'webp': '.webp'}
+
+# A size-targeted encode this far below the target is accepted without trying higher qualities
+TARGET_SLACK = 0.85
+
+_webp_supported: Optional[bool] = None
+
+
+def webp_supported() -> bool:
+    """Whether this OpenCV build can write WebP"""
+    global _webp_supported
+    if _webp_supported is None:
+        _webp_supported = bool(cv2.haveImageWriter('.webp'))
+        if not _webp_supported:
+            logger.warning("OpenCV has no WebP writer, WebP requests are encoded as JPEG")
+    return _webp_supported
+
+
+@dataclass(frozen=True)
+class EncodeSpec:
+    """How to encode a frame; hashable, so it keys the per-frame cache"""
+    format: str = 'jpeg'
+    quality: int = 85  # fixed quality, or the upper bound when target_bytes is set
+    target_bytes: int = 0  # > 0: highest quality in [min_quality, quality] whose output fits
+    min_quality: int = 40
+    progressive: bool = False
+
+    def __post_init__(self):
+        if self.format not in ENCODE_FORMATS:
+            raise ValueError(f"Unknown encode format: {self.format}")
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict] = None) -> "EncodeSpec":
+        """Payload spec from an extraction config's encode_* keys, defaulting to settings"""
+        config = config or {}
+        image_format = (config.get('encode_format') or settings.frame_encode_format).lower()
+        target_bytes = config.get('encode_target_bytes')
+        return cls(
+            format=image_format,
+            quality=config.get('encode_quality') or settings.frame_encode_quality,
+            target_bytes=target_bytes if target_bytes is not None else settings.frame_encode_target_bytes,
+            min_quality=settings.frame_encode_min_quality,
+        ).resolved()
+
+    def resolved(self) -> "EncodeSpec":
+        """This spec, with WebP replaced by JPEG when OpenCV cannot write it"""
+        if self.format == 'webp' and not webp_supported():
+            return replace(self, format='jpeg')
+        return self
+
+    @property
+    def extension(self) -> str:
+        return ENCODE_FORMATS[self.format]
+
+    def params(self, quality: int) -> List[int]:
+        if self.format == 'webp':
+            return [cv2.IMWRITE_WEBP_QUALITY, quality]
+        params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+        if self.progressive:
+            params += [cv2.IMWRITE_JPEG_PROGRESSIVE, 1]
+        return params
+
+
+class FrameEncoder:
+    """Encodes images to a spec, remembering per-stream qualities for byte targets"""
+
+    def __init__(self):
+        # (stream_id, spec) -> quality that fit the stream's last frame
+        self._last_quality: Dict[Tuple[str, EncodeSpec], int] = {}
+
+    def encode(self, image: np.ndarray, spec: EncodeSpec,
+               stream_id: Optional[str] = None) -> Tuple[np.ndarray, int]:
+        """
+        Encode an image
+
+        Args:
+            image: BGR image
+            spec: Format and quality or byte target
+            stream_id: Stream the image belongs to; warm-starts byte-target searches
+
+        Returns:
+            (encoded bytes as a 1-D uint8 array, quality used)
+        """
+        if spec.target_bytes <= 0:
+            return self._encode_once(image, spec, spec.quality), spec.quality
+
+        key = (stream_id, spec) if stream_id else None
+        lo, hi = spec.min_quality, spec.quality
+        quality = min(max(self._last_quality.get(key, hi), lo), hi)
+        best: Optional[Tuple[np.ndarray, int]] = None
+        smallest: Optional[Tuple[np.ndarray, int]] = None
+        attempts = 0
+        while lo <= hi:
+            buffer = self._encode_once(image, spec, quality)
+            attempts += 1
+            if buffer.size <= spec.target_bytes:
+                best = (buffer, quality)
+                if buffer.size >= spec.target_bytes * TARGET_SLACK:
+                    break
+                lo = quality + 1
+            else:
+                smallest = (buffer, quality)
+                hi = quality - 1
+            quality = (lo + hi + 1) // 2
+        FRAME_ENCODE_ATTEMPTS.observe(attempts)
+
+        # Nothing fits: the min_quality encode is as small as this spec allows
+        result = best or smallest
+        if key is not None:
+            self._last_quality[key] = result[1]
+        return result
+
+    def forget(self, stream_id: str):
+        for key in [k for k in self._last_quality if k[0] == stream_id]:
+            del self._last_quality[key]
+
+    @staticmethod
+    def _encode_once(image: np.ndarray, spec: EncodeSpec, quality: int) -> np.ndarray:
+        ok, buffer = cv2.imencode(spec.extension, image, spec.params(quality))
+        if not ok:
+            raise ValueError(f"{spec.format} encoding failed")
+        return buffer.reshape(-1)
+
+
+class EncodedFrame:
+    """
+    A frame and its encodings, each computed on first request
+
+    Encoded bytes are handed out as memoryviews of the encoder's output
+    array, so consumers (base64, file writes) read them without copies.
+    Safe to share between the event loop and the archive writer thread.
+    """
+
+    __slots__ = ('image', 'stream_id', 'spec', '_encoded', '_lock')
+
+    def __init__(self, image: np.ndarray, spec: Optional[EncodeSpec] = None,
+                 stream_id: Optional[str] = None):
+        self.image = image
+        self.spec = spec or EncodeSpec.from_config()  # the pipeline's payload spec
+        self.stream_id = stream_id
+        self._encoded: Dict[EncodeSpec, Tuple[np.ndarray, int]] = {}
+        self._lock = threading.Lock()
+
+    def has(self, spec: Optional[EncodeSpec] = None) -> bool:
+        return (spec or self.spec) in self._encoded
+
+    def get(self, spec: Optional[EncodeSpec] = None) -> memoryview:
+        """Encoded bytes for a spec (the payload spec by default)"""
+        return memoryview(self._get(spec or self.spec)[0])
+
+    def quality(self, spec: Optional[EncodeSpec] = None) -> int:
+        """Quality the spec was encoded at (differs from spec.quality for byte targets)"""
+        return self._get(spec or self.spec)[1]
+
+    def _get(self, spec: EncodeSpec) -> Tuple[np.ndarray, int]:
+        encoded = self._encoded.get(spec)
+        if encoded is None:
+            with self._lock:
+                encoded = self._encoded.get(spec)
+                if encoded is None:
+                    encoded = frame_encoder.encode(self.image, spec, self.stream_id)
+                    self._encoded[spec] = encoded
+        return encoded
+
+    def detach(self):
+        """Copy the image if it borrows a decoder buffer, so it can be encoded later"""
+        if not self.image.flags.owndata:
+            self.image = self.image.copy()
+
+
+# Global frame encoder instance
+frame_encoder = FrameEncoder()
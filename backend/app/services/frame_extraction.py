@@ -7,25 +7,35 @@ extraction intervals and frame processing options.
 """
 
 import asyncio
-import io
 import logging
 import time
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple, Union, AsyncGenerator
 import base64
-import hashlib
 
 import cv2
 import numpy as np
 from PIL import Image, ImageEnhance, ImageFilter
-import aiofiles
-import aiohttp
 
 from ..core.config import settings
+from ..core.metrics import record_cache_lookup
+from ..models.stream import StreamPurpose
+from .frame_archive import frame_archive
+from .frame_encoder import EncodedFrame, EncodeSpec, frame_encoder
+from .frame_profiling import FrameTimer, frame_profiler
+from .motion_regions import crop, motion_extractor
+from .object_detection import detection_service
+from .object_tracking import object_tracker
+from .thumbnails import thumbnail_service
+from .video_decoder import DecoderError, open_source
+from .youtube_service import youtube_service
 
 logger = logging.getLogger(__name__)
 
+# In replay mode, sampling intervals of at least this many frames seek instead of decoding through
+REPLAY_SEEK_MIN_FRAMES = 15
+
 class FrameExtractionError(Exception):
     """Custom exception for frame extraction errors"""
     pass
@@ -57,16 +67,26 @@ class FrameProcessor:
             }
         
         try:
+            # Downscale with OpenCV first so the colour conversion and PIL work on the small frame
+            resized = frame
+            if enhance_config.get('resize_target'):
+                target_width, target_height = enhance_config['resize_target']
+                height, width = frame.shape[:2]
+                scale = min(target_width / width, target_height / height)
+                if scale < 1:
+                    resized = cv2.resize(frame, (max(1, round(width * scale)), max(1, round(height * scale))),
+                                         interpolation=cv2.INTER_AREA)
+            
             # Convert to PIL Image for enhancement
-            if len(frame.shape) == 3:
+            if len(resized.shape) == 3:
                 # BGR to RGB conversion for OpenCV frames
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                frame_rgb = cv2.cvtColor(resized, cv2.COLOR_BGR2RGB)
             else:
-                frame_rgb = frame
+                frame_rgb = resized
                 
             pil_image = Image.fromarray(frame_rgb)
             
-            # Resize if needed (maintain aspect ratio)
+            # Resize if needed (maintain aspect ratio; a no-op after the downscale above)
             if enhance_config.get('resize_target'):
                 target_width, target_height = enhance_config['resize_target']
                 pil_image.thumbnail((target_width, target_height), Image.Resampling.LANCZOS)
@@ -145,13 +165,14 @@ class FrameProcessor:
     def _get_dominant_colors(self, frame: np.ndarray, k: int = 3) -> List[List[int]]:
         """Extract dominant colors using K-means clustering"""
         try:
-            # Reshape frame to be a list of pixels
-            data = frame.reshape((-1, 3))
-            data = np.float32(data)
-            
-            # Apply K-means clustering
-            criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 20, 1.0)
-            _, labels, centers = cv2.kmeans(data, k, None, criteria, 10, cv2.KMEANS_RANDOM_CENTERS)
+            with frame_profiler.stage('dominant_colors'):
+                # Reshape frame to be a list of pixels
+                data = frame.reshape((-1, 3))
+                data = np.float32(data)
+                
+                # Apply K-means clustering
+                criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 20, 1.0)
+                _, labels, centers = cv2.kmeans(data, k, None, criteria, 10, cv2.KMEANS_RANDOM_CENTERS)
             
             # Convert centers to integers and return as list
             centers = np.uint8(centers)
@@ -169,10 +190,6 @@ class VideoFrameExtractor:
         self.active_extractions: Dict[str, bool] = {}
         self.frame_cache: Dict[str, Dict] = {}
         self.max_cache_size = 100
-        
-        # Create frames directory if it doesn't exist
-        self.frames_dir = Path("frames")
-        self.frames_dir.mkdir(exist_ok=True)
     
     async def extract_frames_from_stream(
         self,
@@ -206,24 +223,65 @@ class VideoFrameExtractor:
         logger.info(f"Starting frame extraction for stream {stream_id}")
         
         try:
-            # Initialize video capture
-            cap = cv2.VideoCapture(stream_url)
-            
-            if not cap.isOpened():
-                raise FrameExtractionError(f"Failed to open video stream: {stream_url}")
+            # Frames are decoded no larger than this box
+            decode_size = self._decode_size(extraction_config)
+            if youtube_service.is_valid_youtube_url(stream_url):
+                # Analysis quality comes from settings unless the caller asked for a decode size
+                requested = extraction_config.get('decode_size')
+                hls_url = await youtube_service.get_hls_url(
+                    stream_url, StreamPurpose.ANALYSIS,
+                    target_height=requested[1] if requested else None
+                )
+                if not hls_url:
+                    raise FrameExtractionError(f"No HLS stream found for {stream_url}")
+                stream_url = hls_url
+            
+            # Initialize the decoder; the ffmpeg backend already drops frames down to the sampling rate.
+            # Opening probes the stream (and may start a subprocess), so keep it off the event loop
+            try:
+                cap = await asyncio.to_thread(
+                    open_source,
+                    stream_url,
+                    backend=extraction_config.get('decoder'),
+                    size=decode_size,
+                    output_fps=1 / extraction_config['interval_seconds']
+                )
+            except DecoderError as e:
+                raise FrameExtractionError(str(e))
             
             # Get stream properties
-            fps = cap.get(cv2.CAP_PROP_FPS) or 30
-            frame_interval = int(fps * extraction_config['interval_seconds'])
+            fps = cap.fps
+            frame_interval = max(1, int(fps * extraction_config['interval_seconds']))
             frame_count = 0
             extracted_count = 0
             
+            # Replay of local files: no pacing, timestamps follow the video position
+            replay = extraction_config.get('replay', False)
+            replay_start = extraction_config.get('replay_start') or datetime.utcnow()
+            seek = replay and cap.seekable and frame_interval >= REPLAY_SEEK_MIN_FRAMES
+            
             logger.info(f"Stream FPS: {fps}, Frame interval: {frame_interval}")
             
+            # Decode time of skipped frames is charged to the next extracted frame
+            timer = frame_profiler.start_frame(stream_id)
+            
             while (self.active_extractions.get(extraction_id, False) and 
                    extracted_count < extraction_config['max_frames']):
                 
-                ret, frame = cap.read()
+                with timer.stage('decode'):
+                    if seek and frame_count % frame_interval:
+                        # Jump to the next sampled frame instead of decoding the ones in between
+                        target = frame_count + frame_interval - frame_count % frame_interval
+                        if cap.seek(target):
+                            frame_count = target
+                        else:
+                            # Keep frame_count in step with the decoder by reading sequentially
+                            logger.warning(f"Seeking failed for {stream_id}, decoding sequentially")
+                            seek = False
+                    if cap.threaded_reads:
+                        ret, frame = await asyncio.to_thread(cap.read)
+                    else:
+                        ret, frame = cap.read()
                 
                 if not ret:
                     logger.warning("Failed to read frame, stream may have ended")
@@ -236,8 +294,11 @@ class VideoFrameExtractor:
                             frame, 
                             stream_id, 
                             extracted_count,
-                            extraction_config
+                            extraction_config,
+                            timer,
+                            timestamp=replay_start + timedelta(seconds=frame_count / fps) if replay else None
                         )
+                        timer = frame_profiler.start_frame(stream_id)
                         
                         if frame_data:
                             yield frame_data
@@ -250,7 +311,8 @@ class VideoFrameExtractor:
                 frame_count += 1
                 
                 # Small delay to prevent overwhelming the system
-                await asyncio.sleep(0.01)
+                if not replay:
+                    await asyncio.sleep(0.01)
             
         except Exception as e:
             logger.error(f"Frame extraction error for stream {stream_id}: {e}")
@@ -261,14 +323,28 @@ class VideoFrameExtractor:
             if 'cap' in locals():
                 cap.release()
             self.active_extractions.pop(extraction_id, None)
+            motion_extractor.reset(stream_id)
+            object_tracker.reset(stream_id)
+            frame_profiler.reset(stream_id)
             logger.info(f"Frame extraction completed for stream {stream_id}. Extracted {extracted_count} frames")
     
+    @staticmethod
+    def _decode_size(config: Dict) -> Optional[Tuple[int, int]]:
+        """Maximum (width, height) frames are decoded at, None for the source resolution"""
+        if config.get('decode_size'):
+            return tuple(config['decode_size'])
+        if settings.frame_decode_width or settings.frame_decode_height:
+            return settings.frame_decode_width or None, settings.frame_decode_height or None
+        return None
+    
     async def _process_frame(
         self, 
         frame: np.ndarray, 
         stream_id: str, 
         frame_number: int,
-        config: Dict
+        config: Dict,
+        timer: Optional[FrameTimer] = None,
+        timestamp: Optional[datetime] = None
     ) -> Optional[Dict]:
         """
         Process a single frame according to configuration
@@ -278,31 +354,76 @@ class VideoFrameExtractor:
             stream_id: Stream identifier
             frame_number: Frame sequence number
             config: Processing configuration
+            timer: Stage timer for this frame (e.g. already holding decode time)
+            timestamp: Capture time, defaults to now (replay passes the video position)
             
         Returns:
             Dictionary containing processed frame data
         """
+        timer = timer or frame_profiler.start_frame(stream_id)
         try:
             frame_id = f"{stream_id}_frame_{frame_number}"
-            timestamp = datetime.utcnow()
-            
-            # Enhance frame if requested
-            processed_frame = frame
-            if config.get('enhance_frames', False):
-                processed_frame = self.processor.enhance_frame(frame)
-            
-            # Extract features if requested
-            features = {}
-            if config.get('extract_features', False):
-                features = self.processor.extract_frame_features(processed_frame)
-            
-            # Convert frame to base64 for transmission
-            frame_base64 = self._frame_to_base64(processed_frame)
+            timer.frame_id = frame_id
+            timestamp = timestamp or datetime.utcnow()
+            
+            with frame_profiler.activate(timer):
+                # Enhance frame if requested
+                processed_frame = frame
+                if config.get('enhance_frames', False):
+                    with timer.stage('enhance'):
+                        processed_frame = self.processor.enhance_frame(frame)
+                
+                # Find changed regions so later stages can crop or skip static frames
+                motion = None
+                region = None
+                if config.get('motion_regions', False):
+                    with timer.stage('motion'):
+                        motion = motion_extractor.update(stream_id, processed_frame)
+                    # Keyframes are analyzed even on a still scene, so motionless subjects are re-checked
+                    if not motion.has_motion and not motion.keyframe and config.get('skip_static_frames', False):
+                        frame_profiler.finish(timer)
+                        return None
+                    if not motion.keyframe:
+                        region = motion.region
+                analysis_frame = crop(processed_frame, region) if region else processed_frame
+                
+                # Extract features if requested (includes the dominant_colors stage)
+                features = {}
+                if config.get('extract_features', False):
+                    with timer.stage('features'):
+                        features = self.processor.extract_frame_features(analysis_frame)
+                    if region:
+                        features['region'] = list(region)
+                
+                # Encode once; the payload and the archive share the bytes
+                encoded = EncodedFrame(processed_frame, self._encode_spec(config), stream_id)
+                with timer.stage('encode'):
+                    frame_base64 = self._frame_to_base64(encoded)
+                
+                # Latest frame doubles as the stream's thumbnail source (rate-limited inside)
+                thumbnail_service.update_frame(stream_id, processed_frame)
+                
+                # Save frame to disk if requested
+                frame_path = None
+                if config.get('save_frames', False):
+                    with timer.stage('save'):
+                        frame_path = self._save_frame(encoded, stream_id, frame_id, frame_number, timestamp)
+                
+                # Detect objects if requested; batched with other streams' frames
+                detections = None
+                if config.get('detect_objects', False):
+                    with timer.stage('detect'):
+                        detections = await self._detect_objects(
+                            analysis_frame, stream_id, timestamp, frame_path,
+                            offset=region[:2] if region else (0, 0)
+                        )
+                
+                # Link detections to the stream's tracks (times itself as the 'track' stage)
+                tracks = None
+                if detections is not None and config.get('track_objects', False):
+                    tracks = self._track_objects(stream_id, detections, timestamp)
             
-            # Save frame to disk if requested
-            frame_path = None
-            if config.get('save_frames', False):
-                frame_path = await self._save_frame(processed_frame, frame_id)
+            frame_profiler.finish(timer)
             
             frame_data = {
                 'frame_id': frame_id,
@@ -310,11 +431,27 @@ class VideoFrameExtractor:
                 'frame_number': frame_number,
                 'timestamp': timestamp.isoformat(),
                 'frame_base64': frame_base64,
+                'frame_encoding': {
+                    'format': encoded.spec.format,
+                    'quality': encoded.quality() if frame_base64 else None,
+                    'bytes': len(encoded.get()) if frame_base64 else 0,
+                },
                 'frame_path': str(frame_path) if frame_path else None,
                 'features': features,
                 'processing_config': config
             }
             
+            if motion is not None:
+                frame_data['motion'] = motion.to_dict()
+            
+            if detections is not None:
+                frame_data['detections'] = detections
+                if tracks is not None:
+                    frame_data['tracks'] = tracks
+            
+            if config.get('include_timings', False):
+                frame_data['timings'] = timer.timings
+            
             # Cache frame data
             self._cache_frame_data(frame_id, frame_data)
             
@@ -324,33 +461,57 @@ class VideoFrameExtractor:
             logger.error(f"Frame processing failed: {e}")
             return None
     
-    def _frame_to_base64(self, frame: np.ndarray, format: str = 'JPEG') -> str:
-        """Convert frame to base64 string"""
+    async def _detect_objects(
+        self,
+        frame: np.ndarray,
+        stream_id: str,
+        timestamp: datetime,
+        frame_path: Optional[Path],
+        offset: Tuple[int, int] = (0, 0)
+    ) -> Optional[List[Dict]]:
+        """Run the frame (or a crop of it at offset) through the shared detection service; boxes are full-frame"""
         try:
-            # Encode frame as JPEG
-            _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
-            
-            # Convert to base64
-            frame_base64 = base64.b64encode(buffer).decode('utf-8')
-            
-            return frame_base64
+            analysis = await detection_service.detect(
+                stream_id, frame, timestamp, str(frame_path) if frame_path else None, offset
+            )
+            return [detection.model_dump(mode='json') for detection in analysis.detections]
+        except Exception as e:
+            logger.error(f"Object detection failed for {stream_id}: {e}")
+            return None
+    
+    def _track_objects(self, stream_id: str, detections: List[Dict], timestamp: datetime) -> List[Dict]:
+        """Link this frame's detections to the stream's existing tracks"""
+        with frame_profiler.stage('track'):
+            boxes = np.array([d['bbox'] for d in detections], dtype=np.float32).reshape(-1, 4)
+            confidences = np.array([d['confidence'] for d in detections], dtype=np.float32)
+            return object_tracker.update_arrays(
+                stream_id, boxes, [d['class_name'] for d in detections], confidences,
+                timestamp.replace(tzinfo=timezone.utc).timestamp()
+            )
+    
+    @staticmethod
+    def _encode_spec(config: Dict) -> EncodeSpec:
+        """Payload encoding from config encode_* keys, else the frame_encode_* settings"""
+        try:
+            return EncodeSpec.from_config(config)
+        except ValueError as e:
+            logger.warning(f"{e}, using the default frame encoding")
+            return EncodeSpec.from_config()
+    
+    def _frame_to_base64(self, encoded: EncodedFrame) -> str:
+        """Convert frame to base64 string in its payload encoding"""
+        try:
+            return base64.b64encode(encoded.get()).decode('ascii')
             
         except Exception as e:
             logger.error(f"Frame to base64 conversion failed: {e}")
             return ""
     
-    async def _save_frame(self, frame: np.ndarray, frame_id: str) -> Optional[Path]:
-        """Save frame to disk"""
+    def _save_frame(self, encoded: EncodedFrame, stream_id: str, frame_id: str,
+                    frame_number: int, timestamp: datetime) -> Optional[Path]:
+        """Queue frame for the archive writer; disk I/O (and any extra encode) happen on its thread"""
         try:
-            frame_path = self.frames_dir / f"{frame_id}.jpg"
-            
-            # Save frame asynchronously
-            _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 90])
-            
-            async with aiofiles.open(frame_path, 'wb') as f:
-                await f.write(buffer.tobytes())
-            
-            return frame_path
+            return frame_archive.submit(stream_id, frame_id, frame_number, timestamp, encoded)
             
         except Exception as e:
             logger.error(f"Frame saving failed: {e}")
@@ -375,19 +536,23 @@ class VideoFrameExtractor:
         keys_to_remove = [key for key in self.active_extractions.keys() if key.startswith(stream_id)]
         for key in keys_to_remove:
             self.active_extractions[key] = False
+        frame_encoder.forget(stream_id)
         
         logger.info(f"Stopped frame extraction for stream {stream_id}")
     
     def get_cached_frame_data(self, frame_id: str) -> Optional[Dict]:
         """Retrieve cached frame data"""
-        return self.frame_cache.get(frame_id)
+        frame_data = self.frame_cache.get(frame_id)
+        record_cache_lookup('frame_data', hit=frame_data is not None)
+        return frame_data
     
     def get_extraction_status(self) -> Dict:
         """Get status of all active extractions"""
         return {
             'active_extractions': len([v for v in self.active_extractions.values() if v]),
             'cached_frames': len(self.frame_cache),
-            'extraction_ids': list(self.active_extractions.keys())
+            'extraction_ids': list(self.active_extractions.keys()),
+            'stage_timings': frame_profiler.get_stats()
         }
     
     async def extract_single_frame(self, stream_url: str, timestamp: Optional[float] = None) -> Optional[Dict]:
@@ -417,13 +582,17 @@ class VideoFrameExtractor:
             if not ret:
                 raise FrameExtractionError("Failed to read frame from stream")
             
-            # Process the frame
-            frame_data = await self._process_frame(
-                frame, 
-                f"single_{int(time.time())}", 
-                0,
-                {'enhance_frames': True, 'extract_features': True, 'save_frames': False}
-            )
+            # Process the frame; one-off IDs keep no profiling samples
+            single_id = f"single_{int(time.time())}"
+            try:
+                frame_data = await self._process_frame(
+                    frame, 
+                    single_id, 
+                    0,
+                    {'enhance_frames': True, 'extract_features': True, 'save_frames': False}
+                )
+            finally:
+                frame_profiler.reset(single_id)
             
             return frame_data
             
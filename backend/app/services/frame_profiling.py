@@ -0,0 +1,158 @@
+"""
+Frame Pipeline Profiling
+
+Records monotonic per-stage timings for every processed frame, keeps
+rolling percentiles per stream and forwards finished stages as spans to
+pluggable hooks (Prometheus by default, tracing backends on request).
+"""
+
+import logging
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, List, Optional
+
+from ..core.metrics import FRAME_STAGE_DURATION
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StageSpan:
+    """A single timed pipeline stage of one frame"""
+    stream_id: str
+    frame_id: Optional[str]
+    stage: str
+    start: float  # time.monotonic() at stage start
+    duration: float  # seconds
+
+
+@dataclass
+class FrameTimer:
+    """Collects stage timings for one frame"""
+    stream_id: str
+    frame_id: Optional[str] = None
+    spans: List[StageSpan] = field(default_factory=list)
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a block as the named stage; repeated stages accumulate"""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.spans.append(StageSpan(self.stream_id, self.frame_id, name, start, time.monotonic() - start))
+
+    @property
+    def timings(self) -> Dict[str, float]:
+        """Total milliseconds spent per stage"""
+        totals: Dict[str, float] = defaultdict(float)
+        for span in self.spans:
+            totals[span.stage] += span.duration * 1000
+        return {stage: round(ms, 3) for stage, ms in totals.items()}
+
+
+SpanHook = Callable[[StageSpan], None]
+
+# Timer of the frame currently being processed, so nested helpers can add stages
+_current_timer: ContextVar[Optional[FrameTimer]] = ContextVar('current_frame_timer', default=None)
+
+
+def prometheus_span_hook(span: StageSpan):
+    """Default hook exporting stage durations to Prometheus (per-stream breakdowns stay in get_stats)"""
+    FRAME_STAGE_DURATION.labels(stage=span.stage).observe(span.duration)
+
+
+class FrameProfiler:
+    """Per-stream rolling stage statistics and span hook dispatch"""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: Dict[str, Dict[str, Deque[float]]] = defaultdict(
+            lambda: defaultdict(lambda: deque(maxlen=self.window))
+        )
+        self._hooks: List[SpanHook] = [prometheus_span_hook]
+
+    def add_hook(self, hook: SpanHook):
+        """Register a callback receiving every finished StageSpan"""
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook: SpanHook):
+        if hook in self._hooks:
+            self._hooks.remove(hook)
+
+    def start_frame(self, stream_id: str) -> FrameTimer:
+        return FrameTimer(stream_id=stream_id)
+
+    @contextmanager
+    def activate(self, timer: FrameTimer):
+        """Make the timer current so stage() calls in nested code record into it"""
+        token = _current_timer.set(timer)
+        try:
+            yield timer
+        finally:
+            _current_timer.reset(token)
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a block against the current frame timer, if any"""
+        timer = _current_timer.get()
+        if timer is None:
+            yield
+            return
+        with timer.stage(name):
+            yield
+
+    def finish(self, timer: FrameTimer):
+        """Record a completed frame's stages and forward them to the hooks"""
+        for stage, ms in timer.timings.items():
+            self._samples[timer.stream_id][stage].append(ms)
+
+        for span in timer.spans:
+            span.frame_id = timer.frame_id
+            for hook in self._hooks:
+                try:
+                    hook(span)
+                except Exception as e:
+                    logger.error(f"Frame profiling hook failed: {e}")
+
+    def get_stats(self, stream_id: Optional[str] = None) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """
+        Rolling stage percentiles in milliseconds
+
+        Returns:
+            {stream_id: {stage: {'count', 'p50', 'p90', 'p99', 'max'}}}
+        """
+        stream_ids = [stream_id] if stream_id else list(self._samples)
+        stats = {}
+        for sid in stream_ids:
+            stats[sid] = {
+                stage: self._summarize(samples)
+                for stage, samples in self._samples.get(sid, {}).items() if samples
+            }
+        return stats
+
+    def reset(self, stream_id: str):
+        self._samples.pop(stream_id, None)
+
+    @staticmethod
+    def _summarize(samples: Deque[float]) -> Dict[str, float]:
+        ordered = sorted(samples)
+        last = len(ordered) - 1
+
+        def pct(p: float) -> float:
+            return round(ordered[min(last, int(round(p * last)))], 3)
+
+        return {
+            'count': len(ordered),
+            'p50': pct(0.50),
+            'p90': pct(0.90),
+            'p99': pct(0.99),
+            'max': round(ordered[-1], 3)
+        }
+
+
+# Global profiler instance
+frame_profiler = FrameProfiler()
@@ -0,0 +1,205 @@
+"""
+Motion Region Extraction
+
+Keeps a running-average background model per stream on a downscaled
+grayscale copy of each frame and reports bounding boxes of the regions
+that changed, so later stages can work on crops or skip static frames.
+"""
+
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+Box = Tuple[int, int, int, int]  # x1, y1, x2, y2 in full-frame pixels
+
+
+@dataclass
+class MotionResult:
+    """Changed regions of one frame"""
+    boxes: List[Box] = field(default_factory=list)
+    motion_ratio: float = 0.0  # fraction of pixels that changed
+    keyframe: bool = False  # process the full frame regardless of motion
+    shape: Optional[Tuple[int, int]] = None  # full-frame (height, width)
+
+    @property
+    def has_motion(self) -> bool:
+        return bool(self.boxes)
+
+    @property
+    def union(self) -> Optional[Box]:
+        """Smallest box covering every motion region"""
+        if not self.boxes:
+            return None
+        boxes = np.array(self.boxes)
+        return (int(boxes[:, 0].min()), int(boxes[:, 1].min()),
+                int(boxes[:, 2].max()), int(boxes[:, 3].max()))
+
+    @property
+    def region(self) -> Optional[Box]:
+        """Area to analyze: the whole frame on keyframes, else the motion union (None if static)"""
+        if self.keyframe and self.shape is not None:
+            height, width = self.shape
+            return (0, 0, width, height)
+        return self.union
+
+    def to_dict(self) -> Dict:
+        return {
+            'boxes': [list(box) for box in self.boxes],
+            'motion_ratio': round(self.motion_ratio, 4),
+            'has_motion': self.has_motion,
+            'keyframe': self.keyframe,
+            'region': list(self.region) if self.region else None
+        }
+
+
+@dataclass
+class _StreamBackground:
+    background: np.ndarray  # float32, downscaled grayscale
+    shape: Tuple[int, int]  # full-frame (height, width)
+    frames: int = 0
+    since_keyframe: int = 0
+
+
+class MotionRegionExtractor:
+    """Per-stream background subtraction producing changed-region boxes"""
+
+    def __init__(
+        self,
+        process_width: Optional[int] = None,
+        learning_rate: Optional[float] = None,
+        threshold: Optional[int] = None,
+        min_area_ratio: Optional[float] = None,
+        padding_ratio: float = 0.03,
+        scene_change_ratio: float = 0.6,
+        warmup_frames: int = 2,
+        keyframe_interval: Optional[int] = None
+    ):
+        self.process_width = process_width or settings.motion_process_width
+        self.learning_rate = learning_rate if learning_rate is not None else settings.motion_learning_rate
+        self.threshold = threshold or settings.motion_threshold
+        self.min_area_ratio = min_area_ratio if min_area_ratio is not None else settings.motion_min_area_ratio
+        self.padding_ratio = padding_ratio
+        self.scene_change_ratio = scene_change_ratio
+        self.warmup_frames = warmup_frames
+        self.keyframe_interval = keyframe_interval if keyframe_interval is not None \
+            else settings.motion_keyframe_interval
+        self._models: Dict[str, _StreamBackground] = {}
+        self._kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
+
+    def _prepare(self, frame: np.ndarray) -> Tuple[np.ndarray, float]:
+        """Downscaled, blurred grayscale copy and its scale relative to the frame"""
+        height, width = frame.shape[:2]
+        scale = min(1.0, self.process_width / width)
+        small = cv2.resize(frame, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA) \
+            if scale < 1.0 else frame
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        return cv2.GaussianBlur(gray, (5, 5), 0), scale
+
+    def update(self, stream_id: str, frame: np.ndarray) -> MotionResult:
+        """
+        Compare a frame against the stream's background and fold it in
+
+        Args:
+            stream_id: Stream the frame belongs to
+            frame: BGR (or grayscale) frame as numpy array
+
+        Returns:
+            MotionResult with boxes in full-frame coordinates
+        """
+        gray, scale = self._prepare(frame)
+        shape = frame.shape[:2]
+        model = self._models.get(stream_id)
+
+        # New stream or resolution change: start over and treat the frame as a keyframe
+        if model is None or model.shape != shape:
+            self._models[stream_id] = _StreamBackground(gray.astype(np.float32), shape, frames=1)
+            return self._full_frame(shape, keyframe=True)
+
+        diff = cv2.absdiff(gray, cv2.convertScaleAbs(model.background))
+        _, mask = cv2.threshold(diff, self.threshold, 255, cv2.THRESH_BINARY)
+        motion_ratio = float(cv2.countNonZero(mask)) / mask.size
+
+        model.frames += 1
+        model.since_keyframe += 1
+
+        # Camera moved, cut or exposure jump: the old background is useless
+        if motion_ratio >= self.scene_change_ratio:
+            model.background = gray.astype(np.float32)
+            model.since_keyframe = 0
+            return self._full_frame(shape, keyframe=True, motion_ratio=motion_ratio)
+
+        cv2.accumulateWeighted(gray, model.background, self.learning_rate)
+
+        if model.frames <= self.warmup_frames:
+            return self._full_frame(shape, keyframe=True, motion_ratio=motion_ratio)
+
+        keyframe = bool(self.keyframe_interval) and model.since_keyframe >= self.keyframe_interval
+        if keyframe:
+            model.since_keyframe = 0
+
+        mask = cv2.dilate(cv2.morphologyEx(mask, cv2.MORPH_OPEN, self._kernel), self._kernel, iterations=2)
+        return MotionResult(self._boxes(mask, scale, shape), motion_ratio, keyframe, shape)
+
+    def _boxes(self, mask: np.ndarray, scale: float, shape: Tuple[int, int]) -> List[Box]:
+        height, width = shape
+        min_area = self.min_area_ratio * mask.size
+        pad_x, pad_y = int(width * self.padding_ratio), int(height * self.padding_ratio)
+
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        boxes = []
+        for contour in contours:
+            if cv2.contourArea(contour) < min_area:
+                continue
+            x, y, w, h = cv2.boundingRect(contour)
+            boxes.append((
+                max(0, int(x / scale) - pad_x),
+                max(0, int(y / scale) - pad_y),
+                min(width, int((x + w) / scale) + pad_x),
+                min(height, int((y + h) / scale) + pad_y)
+            ))
+        return merge_boxes(boxes)
+
+    @staticmethod
+    def _full_frame(shape: Tuple[int, int], keyframe: bool, motion_ratio: float = 0.0) -> MotionResult:
+        height, width = shape
+        return MotionResult([(0, 0, width, height)], motion_ratio, keyframe, shape)
+
+    def reset(self, stream_id: str):
+        self._models.pop(stream_id, None)
+
+
+def merge_boxes(boxes: List[Box]) -> List[Box]:
+    """Merge overlapping or touching boxes until none overlap"""
+    merged = list(boxes)
+    changed = True
+    while changed and len(merged) > 1:
+        changed = False
+        result: List[Box] = []
+        for box in merged:
+            for i, other in enumerate(result):
+                if box[0] <= other[2] and other[0] <= box[2] and box[1] <= other[3] and other[1] <= box[3]:
+                    result[i] = (min(box[0], other[0]), min(box[1], other[1]),
+                                 max(box[2], other[2]), max(box[3], other[3]))
+                    changed = True
+                    break
+            else:
+                result.append(box)
+        merged = result
+    return merged
+
+
+def crop(frame: np.ndarray, box: Box) -> np.ndarray:
+    """View of the frame inside a box (no copy)"""
+    x1, y1, x2, y2 = box
+    return frame[y1:y2, x1:x2]
+
+
+# Global motion extractor instance
+motion_extractor = MotionRegionExtractor()
@@ -0,0 +1,354 @@
+"""
+Narration Service
+
+Turns the per-frame detections of each stream into short narrations.
+Detections are coalesced per stream over settings.narration_update_interval,
+summarized into a scene state (species, counts, behavior) and only narrated
+when that state differs from the last narrated one. Generated text is cached
+by (species set, behavior, style), LLM calls are bounded globally, and the
+time from frame capture to narration text is exported as a metric.
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ..core.config import settings
+from ..core.metrics import NARRATION_LATENCY, NARRATION_LLM_DURATION, NARRATION_REQUESTS, record_cache_lookup
+from ..models.stream import FrameAnalysis, NarrationResponse
+
+logger = logging.getLogger(__name__)
+
+STYLE_PROMPTS = {
+    'field-scientist': "You are a field scientist. Describe what the animals are doing precisely and factually.",
+    'safari-adventurer': "You are an enthusiastic safari guide. Describe the scene with energy and wonder.",
+    'calm-observer': "You are a calm nature observer. Describe the scene gently and slowly.",
+}
+
+
+class LLMClient:
+    """Minimal async text generation interface"""
+
+    name = "base"
+
+    async def generate(self, system: str, prompt: str, max_tokens: int) -> str:
+        raise NotImplementedError
+
+
+class OpenAIClient(LLMClient):
+    """OpenAI chat completions"""
+
+    name = "openai"
+
+    def __init__(self, model: Optional[str] = None, api_key: Optional[str] = None):
+        self.model = model or settings.default_llm_model
+        self.api_key = api_key or settings.openai_api_key
+        self._client = None
+
+    async def generate(self, system: str, prompt: str, max_tokens: int) -> str:
+        if self._client is None:
+            from openai import AsyncOpenAI
+            self._client = AsyncOpenAI(api_key=self.api_key)
+        response = await self._client.chat.completions.create(
+            model=self.model,
+            messages=[{'role': 'system', 'content': system}, {'role': 'user', 'content': prompt}],
+            max_tokens=max_tokens,
+            temperature=0.7
+        )
+        return (response.choices[0].message.content or "").strip()
+
+
+class FakeLLMClient(LLMClient):
+    """Deterministic local stand-in that echoes the scene after a configurable delay"""
+
+    name = "fake"
+
+    def __init__(self, latency: float = 0.2):
+        self.latency = latency
+        self.calls = 0
+
+    async def generate(self, system: str, prompt: str, max_tokens: int) -> str:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        scene = prompt.splitlines()[0].removeprefix("Scene: ")
+        return f"Right now we can see {scene}."
+
+
+def create_llm_client(backend: Optional[str] = None) -> LLMClient:
+    """Build the configured LLM client ('openai' or 'fake')"""
+    backend = (backend or settings.narration_llm_backend).lower()
+    if backend == 'fake':
+        return FakeLLMClient()
+    if backend == 'openai':
+        return OpenAIClient()
+    raise ValueError(f"Unknown narration LLM backend: {backend}")
+
+
+@dataclass(frozen=True)
+class SceneState:
+    """What a narration is about; equal states produce interchangeable narrations"""
+    species: Tuple[str, ...]
+    counts: Tuple[int, ...]  # bucketed count per species, same order
+    behavior: str
+
+    @property
+    def cache_key(self) -> Tuple[Tuple[str, ...], str]:
+        return self.species, self.behavior
+
+    def describe(self) -> str:
+        if not self.species:
+            return "no animals in view"
+        parts = []
+        for name, count in zip(self.species, self.counts):
+            parts.append(f"{'several' if count >= 3 else 'two' if count == 2 else 'one'} {name}")
+        return f"{', '.join(parts)} ({self.behavior})"
+
+
+def _count_bucket(count: int) -> int:
+    # 1, 2 and "3 or more" so a flickering extra detection doesn't count as a new scene
+    return min(count, 3)
+
+
+def summarize_scene(analyses: List[FrameAnalysis], min_confidence: float = 0.0) -> SceneState:
+    """Reduce a window of frame analyses to a scene state"""
+    max_counts: Dict[str, int] = {}
+    centers: Dict[str, List[Tuple[float, float, float]]] = {}
+
+    for analysis in analyses:
+        frame_counts: Dict[str, int] = {}
+        for detection in analysis.detections:
+            if detection.confidence < min_confidence:
+                continue
+            name = detection.class_name
+            frame_counts[name] = frame_counts.get(name, 0) + 1
+            x1, y1, x2, y2 = detection.bbox
+            size = max(x2 - x1, y2 - y1, 1.0)
+            centers.setdefault(name, []).append(((x1 + x2) / 2, (y1 + y2) / 2, size))
+        for name, count in frame_counts.items():
+            max_counts[name] = max(max_counts.get(name, 0), count)
+
+    species = tuple(sorted(max_counts))
+    if not species:
+        return SceneState((), (), "empty")
+
+    # Moving if any species' mean position shifted by more than half its box size
+    behavior = "resting"
+    for points in centers.values():
+        if len(points) < 2:
+            continue
+        half = max(1, len(points) // 2)
+        first, last = points[:half], points[-half:]
+        dx = sum(p[0] for p in last) / len(last) - sum(p[0] for p in first) / len(first)
+        dy = sum(p[1] for p in last) / len(last) - sum(p[1] for p in first) / len(first)
+        size = sum(p[2] for p in points) / len(points)
+        if (dx * dx + dy * dy) ** 0.5 > size / 2:
+            behavior = "moving"
+            break
+    if len(analyses) < 2:
+        behavior = "present"
+
+    return SceneState(species, tuple(_count_bucket(max_counts[s]) for s in species), behavior)
+
+
+@dataclass
+class _StreamWindow:
+    style: str
+    analyses: List[FrameAnalysis] = field(default_factory=list)
+    window_started: Optional[float] = None  # monotonic
+    last_scene: Optional[SceneState] = None
+    in_flight: bool = False
+
+
+NarrationListener = Callable[[NarrationResponse], Any]
+
+
+class NarrationScheduler:
+    """Per-stream detection coalescing in front of a rate-limited LLM"""
+
+    def __init__(
+        self,
+        client: Optional[LLMClient] = None,
+        interval: Optional[float] = None,
+        max_in_flight: Optional[int] = None,
+        cache_size: Optional[int] = None,
+        knowledge=None
+    ):
+        self._client = client
+        self.interval = interval if interval is not None else settings.narration_update_interval
+        self.max_in_flight = max_in_flight or settings.narration_max_in_flight
+        self.cache_size = cache_size or settings.narration_cache_size
+        self.knowledge = knowledge
+        self._windows: Dict[str, _StreamWindow] = {}
+        self._cache: "OrderedDict[Tuple, str]" = OrderedDict()
+        self._generating: Dict[Tuple, asyncio.Future] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._task: Optional[asyncio.Task] = None
+        self._pending: set = set()
+        self._listeners: List[NarrationListener] = []
+        self.latest: Dict[str, NarrationResponse] = {}
+
+    @property
+    def client(self) -> LLMClient:
+        if self._client is None:
+            self._client = create_llm_client()
+        return self._client
+
+    def add_listener(self, listener: NarrationListener):
+        """Register a callback (sync or async) receiving every NarrationResponse"""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: NarrationListener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def get_latest(self, stream_id: str) -> Optional[NarrationResponse]:
+        return self.latest.get(stream_id)
+
+    def set_style(self, stream_id: str, style: str):
+        self._window(stream_id).style = style
+
+    def forget(self, stream_id: str):
+        self._windows.pop(stream_id, None)
+        self.latest.pop(stream_id, None)
+
+    def _window(self, stream_id: str) -> _StreamWindow:
+        window = self._windows.get(stream_id)
+        if window is None:
+            window = self._windows[stream_id] = _StreamWindow(style=settings.default_narration_style)
+        return window
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for task in list(self._pending):
+            task.cancel()
+        await asyncio.gather(*self._pending, return_exceptions=True)
+
+    def submit(self, analysis: FrameAnalysis):
+        """Add a frame's detections to its stream's current window"""
+        window = self._window(analysis.stream_id)
+        if window.window_started is None:
+            window.window_started = time.monotonic()
+        window.analyses.append(analysis)
+
+    async def _run(self):
+        tick = min(0.25, self.interval / 4) if self.interval else 0.25
+        while True:
+            await asyncio.sleep(tick)
+            now = time.monotonic()
+            for stream_id, window in list(self._windows.items()):
+                # A stream with a narration still in flight keeps coalescing
+                if window.in_flight or window.window_started is None:
+                    continue
+                if now - window.window_started < self.interval:
+                    continue
+                analyses, window.analyses, window.window_started = window.analyses, [], None
+                task = asyncio.create_task(self._narrate(stream_id, window, analyses))
+                self._pending.add(task)
+                task.add_done_callback(self._pending.discard)
+
+    async def _narrate(self, stream_id: str, window: _StreamWindow, analyses: List[FrameAnalysis]):
+        scene = summarize_scene(analyses, settings.narration_min_confidence)
+        if scene == window.last_scene or not scene.species:
+            NARRATION_REQUESTS.labels(result='unchanged').inc()
+            return
+
+        window.in_flight = True
+        try:
+            key = (scene.cache_key, window.style)
+            text = self._cache.get(key)
+            record_cache_lookup('narration', hit=text is not None)
+            if text is not None:
+                self._cache.move_to_end(key)
+                NARRATION_REQUESTS.labels(result='cached').inc()
+            elif key in self._generating:
+                # Another stream is already generating this exact narration
+                text = await asyncio.shield(self._generating[key])
+                if text is None:
+                    return
+                NARRATION_REQUESTS.labels(result='cached').inc()
+            else:
+                future = asyncio.get_running_loop().create_future()
+                self._generating[key] = future
+                text = None
+                try:
+                    text = await self._generate(scene, window.style)
+                finally:
+                    self._generating.pop(key, None)
+                    future.set_result(text)
+                if text is None:
+                    return
+                self._cache[key] = text
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+                NARRATION_REQUESTS.labels(result='generated').inc()
+
+            window.last_scene = scene
+            # Frame-to-text: from the newest frame narrated, and from the first frame of the window
+            now = time.time()
+            NARRATION_LATENCY.labels(since='last_frame').observe(max(0.0, now - analyses[-1].frame_timestamp))
+            NARRATION_LATENCY.labels(since='window_start').observe(max(0.0, now - analyses[0].frame_timestamp))
+
+            response = NarrationResponse(stream_id=stream_id, text=text, style=window.style)
+            self.latest[stream_id] = response
+            await self._notify(response)
+        finally:
+            window.in_flight = False
+
+    async def _generate(self, scene: SceneState, style: str) -> Optional[str]:
+        system = STYLE_PROMPTS.get(style, STYLE_PROMPTS['field-scientist'])
+        system += f" Answer in one or two sentences, at most {settings.max_narration_length} characters."
+
+        lines = [f"Scene: {scene.describe()}"]
+        if self.knowledge is not None:
+            for name in scene.species:
+                try:
+                    facts = await self.knowledge.query_async(name, scene.behavior, k=1)
+                except Exception as e:
+                    logger.warning(f"Knowledge lookup failed for {name}: {e}")
+                    continue
+                lines.extend(f"Fact: {entry.text}" for entry, _ in facts)
+        prompt = "\n".join(lines)
+
+        async with self._semaphore:
+            start = time.monotonic()
+            try:
+                text = await self.client.generate(system, prompt, max_tokens=settings.max_narration_length // 3)
+            except Exception as e:
+                NARRATION_REQUESTS.labels(result='error').inc()
+                logger.error(f"Narration generation failed: {e}")
+                return None
+            finally:
+                NARRATION_LLM_DURATION.observe(time.monotonic() - start)
+        return text[:settings.max_narration_length]
+
+    async def _notify(self, response: NarrationResponse):
+        for listener in self._listeners:
+            try:
+                result = listener(response)
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                logger.error(f"Narration listener failed: {e}")
+
+
+def _default_knowledge():
+    if not settings.narration_use_knowledge:
+        return None
+    from .vector_index import knowledge_index
+    return knowledge_index
+
+
+# Global narration scheduler instance
+narration_scheduler = NarrationScheduler(knowledge=_default_knowledge())
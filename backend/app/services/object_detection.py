@@ -0,0 +1,510 @@
+"""
+Object Detection Service
+
+Collects frames from every active stream into dynamically sized batches,
+bounded by a maximum batch size and a maximum queueing latency, runs them
+through a pluggable CPU detector backend and emits a FrameAnalysis per frame.
+"""
+
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from ..core.config import settings
+from ..core.metrics import DETECTION_BATCH_SIZE, DETECTION_INFERENCE_DURATION, DETECTION_QUEUE_WAIT
+from ..models.stream import DetectionResult, FrameAnalysis
+
+# cv2 and numpy are only needed by the ONNX backend at runtime and are imported there
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# (class_name, confidence, [x1, y1, x2, y2]) in source frame pixels
+RawDetection = Tuple[str, float, List[float]]
+
+# Class names of the COCO-trained YOLOv8 checkpoints, used when an ONNX
+# export carries no names metadata
+COCO_CLASSES = [
+    'person', 'bicycle', 'car', 'motorcycle', 'airplane', 'bus', 'train', 'truck', 'boat',
+    'traffic light', 'fire hydrant', 'stop sign', 'parking meter', 'bench', 'bird', 'cat', 'dog',
+    'horse', 'sheep', 'cow', 'elephant', 'bear', 'zebra', 'giraffe', 'backpack', 'umbrella',
+    'handbag', 'tie', 'suitcase', 'frisbee', 'skis', 'snowboard', 'sports ball', 'kite',
+    'baseball bat', 'baseball glove', 'skateboard', 'surfboard', 'tennis racket', 'bottle',
+    'wine glass', 'cup', 'fork', 'knife', 'spoon', 'bowl', 'banana', 'apple', 'sandwich', 'orange',
+    'broccoli', 'carrot', 'hot dog', 'pizza', 'donut', 'cake', 'chair', 'couch', 'potted plant',
+    'bed', 'dining table', 'toilet', 'tv', 'laptop', 'mouse', 'remote', 'keyboard', 'cell phone',
+    'microwave', 'oven', 'toaster', 'sink', 'refrigerator', 'book', 'clock', 'vase', 'scissors',
+    'teddy bear', 'hair drier', 'toothbrush'
+]
+
+
+class DetectionError(Exception):
+    """Raised when a detector backend cannot be loaded or fails on a batch"""
+    pass
+
+
+class DetectorBackend:
+    """Base class for detectors; detect_batch runs on a worker thread"""
+
+    name = "base"
+
+    def load(self):
+        """Load model weights; called once, off the event loop, before the first batch"""
+        pass
+
+    def detect_batch(self, frames: Sequence["np.ndarray"]) -> List[List[RawDetection]]:
+        """Detect objects in BGR frames, returning one detection list per frame"""
+        raise NotImplementedError
+
+
+class StubDetector(DetectorBackend):
+    """
+    Deterministic detector for tests and benchmarks
+
+    Returns the same detections for every frame, scaled to the frame size,
+    and optionally sleeps to mimic inference cost.
+    """
+
+    name = "stub"
+
+    def __init__(
+        self,
+        detections: Optional[List[RawDetection]] = None,
+        batch_delay: float = 0.0,
+        frame_delay: float = 0.0
+    ):
+        # Boxes are given in relative [0, 1] coordinates
+        self.detections = detections if detections is not None else [('bird', 0.9, [0.25, 0.25, 0.5, 0.5])]
+        self.batch_delay = batch_delay
+        self.frame_delay = frame_delay
+
+    def detect_batch(self, frames: Sequence["np.ndarray"]) -> List[List[RawDetection]]:
+        delay = self.batch_delay + self.frame_delay * len(frames)
+        if delay:
+            time.sleep(delay)
+
+        results = []
+        for frame in frames:
+            height, width = frame.shape[:2]
+            results.append([
+                (name, conf, [x1 * width, y1 * height, x2 * width, y2 * height])
+                for name, conf, (x1, y1, x2, y2) in self.detections
+            ])
+        return results
+
+
+class UltralyticsDetector(DetectorBackend):
+    """YOLOv8 through the ultralytics package, on CPU"""
+
+    name = "ultralytics"
+
+    def __init__(self, model_path: str, confidence: float = 0.35, image_size: int = 640):
+        self.model_path = model_path
+        self.confidence = confidence
+        self.image_size = image_size
+        self.model = None
+
+    def load(self):
+        try:
+            from ultralytics import YOLO
+        except ImportError as e:
+            raise DetectionError("ultralytics is not installed") from e
+        self.model = YOLO(self.model_path)
+
+    def detect_batch(self, frames: Sequence["np.ndarray"]) -> List[List[RawDetection]]:
+        results = self.model.predict(
+            list(frames), imgsz=self.image_size, conf=self.confidence, device='cpu', verbose=False
+        )
+        batch = []
+        for result in results:
+            boxes = result.boxes
+            names = result.names
+            batch.append([
+                (names[int(cls)], float(conf), [float(v) for v in xyxy])
+                for xyxy, conf, cls in zip(boxes.xyxy.tolist(), boxes.conf.tolist(), boxes.cls.tolist())
+            ])
+        return batch
+
+
+class OnnxDetector(DetectorBackend):
+    """YOLOv8 exported to ONNX, run with onnxruntime on CPU"""
+
+    name = "onnx"
+
+    def __init__(
+        self,
+        model_path: str,
+        confidence: float = 0.35,
+        iou_threshold: float = 0.45,
+        image_size: int = 640,
+        threads: int = 0
+    ):
+        self.model_path = model_path
+        self.confidence = confidence
+        self.iou_threshold = iou_threshold
+        self.image_size = image_size
+        self.threads = threads
+        self.session = None
+        self.input_name = None
+        self.class_names = COCO_CLASSES
+        self.dynamic_batch = True
+
+    def load(self):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise DetectionError("onnxruntime is not installed") from e
+
+        options = ort.SessionOptions()
+        if self.threads:
+            options.intra_op_num_threads = self.threads
+        self.session = ort.InferenceSession(self.model_path, options, providers=['CPUExecutionProvider'])
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.dynamic_batch = not isinstance(model_input.shape[0], int)
+
+        # ultralytics exports store the class names as a dict literal in the metadata
+        names = self.session.get_modelmeta().custom_metadata_map.get('names')
+        if names:
+            import ast
+            parsed = ast.literal_eval(names)
+            self.class_names = [parsed[i] for i in sorted(parsed)]
+
+    def _letterbox(self, frame: "np.ndarray") -> Tuple["np.ndarray", float, Tuple[float, float]]:
+        import cv2
+        import numpy as np
+
+        height, width = frame.shape[:2]
+        scale = min(self.image_size / width, self.image_size / height)
+        new_w, new_h = int(round(width * scale)), int(round(height * scale))
+        resized = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+
+        canvas = np.full((self.image_size, self.image_size, 3), 114, dtype=np.uint8)
+        pad_x, pad_y = (self.image_size - new_w) / 2, (self.image_size - new_h) / 2
+        top, left = int(round(pad_y - 0.1)), int(round(pad_x - 0.1))
+        canvas[top:top + new_h, left:left + new_w] = resized
+        return canvas, scale, (left, top)
+
+    def detect_batch(self, frames: Sequence["np.ndarray"]) -> List[List[RawDetection]]:
+        import numpy as np
+
+        prepared = [self._letterbox(frame) for frame in frames]
+        blob = np.stack([p[0] for p in prepared])[..., ::-1]  # BGR -> RGB
+        blob = np.ascontiguousarray(blob.transpose(0, 3, 1, 2), dtype=np.float32) / 255.0
+
+        if self.dynamic_batch:
+            outputs = self.session.run(None, {self.input_name: blob})[0]
+        else:
+            outputs = np.concatenate([
+                self.session.run(None, {self.input_name: blob[i:i + 1]})[0] for i in range(len(frames))
+            ])
+
+        return [
+            self._postprocess(output, scale, pad, frame.shape[:2])
+            for output, (_, scale, pad), frame in zip(outputs, prepared, frames)
+        ]
+
+    def _postprocess(self, output: "np.ndarray", scale: float, pad: Tuple[float, float],
+                     shape: Tuple[int, int]) -> List[RawDetection]:
+        import cv2
+        import numpy as np
+
+        # YOLOv8 output is (4 + num_classes, num_anchors) with cx, cy, w, h boxes
+        predictions = output.T
+        scores = predictions[:, 4:]
+        class_ids = scores.argmax(axis=1)
+        confidences = scores[np.arange(len(scores)), class_ids]
+        keep = confidences >= self.confidence
+        if not keep.any():
+            return []
+
+        boxes = predictions[keep, :4]
+        confidences = confidences[keep]
+        class_ids = class_ids[keep]
+
+        xywh = np.column_stack([boxes[:, 0] - boxes[:, 2] / 2, boxes[:, 1] - boxes[:, 3] / 2,
+                                boxes[:, 2], boxes[:, 3]])
+        indices = cv2.dnn.NMSBoxes(xywh.tolist(), confidences.tolist(), self.confidence, self.iou_threshold)
+
+        height, width = shape
+        detections = []
+        for i in np.array(indices).flatten():
+            x, y, w, h = xywh[i]
+            x1 = float(np.clip((x - pad[0]) / scale, 0, width))
+            y1 = float(np.clip((y - pad[1]) / scale, 0, height))
+            x2 = float(np.clip((x + w - pad[0]) / scale, 0, width))
+            y2 = float(np.clip((y + h - pad[1]) / scale, 0, height))
+            class_id = int(class_ids[i])
+            name = self.class_names[class_id] if class_id < len(self.class_names) else str(class_id)
+            detections.append((name, float(confidences[i]), [x1, y1, x2, y2]))
+        return detections
+
+
+def create_detector(backend: Optional[str] = None, model_path: Optional[str] = None) -> DetectorBackend:
+    """Build the configured detector backend ('ultralytics', 'onnx' or 'stub')"""
+    backend = (backend or settings.detection_backend).lower()
+    model_path = model_path or settings.yolo_model_path
+
+    if backend == 'stub':
+        return StubDetector()
+    if backend == 'onnx':
+        if Path(model_path).suffix != '.onnx':
+            model_path = str(Path(model_path).with_suffix('.onnx'))
+        return OnnxDetector(model_path, settings.detection_confidence, image_size=settings.detection_image_size)
+    if backend == 'ultralytics':
+        return UltralyticsDetector(model_path, settings.detection_confidence, settings.detection_image_size)
+    raise DetectionError(f"Unknown detection backend: {backend}")
+
+
+def _epoch_seconds(timestamp: datetime) -> float:
+    # The frame pipeline stamps frames with naive datetime.utcnow()
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.timestamp()
+
+
+def _translate(bbox: List[float], offset: Tuple[int, int]) -> List[float]:
+    dx, dy = offset
+    if not (dx or dy):
+        return bbox
+    x1, y1, x2, y2 = bbox
+    return [x1 + dx, y1 + dy, x2 + dx, y2 + dy]
+
+
+@dataclass
+class _PendingFrame:
+    stream_id: str
+    frame: "np.ndarray"
+    frame_timestamp: datetime
+    frame_path: Optional[str]
+    future: asyncio.Future
+    offset: Tuple[int, int] = (0, 0)  # position of a cropped frame in the full frame
+    enqueued: float = field(default_factory=time.monotonic)
+
+
+AnalysisListener = Callable[[FrameAnalysis], Any]
+
+
+class DetectionService:
+    """Cross-stream dynamic batching in front of a detector backend"""
+
+    def __init__(
+        self,
+        backend: Optional[DetectorBackend] = None,
+        max_batch_size: Optional[int] = None,
+        max_latency: Optional[float] = None,
+        max_queue_size: Optional[int] = None
+    ):
+        self._backend = backend
+        self.max_batch_size = max_batch_size or settings.detection_max_batch_size
+        self.max_latency = max_latency if max_latency is not None else settings.detection_max_latency_ms / 1000
+        self.max_queue_size = max_queue_size or settings.detection_max_queue_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        # One inference thread; the backends parallelise internally
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="detector")
+        self._loaded = False
+        self._load_failed_at: Optional[float] = None
+        self._load_error: Optional[Exception] = None
+        self.load_retry_seconds = settings.detection_load_retry_seconds
+        self._listeners: List[AnalysisListener] = []
+        self._listener_tasks: set = set()
+        self.latest: Dict[str, FrameAnalysis] = {}
+
+    @property
+    def backend(self) -> DetectorBackend:
+        if self._backend is None:
+            self._backend = create_detector()
+        return self._backend
+
+    def add_listener(self, listener: AnalysisListener):
+        """Register a callback (sync or async) receiving every FrameAnalysis"""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: AnalysisListener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def get_latest_analysis(self, stream_id: str) -> Optional[FrameAnalysis]:
+        return self.latest.get(stream_id)
+
+    def forget(self, stream_id: str):
+        self.latest.pop(stream_id, None)
+
+    def start(self):
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+        for task in list(self._listener_tasks):
+            task.cancel()
+        await asyncio.gather(*self._listener_tasks, return_exceptions=True)
+
+        # Fail anything still queued so callers don't wait forever
+        while self._queue and not self._queue.empty():
+            self._fail([self._queue.get_nowait()], DetectionError("Detection service stopped"))
+
+    async def detect(
+        self,
+        stream_id: str,
+        frame: "np.ndarray",
+        frame_timestamp: Optional[datetime] = None,
+        frame_path: Optional[str] = None,
+        offset: Tuple[int, int] = (0, 0)
+    ) -> FrameAnalysis:
+        """
+        Queue a frame for the next batch and wait for its analysis
+
+        Args:
+            stream_id: Stream the frame came from
+            frame: BGR frame as numpy array
+            frame_timestamp: When the frame was captured (naive UTC, defaults to now)
+            frame_path: Saved frame location, if any
+            offset: (x, y) of the frame within the full frame when it is a crop
+
+        Returns:
+            FrameAnalysis with the frame's detections, in full-frame coordinates
+        """
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(_PendingFrame(
+            stream_id, frame, frame_timestamp or datetime.utcnow(), frame_path, future, offset
+        ))
+        return await future
+
+    async def _next_batch(self) -> List[_PendingFrame]:
+        """Block for one frame, then gather more until the batch is full or the oldest frame's deadline"""
+        batch = [await self._queue.get()]
+        deadline = batch[0].enqueued + self.max_latency
+
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    def _infer(self, frames: List["np.ndarray"]) -> List[List[RawDetection]]:
+        if not self._loaded:
+            self._load()
+        return self.backend.detect_batch(frames)
+
+    def _load(self):
+        """Load the backend, remembering a failure so batches don't retry it until the cooldown passes"""
+        if self._load_failed_at is not None:
+            remaining = self._load_failed_at + self.load_retry_seconds - time.monotonic()
+            if remaining > 0:
+                raise DetectionError(f"Detector unavailable ({self._load_error}), retrying in {remaining:.0f}s")
+
+        logger.info(f"Loading {self.backend.name} detector")
+        try:
+            self.backend.load()
+        except Exception as e:
+            self._load_failed_at = time.monotonic()
+            self._load_error = e
+            logger.error(f"Loading {self.backend.name} detector failed, retrying in "
+                         f"{self.load_retry_seconds:.0f}s: {e}")
+            raise
+        self._loaded = True
+        self._load_failed_at = None
+        self._load_error = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            batch = [p for p in batch if not p.future.cancelled()]
+            if not batch:
+                continue
+
+            started = time.monotonic()
+            for pending in batch:
+                DETECTION_QUEUE_WAIT.observe(started - pending.enqueued)
+            DETECTION_BATCH_SIZE.observe(len(batch))
+
+            try:
+                results = list(await loop.run_in_executor(self._executor, self._infer, [p.frame for p in batch]))
+            except Exception as e:
+                logger.error(f"Detection batch of {len(batch)} failed: {e}")
+                self._fail(batch, DetectionError(str(e)))
+                continue
+            DETECTION_INFERENCE_DURATION.observe(time.monotonic() - started)
+
+            if len(results) != len(batch):
+                logger.error(f"{self.backend.name} detector returned {len(results)} results "
+                             f"for a batch of {len(batch)}")
+                self._fail(batch[len(results):], DetectionError("Detector returned no result for this frame"))
+
+            for pending, raw in zip(batch, results):
+                try:
+                    analysis = FrameAnalysis(
+                        stream_id=pending.stream_id,
+                        frame_timestamp=_epoch_seconds(pending.frame_timestamp),
+                        detections=[
+                            DetectionResult(class_name=name, confidence=conf,
+                                            bbox=_translate(bbox, pending.offset),
+                                            timestamp=pending.frame_timestamp)
+                            for name, conf, bbox in raw
+                        ],
+                        frame_path=pending.frame_path
+                    )
+                except Exception as e:
+                    logger.error(f"Invalid detections for {pending.stream_id}: {e}")
+                    self._fail([pending], DetectionError(str(e)))
+                    continue
+                self.latest[pending.stream_id] = analysis
+                if not pending.future.done():
+                    pending.future.set_result(analysis)
+                self._notify(analysis)
+
+    @staticmethod
+    def _fail(batch: List[_PendingFrame], error: Exception):
+        for pending in batch:
+            if not pending.future.done():
+                pending.future.set_exception(error)
+
+    def _notify(self, analysis: FrameAnalysis):
+        """Call the listeners; async ones run as tasks so they don't hold up the next batch"""
+        for listener in self._listeners:
+            try:
+                result = listener(analysis)
+            except Exception as e:
+                logger.error(f"Detection listener failed: {e}")
+                continue
+            if asyncio.iscoroutine(result):
+                task = asyncio.create_task(self._await_listener(result))
+                self._listener_tasks.add(task)
+                task.add_done_callback(self._listener_tasks.discard)
+
+    @staticmethod
+    async def _await_listener(result):
+        try:
+            await result
+        except Exception as e:
+            logger.error(f"Detection listener failed: {e}")
+
+
+# Global detection service instance
+detection_service = DetectionService()
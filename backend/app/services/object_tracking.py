@@ -0,0 +1,318 @@
+"""
+Multi-Object Tracking
+
+SORT-style tracker linking detections across frames: a constant-velocity
+Kalman filter predicts every track, predictions are matched to new
+detections by class-aware IoU and unmatched detections start new tracks.
+
+Per-stream track state lives in flat NumPy arrays (one row per track) so
+prediction, matching and updates are vectorised over all tracks, and each
+track keeps a fixed-size ring buffer of recent boxes.
+"""
+
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..core.config import settings
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:  # scipy is optional; greedy matching is used without it
+    linear_sum_assignment = None
+
+logger = logging.getLogger(__name__)
+
+# State is [cx, cy, area, aspect, vx, vy, v_area]; measurements are [cx, cy, area, aspect]
+_F = np.eye(7, dtype=np.float32)
+_F[0, 4] = _F[1, 5] = _F[2, 6] = 1.0
+_H = np.eye(4, 7, dtype=np.float32)
+_Q = np.diag([1.0, 1.0, 1.0, 1.0, 0.01, 0.01, 1e-4]).astype(np.float32)
+_R = np.diag([1.0, 1.0, 10.0, 10.0]).astype(np.float32)
+_P0 = np.diag([10.0, 10.0, 10.0, 10.0, 1e4, 1e4, 1e4]).astype(np.float32)
+_I7 = np.eye(7, dtype=np.float32)
+
+
+def boxes_to_measurements(boxes: np.ndarray) -> np.ndarray:
+    """[x1, y1, x2, y2] rows to [cx, cy, area, aspect] rows"""
+    w = boxes[:, 2] - boxes[:, 0]
+    h = boxes[:, 3] - boxes[:, 1]
+    return np.column_stack([
+        boxes[:, 0] + w / 2, boxes[:, 1] + h / 2, w * h, w / np.maximum(h, 1e-6)
+    ]).astype(np.float32)
+
+
+def states_to_boxes(states: np.ndarray) -> np.ndarray:
+    """Kalman states to [x1, y1, x2, y2] rows"""
+    area = np.maximum(states[:, 2], 0.0)
+    w = np.sqrt(area * np.maximum(states[:, 3], 1e-6))
+    h = area / np.maximum(w, 1e-6)
+    return np.column_stack([
+        states[:, 0] - w / 2, states[:, 1] - h / 2, states[:, 0] + w / 2, states[:, 1] + h / 2
+    ])
+
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU between box rows of a (N, 4) and b (M, 4)"""
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-6)
+
+
+def assign(iou: np.ndarray, threshold: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Match rows (tracks) to columns (detections) maximising IoU
+
+    Returns:
+        (track_indices, detection_indices) of the accepted pairs
+    """
+    if iou.size == 0:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+
+    if linear_sum_assignment is not None:
+        rows, cols = linear_sum_assignment(-iou)
+    else:
+        # Greedy: take the best remaining pair until nothing clears the threshold
+        order = np.argsort(-iou, axis=None)
+        used_rows, used_cols, rows, cols = set(), set(), [], []
+        for flat in order:
+            r, c = divmod(int(flat), iou.shape[1])
+            if iou[r, c] < threshold:
+                break
+            if r in used_rows or c in used_cols:
+                continue
+            used_rows.add(r)
+            used_cols.add(c)
+            rows.append(r)
+            cols.append(c)
+        rows, cols = np.array(rows, dtype=np.intp), np.array(cols, dtype=np.intp)
+
+    keep = iou[rows, cols] >= threshold
+    return rows[keep], cols[keep]
+
+
+@dataclass
+class TrackTable:
+    """Column-oriented state of all live tracks of one stream"""
+    history_size: int
+    ids: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))
+    classes: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int32))
+    confidence: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.float32))
+    state: np.ndarray = field(default_factory=lambda: np.empty((0, 7), dtype=np.float32))
+    covariance: np.ndarray = field(default_factory=lambda: np.empty((0, 7, 7), dtype=np.float32))
+    hits: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int32))
+    misses: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int32))
+    age: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int32))
+    # Ring buffer of [timestamp, x1, y1, x2, y2] per track (float64 for epoch timestamps)
+    history: np.ndarray = None
+    history_pos: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int32))
+    history_len: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int32))
+    frames: int = 0
+
+    def __post_init__(self):
+        if self.history is None:
+            self.history = np.empty((0, self.history_size, 5), dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def keep(self, mask: np.ndarray):
+        """Drop every track whose mask entry is False"""
+        for name in ('ids', 'classes', 'confidence', 'state', 'covariance', 'hits', 'misses',
+                     'age', 'history', 'history_pos', 'history_len'):
+            setattr(self, name, getattr(self, name)[mask])
+
+    def append(self, ids: np.ndarray, classes: np.ndarray, confidence: np.ndarray, boxes: np.ndarray):
+        n = len(ids)
+        state = np.zeros((n, 7), dtype=np.float32)
+        state[:, :4] = boxes_to_measurements(boxes)
+        self.ids = np.concatenate([self.ids, ids])
+        self.classes = np.concatenate([self.classes, classes])
+        self.confidence = np.concatenate([self.confidence, confidence])
+        self.state = np.concatenate([self.state, state])
+        self.covariance = np.concatenate([self.covariance, np.broadcast_to(_P0, (n, 7, 7))])
+        self.hits = np.concatenate([self.hits, np.ones(n, dtype=np.int32)])
+        self.misses = np.concatenate([self.misses, np.zeros(n, dtype=np.int32)])
+        self.age = np.concatenate([self.age, np.zeros(n, dtype=np.int32)])
+        self.history = np.concatenate([self.history, np.zeros((n, self.history_size, 5), dtype=np.float64)])
+        self.history_pos = np.concatenate([self.history_pos, np.zeros(n, dtype=np.int32)])
+        self.history_len = np.concatenate([self.history_len, np.zeros(n, dtype=np.int32)])
+
+    def record(self, rows: np.ndarray, boxes: np.ndarray, timestamp: float):
+        """Write boxes into the given tracks' ring buffers"""
+        if len(rows) == 0:
+            return
+        pos = self.history_pos[rows]
+        self.history[rows, pos, 0] = timestamp
+        self.history[rows, pos, 1:] = boxes
+        self.history_pos[rows] = (pos + 1) % self.history_size
+        self.history_len[rows] = np.minimum(self.history_len[rows] + 1, self.history_size)
+
+
+class MultiObjectTracker:
+    """Per-stream SORT tracking over detector output"""
+
+    def __init__(
+        self,
+        max_age: Optional[int] = None,
+        min_hits: Optional[int] = None,
+        iou_threshold: Optional[float] = None,
+        history_size: Optional[int] = None
+    ):
+        self.max_age = max_age if max_age is not None else settings.tracking_max_age
+        self.min_hits = min_hits if min_hits is not None else settings.tracking_min_hits
+        self.iou_threshold = iou_threshold if iou_threshold is not None else settings.tracking_iou_threshold
+        self.history_size = history_size or settings.tracking_history_size
+        self._tables: Dict[str, TrackTable] = {}
+        self._class_ids: Dict[str, int] = {}
+        self._class_names: List[str] = []
+        self._next_id = 1
+
+    def _class_index(self, name: str) -> int:
+        index = self._class_ids.get(name)
+        if index is None:
+            index = self._class_ids[name] = len(self._class_names)
+            self._class_names.append(name)
+        return index
+
+    def update(self, stream_id: str, analysis) -> List[Dict]:
+        """Advance a stream's tracks with a FrameAnalysis"""
+        detections = analysis.detections
+        return self.update_arrays(
+            stream_id,
+            np.array([d.bbox for d in detections], dtype=np.float32).reshape(-1, 4),
+            [d.class_name for d in detections],
+            np.array([d.confidence for d in detections], dtype=np.float32),
+            analysis.frame_timestamp
+        )
+
+    def update_arrays(
+        self,
+        stream_id: str,
+        boxes: np.ndarray,
+        class_names: Sequence[str],
+        confidences: np.ndarray,
+        timestamp: Optional[float] = None
+    ) -> List[Dict]:
+        """
+        Advance a stream's tracks by one frame
+
+        Args:
+            stream_id: Stream the detections belong to
+            boxes: (N, 4) float array of [x1, y1, x2, y2]
+            class_names: N class names
+            confidences: N detection confidences
+            timestamp: Frame time in epoch seconds (defaults to now)
+
+        Returns:
+            Confirmed tracks that were matched in this frame
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        table = self._tables.get(stream_id)
+        if table is None:
+            table = self._tables[stream_id] = TrackTable(self.history_size)
+        table.frames += 1
+
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        classes = np.array([self._class_index(name) for name in class_names], dtype=np.int32)
+        confidences = np.asarray(confidences, dtype=np.float32)
+
+        # Predict all tracks; keep the area from going negative
+        if len(table):
+            shrinking = table.state[:, 2] + table.state[:, 6] <= 0
+            table.state[shrinking, 6] = 0.0
+            table.state = table.state @ _F.T
+            table.covariance = _F @ table.covariance @ _F.T + _Q
+            table.age += 1
+            table.misses += 1
+
+        # Match predictions to detections of the same class
+        predicted = states_to_boxes(table.state)
+        iou = iou_matrix(predicted, boxes) if len(table) and len(boxes) else np.zeros((len(table), len(boxes)))
+        if iou.size:
+            iou[table.classes[:, None] != classes[None, :]] = 0.0
+        rows, cols = assign(iou, self.iou_threshold)
+
+        # Kalman update of matched tracks, vectorised over the matches
+        if len(rows):
+            z = boxes_to_measurements(boxes[cols])
+            x = table.state[rows]
+            p = table.covariance[rows]
+            y = z - x @ _H.T
+            s = _H @ p @ _H.T + _R
+            k = p @ _H.T @ np.linalg.inv(s)
+            table.state[rows] = x + np.einsum('nij,nj->ni', k, y)
+            table.covariance[rows] = (_I7 - k @ _H) @ p
+            table.hits[rows] += 1
+            table.misses[rows] = 0
+            table.confidence[rows] = confidences[cols]
+            table.record(rows, boxes[cols], timestamp)
+
+        # Start tracks for unmatched detections
+        unmatched = np.setdiff1d(np.arange(len(boxes)), cols)
+        if len(unmatched):
+            start = len(table)
+            ids = np.arange(self._next_id, self._next_id + len(unmatched), dtype=np.int64)
+            self._next_id += len(unmatched)
+            table.append(ids, classes[unmatched], confidences[unmatched], boxes[unmatched])
+            table.record(np.arange(start, len(table)), boxes[unmatched], timestamp)
+
+        # Forget tracks that went unmatched for too long
+        if len(table):
+            table.keep(table.misses <= self.max_age)
+
+        confirmed = (table.misses == 0) & ((table.hits >= self.min_hits) | (table.frames <= self.min_hits))
+        return self._snapshot(table, np.flatnonzero(confirmed))
+
+    def _snapshot(self, table: TrackTable, rows: np.ndarray) -> List[Dict]:
+        if len(rows) == 0:
+            return []
+        boxes = states_to_boxes(table.state[rows])
+        return [
+            {
+                'track_id': int(table.ids[row]),
+                'class_name': self._class_names[table.classes[row]],
+                'bbox': [round(float(v), 1) for v in box],
+                'confidence': round(float(table.confidence[row]), 3),
+                'velocity': [round(float(table.state[row, 4]), 2), round(float(table.state[row, 5]), 2)],
+                'hits': int(table.hits[row]),
+                'age': int(table.age[row])
+            }
+            for row, box in zip(rows, boxes)
+        ]
+
+    def get_tracks(self, stream_id: str, include_tentative: bool = False) -> List[Dict]:
+        """Current tracks of a stream (confirmed only unless include_tentative)"""
+        table = self._tables.get(stream_id)
+        if table is None:
+            return []
+        mask = np.ones(len(table), dtype=bool) if include_tentative else table.hits >= self.min_hits
+        return self._snapshot(table, np.flatnonzero(mask))
+
+    def get_history(self, stream_id: str, track_id: int) -> List[List[float]]:
+        """Recent [timestamp, x1, y1, x2, y2] rows of a track, oldest first"""
+        table = self._tables.get(stream_id)
+        if table is None:
+            return []
+        rows = np.flatnonzero(table.ids == track_id)
+        if len(rows) == 0:
+            return []
+        row = rows[0]
+        length, pos = table.history_len[row], table.history_pos[row]
+        order = (np.arange(pos - length, pos) % self.history_size)
+        return table.history[row, order].tolist()
+
+    def reset(self, stream_id: str):
+        self._tables.pop(stream_id, None)
+
+
+# Global tracker instance
+object_tracker = MultiObjectTracker()
@@ -0,0 +1,230 @@
+"""
+Realtime Hub
+
+Fans detections, narration text and stream status changes out to WebSocket
+clients. One connection can subscribe to many streams; updates are sent as
+compact delta messages (a detection update only when the quantized
+detections changed), several messages are batched into one frame, and each
+client has a byte budget. While a client waits for budget its pending
+detection and status updates are replaced by newer ones rather than
+queued, so slow clients get fewer, fresher updates instead of a backlog.
+"""
+
+import asyncio
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from fastapi import WebSocket
+
+from ..core.config import settings
+from ..core.ratelimit import TokenBucket
+from ..core.metrics import REALTIME_CLIENTS, REALTIME_MESSAGES, REALTIME_SENT_BYTES
+from ..core.serialization import dumps_json
+from ..models.stream import FrameAnalysis, NarrationResponse, StreamInfo
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional; clients fall back to JSON
+    msgpack = None
+
+
+# Message types
+DETECTIONS = "d"
+NARRATION = "n"
+STATUS = "s"
+
+# Types where only the newest pending message per stream matters
+_COALESCED = {DETECTIONS, STATUS}
+
+
+def available_encodings() -> List[str]:
+    return ['msgpack', 'json'] if msgpack is not None else ['json']
+
+
+def compact_detections(analysis: FrameAnalysis) -> List[List[Any]]:
+    """[class, confidence %, x1, y1, x2, y2] rows with integer pixels"""
+    return [
+        [d.class_name, int(round(d.confidence * 100)), *(int(round(v)) for v in d.bbox)]
+        for d in analysis.detections
+    ]
+
+
+class RealtimeClient:
+    """One WebSocket connection with its subscriptions and send budget"""
+
+    def __init__(self, websocket: WebSocket, encoding: str = 'json',
+                 budget_bytes: Optional[float] = None, max_batch: Optional[int] = None):
+        self.websocket = websocket
+        self.encoding = encoding
+        self.subscriptions: Set[str] = set()
+        self.budget = TokenBucket(
+            budget_bytes if budget_bytes is not None else settings.realtime_send_budget,
+            (budget_bytes if budget_bytes is not None else settings.realtime_send_budget) * 2
+        )
+        self.max_batch = max_batch or settings.realtime_max_batch
+        self._coalesced: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._queued: Deque[Dict[str, Any]] = deque(maxlen=settings.realtime_max_queued)
+        self._wakeup = asyncio.Event()
+        self.sent_bytes = 0
+        self.dropped = 0
+
+    def enqueue(self, message: Dict[str, Any]):
+        if message['t'] in _COALESCED:
+            key = (message['t'], message['s'])
+            if key in self._coalesced:
+                self.dropped += 1
+            self._coalesced[key] = message
+        else:
+            if len(self._queued) == self._queued.maxlen:
+                self.dropped += 1
+            self._queued.append(message)
+        self._wakeup.set()
+
+    def _drain(self) -> List[Dict[str, Any]]:
+        batch = []
+        while self._queued and len(batch) < self.max_batch:
+            batch.append(self._queued.popleft())
+        while self._coalesced and len(batch) < self.max_batch:
+            key = next(iter(self._coalesced))
+            batch.append(self._coalesced.pop(key))
+        return batch
+
+    def encode(self, payload: Any) -> Any:
+        if self.encoding == 'msgpack':
+            return msgpack.packb(payload, use_bin_type=True)
+        return dumps_json(payload)
+
+    async def send(self, payload: Any):
+        """Encode and send one frame immediately (control replies)"""
+        data = self.encode(payload)
+        await self._send_raw(data)
+
+    async def _send_raw(self, data: Any):
+        if isinstance(data, bytes):
+            await self.websocket.send_bytes(data)
+        else:
+            await self.websocket.send_text(data)
+        size = len(data)
+        self.sent_bytes += size
+        REALTIME_SENT_BYTES.labels(encoding=self.encoding).inc(size)
+
+    async def run_sender(self, flush_interval: float):
+        """Batch pending messages into frames and send them within the byte budget"""
+        while True:
+            await self._wakeup.wait()
+            # Short window so bursts from several streams share one frame
+            await asyncio.sleep(flush_interval)
+            self._wakeup.clear()
+
+            batch = self._drain()
+            if not batch:
+                continue
+            data = self.encode(batch)
+            await self.budget.acquire(len(data))
+            await self._send_raw(data)
+            REALTIME_MESSAGES.inc(len(batch))
+
+            if self._queued or self._coalesced:
+                self._wakeup.set()
+
+
+class RealtimeHub:
+    """Registry of WebSocket clients and the latest state of every stream"""
+
+    def __init__(self, flush_interval: Optional[float] = None):
+        self.flush_interval = flush_interval if flush_interval is not None else settings.realtime_flush_interval
+        self._clients: Set[RealtimeClient] = set()
+        self._subscribers: Dict[str, Set[RealtimeClient]] = {}
+        # Latest message of each type per stream, sent as a snapshot on subscribe
+        self._latest: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        # Last published content (without timestamps) per (stream, type), for change detection
+        self._states: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._seq = 0
+
+    @property
+    def client_count(self) -> int:
+        return len(self._clients)
+
+    def register(self, client: RealtimeClient):
+        self._clients.add(client)
+        REALTIME_CLIENTS.set(len(self._clients))
+
+    def unregister(self, client: RealtimeClient):
+        self._clients.discard(client)
+        for stream_id in client.subscriptions:
+            subscribers = self._subscribers.get(stream_id)
+            if subscribers:
+                subscribers.discard(client)
+                if not subscribers:
+                    del self._subscribers[stream_id]
+        client.subscriptions.clear()
+        REALTIME_CLIENTS.set(len(self._clients))
+
+    def subscribe(self, client: RealtimeClient, stream_ids: Iterable[str]):
+        for stream_id in stream_ids:
+            if stream_id in client.subscriptions:
+                continue
+            client.subscriptions.add(stream_id)
+            self._subscribers.setdefault(stream_id, set()).add(client)
+            for message in self._latest.get(stream_id, {}).values():
+                client.enqueue(message)
+
+    def unsubscribe(self, client: RealtimeClient, stream_ids: Iterable[str]):
+        for stream_id in stream_ids:
+            client.subscriptions.discard(stream_id)
+            subscribers = self._subscribers.get(stream_id)
+            if subscribers:
+                subscribers.discard(client)
+                if not subscribers:
+                    del self._subscribers[stream_id]
+
+    def publish(self, stream_id: str, kind: str, body: Dict[str, Any]) -> bool:
+        """
+        Send a message to the stream's subscribers if it changes the stream's state
+
+        Returns:
+            False when the message was identical to the last one and dropped
+        """
+        state = {k: v for k, v in body.items() if k != 'ts'}
+        if kind in _COALESCED and self._states.get((stream_id, kind)) == state:
+            return False
+        self._states[(stream_id, kind)] = state
+
+        self._seq += 1
+        message = {'t': kind, 's': stream_id, 'q': self._seq, **body}
+        self._latest.setdefault(stream_id, {})[kind] = message
+        for client in self._subscribers.get(stream_id, ()):
+            client.enqueue(message)
+        return True
+
+    def on_analysis(self, analysis: FrameAnalysis):
+        """Detection service listener"""
+        self.publish(analysis.stream_id, DETECTIONS, {
+            'd': compact_detections(analysis),
+            'ts': round(analysis.frame_timestamp, 3)
+        })
+
+    def on_narration(self, response: NarrationResponse):
+        """Narration scheduler listener"""
+        self.publish(response.stream_id, NARRATION, {
+            'text': response.text,
+            'style': response.style,
+            'ts': round(response.timestamp.timestamp(), 3)
+        })
+
+    def on_stream_update(self, previous: Optional[StreamInfo], stream: StreamInfo):
+        """Stream refresher listener"""
+        self.publish(stream.id, STATUS, {
+            'status': stream.status,
+            'live': stream.is_live,
+            'viewers': stream.viewer_count
+        })
+
+    def forget(self, stream_id: str):
+        self._latest.pop(stream_id, None)
+        for kind in (DETECTIONS, NARRATION, STATUS):
+            self._states.pop((stream_id, kind), None)
+
+
+# Global realtime hub instance
+realtime_hub = RealtimeHub()
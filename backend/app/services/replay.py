@@ -0,0 +1,223 @@
+"""
+Offline Replay
+
+Runs the frame extraction pipeline over local video files as fast as the
+machine allows, for backfilling features over archived footage. Extraction
+runs in replay mode (no live pacing, seeking straight to the sampled
+timestamps, frame timestamps taken from the video position) and files are
+processed in parallel, one worker process per core. Each input produces one
+JSONL or Parquet part file of per-frame records in the output directory.
+
+Usage (from the backend directory):
+    python -m app.services.replay footage/ --output data/replay --format parquet --interval 1
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from ..core.serialization import dumps_json
+from .frame_delta import flatten_features
+
+logger = logging.getLogger(__name__)
+
+VIDEO_EXTENSIONS = {'.mp4', '.mkv', '.mov', '.avi', '.webm', '.ts', '.flv', '.m4v'}
+OUTPUT_FORMATS = ('jsonl', 'parquet')
+
+DEFAULT_REPLAY_CONFIG = {
+    'interval_seconds': 2.0,
+    'max_frames': 10_000_000,
+    'enhance_frames': False,
+    'save_frames': False,
+    'extract_features': True,
+}
+
+
+def discover_inputs(paths: Iterable[str]) -> List[Path]:
+    """Video files given directly or found recursively in directories, in sorted order"""
+    found = []
+    for raw in paths:
+        path = Path(raw)
+        if path.is_dir():
+            found.extend(p for p in sorted(path.rglob('*')) if p.suffix.lower() in VIDEO_EXTENSIONS and p.is_file())
+        elif path.is_file():
+            found.append(path)
+        else:
+            raise FileNotFoundError(f"Replay input not found: {raw}")
+    return list(dict.fromkeys(found))
+
+
+def replay_stream_id(path: Path) -> str:
+    """Stable per-file stream id, unique even for equal file names in different directories"""
+    digest = hashlib.blake2b(str(path.resolve()).encode(), digest_size=4).hexdigest()
+    return f"replay_{path.stem}_{digest}"
+
+
+def frame_record(frame_data: Dict[str, Any], source: str, start: datetime) -> Dict[str, Any]:
+    """Flat analytics record for one frame (features become feature.<name> columns)"""
+    timestamp = datetime.fromisoformat(frame_data['timestamp'])
+    record = {
+        'source': source,
+        'stream_id': frame_data['stream_id'],
+        'frame_id': frame_data['frame_id'],
+        'frame_number': frame_data['frame_number'],
+        'timestamp': frame_data['timestamp'],
+        'position_seconds': round((timestamp - start).total_seconds(), 3),
+    }
+    for name, value in flatten_features(frame_data.get('features') or {}).items():
+        record[f"feature.{name}"] = list(value) if isinstance(value, tuple) else value
+    for key in ('motion', 'detections', 'tracks'):
+        if frame_data.get(key) is not None:
+            record[key] = frame_data[key]
+    return record
+
+
+def write_records(records: List[Dict[str, Any]], path: Path, output_format: str):
+    if output_format == 'jsonl':
+        with open(path, 'w') as f:
+            for record in records:
+                f.write(dumps_json(record) + "\n")
+        return
+
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("Parquet output requires pyarrow (pip install pyarrow)") from e
+    # Nested values (dominant colors, detections, ...) are stored as JSON strings
+    rows = [
+        {k: dumps_json(v) if isinstance(v, (list, dict)) else v for k, v in record.items()}
+        for record in records
+    ]
+    pq.write_table(pa.Table.from_pylist(rows), path)
+
+
+async def replay_file_async(path: Path, config: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Run the extraction pipeline over one file and collect its frame records"""
+    from .frame_extraction import frame_extractor
+
+    # Timestamps are anchored at the file's modification time, the best guess at when it was recorded
+    start = datetime.utcfromtimestamp(path.stat().st_mtime)
+    stream_id = replay_stream_id(path)
+    config = {**config, 'replay': True, 'replay_start': start}
+
+    records = []
+    async for frame_data in frame_extractor.extract_frames_from_stream(str(path), stream_id, config):
+        records.append(frame_record(frame_data, str(path), start))
+    return records
+
+
+def _replay_worker(path: str, config: Dict[str, Any], output_dir: str, output_format: str) -> Dict[str, Any]:
+    """Process-pool entry point; writes the file's part and returns a summary"""
+    import cv2
+    cv2.setNumThreads(1)  # one core per worker process
+
+    source = Path(path)
+    started = time.perf_counter()
+    records = asyncio.run(replay_file_async(source, config))
+    output = Path(output_dir) / f"{replay_stream_id(source)}.{output_format}"
+    write_records(records, output, output_format)
+    return {
+        'source': path,
+        'frames': len(records),
+        'seconds': round(time.perf_counter() - started, 3),
+        'output': str(output),
+    }
+
+
+def run_replay(
+    inputs: Iterable[str],
+    output_dir: str,
+    output_format: str = 'jsonl',
+    config: Optional[Dict[str, Any]] = None,
+    workers: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Replay every input file and write one part file per input
+
+    Args:
+        inputs: Video files or directories
+        output_dir: Directory receiving <stream_id>.<format> part files
+        output_format: 'jsonl' or 'parquet'
+        config: Extraction config overrides (see DEFAULT_REPLAY_CONFIG)
+        workers: Worker processes, defaults to the number of cores
+
+    Returns:
+        Per-file summaries (source, frames, seconds, output, or error)
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown replay output format: {output_format}")
+    files = discover_inputs(inputs)
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    config = {**DEFAULT_REPLAY_CONFIG, **(config or {})}
+    workers = max(1, min(workers or os.cpu_count() or 1, len(files) or 1))
+
+    summaries = []
+    # spawn: workers must not inherit the parent's threads (archive writer, detector executor)
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = {
+            pool.submit(_replay_worker, str(path), config, output_dir, output_format): path
+            for path in files
+        }
+        for future in as_completed(futures):
+            try:
+                summary = future.result()
+                logger.info(f"Replayed {summary['source']}: {summary['frames']} frames in {summary['seconds']}s")
+            except Exception as e:
+                summary = {'source': str(futures[future]), 'error': str(e)}
+                logger.error(f"Replay failed for {futures[future]}: {e}")
+            summaries.append(summary)
+    return summaries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the frame pipeline over local video files")
+    parser.add_argument('inputs', nargs='+', help="Video files or directories")
+    parser.add_argument('--output', default='data/replay', help="Output directory")
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='jsonl')
+    parser.add_argument('--interval', type=float, default=DEFAULT_REPLAY_CONFIG['interval_seconds'],
+                        help="Seconds of video between sampled frames")
+    parser.add_argument('--max-frames', type=int, default=DEFAULT_REPLAY_CONFIG['max_frames'],
+                        help="Frames per file")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: cores)")
+    parser.add_argument('--enhance', action='store_true', help="Apply frame enhancement")
+    parser.add_argument('--motion', action='store_true', help="Compute motion regions")
+    parser.add_argument('--detect', action='store_true', help="Run object detection")
+    parser.add_argument('--track', action='store_true', help="Track detected objects (implies --detect)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    config = {
+        'interval_seconds': args.interval,
+        'max_frames': args.max_frames,
+        'enhance_frames': args.enhance,
+        'motion_regions': args.motion,
+        'detect_objects': args.detect or args.track,
+        'track_objects': args.track,
+    }
+    started = time.perf_counter()
+    summaries = run_replay(args.inputs, args.output, args.format, config, args.workers)
+    frames = sum(s.get('frames', 0) for s in summaries)
+    elapsed = time.perf_counter() - started
+    print(json.dumps({
+        'files': len(summaries),
+        'failed': sum(1 for s in summaries if 'error' in s),
+        'frames': frames,
+        'seconds': round(elapsed, 3),
+        'frames_per_second': round(frames / elapsed, 1) if elapsed else None,
+        'results': summaries,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
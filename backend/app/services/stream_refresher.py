@@ -0,0 +1,261 @@
+"""
+Stream Refresh Scheduler
+
+Keeps live status, viewer counts and HLS URLs of registered streams fresh
+in the background. Each stream gets its own next-refresh time derived from
+its state and from the expiry of its HLS URL, refreshes run under a global
+concurrency cap, and refreshed StreamInfo objects are swapped in atomically.
+"""
+
+import asyncio
+import random
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from loguru import logger
+
+from ..models.stream import StreamInfo, StreamStatus
+from ..core.config import settings
+from ..core.metrics import record_cache_lookup
+from .youtube_service import youtube_service, hls_url_expiry
+
+
+class StreamRefreshScheduler:
+    """Background scheduler that refreshes stream metadata from YouTube"""
+
+    def __init__(self, tick_seconds: float = 1.0):
+        self.tick_seconds = tick_seconds
+        self._streams: Optional[List[StreamInfo]] = None
+        self._next_refresh: Dict[str, float] = {}
+        self._failures: Dict[str, int] = {}
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._task: Optional[asyncio.Task] = None
+        self._listeners: List[Callable[[StreamInfo, StreamInfo], None]] = []
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self, streams: List[StreamInfo]):
+        """Start refreshing the given stream store"""
+        if self.running:
+            return
+
+        self._streams = streams
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"🔄 Stream refresher started (concurrency: {settings.stream_refresh_concurrency})")
+
+    async def stop(self):
+        """Stop the scheduler and cancel in-flight refreshes"""
+        tasks = list(self._in_flight.values())
+        if self._task:
+            tasks.append(self._task)
+
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        self._task = None
+        self._in_flight.clear()
+        logger.info("🛑 Stream refresher stopped")
+
+    def add_listener(self, listener: Callable[[StreamInfo, StreamInfo], None]):
+        """Register a callback receiving (previous, refreshed) after every successful refresh"""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[StreamInfo, StreamInfo], None]):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def schedule(self, stream: StreamInfo, delay: Optional[float] = None):
+        """(Re)schedule a stream; the delay defaults to one derived from its state"""
+        if delay is None:
+            delay = self._next_delay(stream)
+        self._next_refresh[stream.id] = time.monotonic() + delay
+
+    def get_schedule(self) -> Dict[str, float]:
+        """Seconds until the next refresh of every scheduled stream"""
+        now = time.monotonic()
+        return {stream_id: max(0.0, due - now) for stream_id, due in self._next_refresh.items()}
+
+    def _next_delay(self, stream: StreamInfo) -> float:
+        """Pick a refresh delay from stream state, URL expiry and failure backoff"""
+        if stream.status == StreamStatus.LIVE:
+            delay = settings.stream_refresh_live_interval
+        elif stream.status == StreamStatus.UPCOMING:
+            delay = settings.stream_refresh_upcoming_interval
+        else:
+            delay = settings.stream_refresh_offline_interval
+
+        # Renew the manifest well before googlevideo stops serving it
+        if stream.hls_url and stream.hls_expires_at is not None:
+            until_expiry = (stream.hls_expires_at - datetime.now()).total_seconds() - settings.stream_refresh_expiry_margin
+            delay = min(delay, max(0.0, until_expiry))
+
+        # Back off exponentially on repeated failures, capped at the offline interval
+        failures = self._failures.get(stream.id, 0)
+        if failures:
+            delay = max(delay, min(settings.stream_refresh_offline_interval,
+                                   settings.stream_refresh_upcoming_interval * 2 ** (failures - 1)))
+
+        jitter = delay * settings.stream_refresh_jitter
+        return max(1.0, delay + random.uniform(-jitter, jitter))
+
+    async def _run(self):
+        """Main scheduler loop"""
+        while True:
+            try:
+                now = time.monotonic()
+                known_ids = set()
+
+                for stream in list(self._streams or []):
+                    known_ids.add(stream.id)
+                    if stream.id not in self._next_refresh:
+                        self.schedule(stream)
+                    elif self._next_refresh[stream.id] <= now and stream.id not in self._in_flight:
+                        self._in_flight[stream.id] = asyncio.create_task(self._refresh(stream.id))
+
+                # Forget streams that were deleted
+                for stream_id in set(self._next_refresh) - known_ids:
+                    self._next_refresh.pop(stream_id, None)
+                    self._failures.pop(stream_id, None)
+
+                await asyncio.sleep(self.tick_seconds)
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Stream refresher loop error: {e}")
+                await asyncio.sleep(self.tick_seconds)
+
+    async def _refresh(self, stream_id: str):
+        """Refresh a single stream and swap the result into the store"""
+        try:
+            async with self._get_semaphore():
+                current = self._find(stream_id)
+                if current is None:
+                    return
+
+                refreshed = await self.refresh_stream_info(current)
+
+                # The stream may have been deleted or replaced while we were waiting
+                idx = self._index(stream_id)
+                if idx is None:
+                    return
+                current = self._streams[idx]
+
+                if refreshed is None:
+                    self._failures[stream_id] = self._failures.get(stream_id, 0) + 1
+                    if current.hls_url and current.hls_expires_at and current.hls_expires_at <= datetime.now():
+                        # Never hand out a manifest URL that googlevideo will reject
+                        self._streams[idx] = current.model_copy(update={'hls_url': None, 'hls_expires_at': None})
+                    self.schedule(self._streams[idx])
+                    return
+
+                self._failures.pop(stream_id, None)
+                self._streams[idx] = refreshed
+                self.schedule(refreshed)
+                for listener in self._listeners:
+                    try:
+                        listener(current, refreshed)
+                    except Exception as e:
+                        logger.error(f"Stream refresh listener failed: {e}")
+                logger.debug(f"Refreshed stream {stream_id} ({refreshed.status}, {refreshed.viewer_count} viewers)")
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error refreshing stream {stream_id}: {e}")
+            self._failures[stream_id] = self._failures.get(stream_id, 0) + 1
+            self._next_refresh[stream_id] = time.monotonic() + settings.stream_refresh_upcoming_interval
+        finally:
+            self._in_flight.pop(stream_id, None)
+
+    async def refresh_stream_info(self, current: StreamInfo) -> Optional[StreamInfo]:
+        """Fetch fresh metadata for a stream, keeping its user-facing settings"""
+        if not current.webpage_url:
+            return None
+
+        metadata = await youtube_service.get_stream_metadata(str(current.webpage_url))
+        if not metadata:
+            return None
+
+        fresh = await youtube_service.convert_to_stream_info(metadata, current.category)
+
+        # Only live data changes; titles, descriptions and flags stay as configured
+        return current.model_copy(update={
+            'is_live': fresh.is_live,
+            'status': fresh.status,
+            'viewer_count': fresh.viewer_count,
+            'thumbnail': fresh.thumbnail,
+            'duration': fresh.duration,
+            'hls_url': fresh.hls_url,
+            'hls_expires_at': fresh.hls_expires_at,
+            'last_updated': fresh.last_updated
+        })
+
+    async def renew_hls_url(self, stream_id: str, stale_url: Optional[str] = None,
+                            force: bool = False) -> Optional[str]:
+        """
+        Return a usable HLS URL for a stream, re-resolving it if needed
+
+        Concurrent callers for the same stream share a single refresh, and a
+        URL that was already renewed is returned without touching YouTube.
+        Only streams in the store are renewed; IDs parsed from client-supplied
+        URLs never start an extraction on their own.
+
+        Args:
+            stream_id: YouTube video ID of the stream
+            stale_url: URL the caller knows to be rejected or expiring
+            force: Re-resolve even if the current URL looks valid (e.g. revoked early)
+
+        Returns:
+            The current HLS URL, or None if it could not be resolved
+        """
+        if self._find(stream_id) is None:
+            return None
+
+        current = self._current_hls_url(stream_id)
+        if current and not force and current != stale_url and not self._is_expiring(current):
+            record_cache_lookup('hls_url', hit=True)
+            return current
+        record_cache_lookup('hls_url', hit=False)
+
+        task = self._in_flight.get(stream_id)
+        if task is None:
+            task = asyncio.create_task(self._refresh(stream_id))
+            self._in_flight[stream_id] = task
+
+        # Shield so one cancelled player request does not abort the shared renewal
+        await asyncio.shield(task)
+        return self._current_hls_url(stream_id)
+
+    def _current_hls_url(self, stream_id: str) -> Optional[str]:
+        stream = self._find(stream_id)
+        if stream is None or not stream.hls_url:
+            return None
+        return str(stream.hls_url)
+
+    def _is_expiring(self, url: str) -> bool:
+        expires_at = hls_url_expiry(url)
+        if expires_at is None:
+            return False
+        return (expires_at - datetime.now()).total_seconds() <= settings.hls_renewal_margin
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so it binds to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(max(1, settings.stream_refresh_concurrency))
+        return self._semaphore
+
+    def _find(self, stream_id: str) -> Optional[StreamInfo]:
+        return next((s for s in self._streams or [] if s.id == stream_id), None)
+
+    def _index(self, stream_id: str) -> Optional[int]:
+        return next((i for i, s in enumerate(self._streams or []) if s.id == stream_id), None)
+
+
+# Global scheduler instance
+stream_refresher = StreamRefreshScheduler()
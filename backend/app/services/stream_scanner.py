@@ -0,0 +1,259 @@
+"""
+Stream Scan Engine
+
+Checks many YouTube URLs for live status with bounded concurrency,
+token-bucket rate limiting and a pool of reusable YoutubeDL instances.
+Results are appended to a JSONL file as they arrive, and runs can resume
+by skipping URLs that were checked within a freshness window.
+"""
+
+import asyncio
+import json
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, AsyncGenerator, Callable, Dict, List, Optional
+
+from loguru import logger
+
+from ..core.ratelimit import TokenBucket
+
+
+DEFAULT_SCAN_OPTS = {
+    'quiet': True,
+    'no_warnings': True,
+    'extract_flat': False,
+    'noplaylist': True,
+    'ignoreerrors': True,  # Don't stop on errors
+    'geo_bypass': True,
+    'extractor_args': {
+        'youtube': {
+            'player_client': ['web', 'ios'],  # Try multiple clients
+            'player_skip': [],
+            'formats': ['complete'],
+        }
+    }
+}
+
+
+class YoutubeDLPool:
+    """Thread-safe pool of YoutubeDL instances shared across scan workers"""
+
+    def __init__(self, ydl_opts: Dict[str, Any], size: int):
+        self.ydl_opts = ydl_opts
+        self._pool: "queue.Queue[yt_dlp.YoutubeDL]" = queue.Queue()
+        self._created = 0
+        self._size = size
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def borrow(self):
+        """Borrow an instance for the duration of one extraction"""
+        try:
+            ydl = self._pool.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self._size
+                if create:
+                    self._created += 1
+            if create:
+                import yt_dlp  # imported on first use; yt-dlp is slow to import
+                ydl = yt_dlp.YoutubeDL(self.ydl_opts)
+            else:
+                ydl = self._pool.get()
+
+        try:
+            yield ydl
+        finally:
+            self._pool.put(ydl)
+
+    def close(self):
+        """Close every pooled instance"""
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+        self._created = 0
+
+
+class StreamScanEngine:
+    """Reusable engine for checking the live status of many streams"""
+
+    def __init__(
+        self,
+        concurrency: int = 4,
+        rate_per_second: float = 2.0,
+        burst: Optional[float] = None,
+        output_path: Optional[str] = None,
+        freshness_seconds: float = 0,
+        ydl_opts: Optional[Dict[str, Any]] = None,
+        on_result: Optional[Callable[[Dict[str, Any]], None]] = None
+    ):
+        """
+        Args:
+            concurrency: Maximum number of extractions running at once
+            rate_per_second: Sustained rate at which new extractions may start
+            burst: Token bucket capacity, defaults to the concurrency
+            output_path: JSONL file results are appended to as they arrive
+            freshness_seconds: Skip URLs found in output_path that are newer than this
+            ydl_opts: yt-dlp options, defaults to DEFAULT_SCAN_OPTS
+            on_result: Callback invoked with each result as it arrives
+        """
+        self.concurrency = max(1, concurrency)
+        self.bucket = TokenBucket(rate_per_second, burst if burst is not None else self.concurrency)
+        self.output_path = Path(output_path) if output_path else None
+        self.freshness_seconds = freshness_seconds
+        self.pool = YoutubeDLPool(ydl_opts or DEFAULT_SCAN_OPTS, self.concurrency)
+        self.on_result = on_result
+
+    def load_previous_results(self) -> Dict[str, Dict[str, Any]]:
+        """Latest result per URL from the output file"""
+        previous: Dict[str, Dict[str, Any]] = {}
+        if not self.output_path or not self.output_path.exists():
+            return previous
+
+        with open(self.output_path) as f:
+            for line in f:
+                try:
+                    result = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Tolerate a truncated last line from an interrupted run
+                if result.get('url'):
+                    previous[result['url']] = result
+        return previous
+
+    def _is_fresh(self, result: Dict[str, Any]) -> bool:
+        if self.freshness_seconds <= 0 or result.get('status') == 'error':
+            return False
+        return time.time() - result.get('checked_at', 0) < self.freshness_seconds
+
+    async def scan_iter(self, urls: List[str]) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        Check URLs and yield results as they complete
+
+        Fresh results from a previous run are yielded first, flagged with
+        'cached': True, without touching YouTube.
+        """
+        previous = self.load_previous_results()
+        unique_urls = list(dict.fromkeys(urls))
+        pending = []
+        for url in unique_urls:
+            if url in previous and self._is_fresh(previous[url]):
+                yield {**previous[url], 'cached': True}
+            else:
+                pending.append(url)
+
+        if not pending:
+            return
+
+        logger.info(f"🔍 Scanning {len(pending)} URLs ({len(unique_urls) - len(pending)} fresh results reused)")
+
+        work: "asyncio.Queue[str]" = asyncio.Queue()
+        for url in pending:
+            work.put_nowait(url)
+        results: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue()
+
+        executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="stream-scan")
+        loop = asyncio.get_running_loop()
+
+        async def worker():
+            while True:
+                try:
+                    url = work.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                await self.bucket.acquire()
+                try:
+                    result = await loop.run_in_executor(executor, self._check_stream_sync, url)
+                except Exception as e:
+                    result = {'url': url, 'status': 'error', 'error': str(e), 'is_live': False}
+                result['checked_at'] = time.time()
+                await results.put(result)
+
+        workers = [asyncio.create_task(worker()) for _ in range(min(self.concurrency, len(pending)))]
+
+        try:
+            for _ in range(len(pending)):
+                result = await results.get()
+                self._record(result)
+                yield result
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def scan(self, urls: List[str]) -> List[Dict[str, Any]]:
+        """Check URLs and return results in input order"""
+        by_url = {}
+        async for result in self.scan_iter(urls):
+            by_url[result['url']] = result
+        return [by_url[url] for url in dict.fromkeys(urls) if url in by_url]
+
+    def close(self):
+        self.pool.close()
+
+    def _record(self, result: Dict[str, Any]):
+        """Append a result to the output file and notify the callback"""
+        if self.output_path:
+            with open(self.output_path, 'a') as f:
+                f.write(json.dumps(result, default=str) + "\n")
+
+        if self.on_result:
+            try:
+                self.on_result(result)
+            except Exception as e:
+                logger.error(f"Scan result callback failed: {e}")
+
+    def _check_stream_sync(self, url: str) -> Dict[str, Any]:
+        """Synchronously check stream status with a pooled YoutubeDL"""
+        try:
+            with self.pool.borrow() as ydl:
+                info = ydl.extract_info(url, download=False)
+
+            if not info:
+                return {
+                    'url': url,
+                    'status': 'no_info',
+                    'is_live': False
+                }
+
+            # Extract key information
+            result = {
+                'url': url,
+                'video_id': info.get('id', ''),
+                'title': info.get('title', ''),
+                'uploader': info.get('uploader', ''),
+                'is_live': info.get('is_live', False),
+                'live_status': info.get('live_status', 'unknown'),
+                'concurrent_viewers': info.get('concurrent_view_count', 0),
+                'view_count': info.get('view_count', 0),
+                'thumbnail': info.get('thumbnail', ''),
+                'status': 'success'
+            }
+
+            # Check for HLS formats if live
+            if result['is_live']:
+                formats = info.get('formats', [])
+                hls_formats = [f for f in formats if f.get('ext') == 'm3u8' or 'hls' in f.get('protocol', '').lower()]
+
+                if hls_formats:
+                    # Get best HLS format
+                    best_hls = max(hls_formats, key=lambda x: (x.get('height') or 0, x.get('tbr') or 0))
+                    result['hls_url'] = best_hls.get('url')
+                    result['hls_quality'] = f"{best_hls.get('height', 'N/A')}p"
+                    result['hls_bitrate'] = best_hls.get('tbr', 'N/A')
+
+            return result
+
+        except Exception as e:
+            return {
+                'url': url,
+                'status': 'error',
+                'error': str(e),
+                'is_live': False
+            }
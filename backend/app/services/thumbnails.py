@@ -0,0 +1,257 @@
+"""
+Thumbnail Service
+
+Small WebP/JPEG thumbnails for stream cards. The source is the latest
+decoded frame of a stream (sampled every settings.thumbnail_frame_interval
+seconds while it is being analyzed) or, failing that, the YouTube
+thumbnail. Variants are encoded once per (source, size, format), kept in
+an in-memory LRU and on disk under settings.thumbnail_dir, and identified
+by a content-hash ETag, which also names the immutable variant URL.
+"""
+
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+from ..core.config import settings
+from ..core.metrics import record_cache_lookup
+
+# The API imports this module at boot; cv2, numpy and aiohttp load with the first thumbnail
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Named widths; heights follow the source aspect ratio
+THUMBNAIL_SIZES = {'small': 160, 'medium': 320, 'large': 640}
+THUMBNAIL_FORMATS = {
+    'webp': ('.webp', 'image/webp'),
+    'jpeg': ('.jpg', 'image/jpeg'),
+}
+
+# Files (variants and their index entries) kept on disk per stream
+DISK_ITEMS_PER_STREAM = 4 * len(THUMBNAIL_SIZES) * len(THUMBNAIL_FORMATS)
+
+# Hosts whose "thumbnails" are placeholders not worth resizing
+_PLACEHOLDER_HOSTS = ('via.placeholder.com',)
+
+
+@dataclass(frozen=True)
+class Thumbnail:
+    data: bytes
+    etag: str
+    format: str
+
+    @property
+    def media_type(self) -> str:
+        return THUMBNAIL_FORMATS[self.format][1]
+
+    @property
+    def extension(self) -> str:
+        return THUMBNAIL_FORMATS[self.format][0]
+
+
+@dataclass
+class _Source:
+    image: "np.ndarray"  # BGR, at most the largest thumbnail width
+    digest: str
+    updated: float  # monotonic
+    origin: Optional[str] = None  # URL for downloaded sources, None for frames
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+
+def _downscale(image: "np.ndarray", width: int) -> "np.ndarray":
+    import cv2
+
+    height, source_width = image.shape[:2]
+    if source_width <= width:
+        return image.copy()
+    return cv2.resize(image, (width, max(1, round(height * width / source_width))), interpolation=cv2.INTER_AREA)
+
+
+class ThumbnailService:
+    """Builds, caches and serves resized stream thumbnails"""
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        memory_items: Optional[int] = None,
+        frame_interval: Optional[float] = None
+    ):
+        self.cache_dir = Path(cache_dir or settings.thumbnail_dir)
+        self.memory_items = memory_items or settings.thumbnail_memory_items
+        self.frame_interval = frame_interval if frame_interval is not None else settings.thumbnail_frame_interval
+        self._sources: Dict[str, _Source] = {}
+        # (stream_id, source digest, width, format) -> Thumbnail
+        self._cache: "OrderedDict[Tuple[str, str, int, str], Thumbnail]" = OrderedDict()
+        self._fetching: Dict[str, asyncio.Task] = {}
+
+    def update_frame(self, stream_id: str, frame: "np.ndarray"):
+        """
+        Offer a decoded frame as the stream's thumbnail source
+
+        Cheap to call for every frame: only one frame per frame_interval is
+        kept, downscaled to the largest thumbnail width.
+        """
+        source = self._sources.get(stream_id)
+        now = time.monotonic()
+        if source is not None and now - source.updated < self.frame_interval:
+            return
+        image = _downscale(frame, max(THUMBNAIL_SIZES.values()))
+        self._sources[stream_id] = _Source(image, _digest(image.tobytes()), now)
+
+    def forget(self, stream_id: str):
+        self._sources.pop(stream_id, None)
+        for key in [k for k in self._cache if k[0] == stream_id]:
+            del self._cache[key]
+
+    async def get(
+        self,
+        stream_id: str,
+        width: int,
+        image_format: str = 'webp',
+        fallback_url: Optional[str] = None
+    ) -> Optional[Thumbnail]:
+        """
+        Thumbnail of a stream at a width and format
+
+        Args:
+            stream_id: Stream identifier
+            width: Target width in pixels (never upscaled)
+            image_format: 'webp' or 'jpeg'
+            fallback_url: Image to use (e.g. the YouTube thumbnail) while no frame has been seen
+
+        Returns:
+            The thumbnail, or None if the stream has no usable source
+        """
+        self._stream_dir(stream_id)
+        source = self._sources.get(stream_id)
+        if fallback_url and (source is None or (source.origin and source.origin != fallback_url)):
+            source = await self._load_remote(stream_id, fallback_url)
+        if source is None:
+            return None
+
+        key = (stream_id, source.digest, width, image_format)
+        thumbnail = self._cache.get(key)
+        record_cache_lookup('thumbnail', hit=thumbnail is not None)
+        if thumbnail is not None:
+            self._cache.move_to_end(key)
+            return thumbnail
+
+        thumbnail = await asyncio.to_thread(self._build, stream_id, source, width, image_format)
+        self._cache[key] = thumbnail
+        while len(self._cache) > self.memory_items:
+            self._cache.popitem(last=False)
+        return thumbnail
+
+    async def get_by_etag(self, stream_id: str, etag: str, image_format: str) -> Optional[Thumbnail]:
+        """Content-addressed lookup for immutable URLs: memory, then disk"""
+        for (cached_stream, _, _, cached_format), thumbnail in self._cache.items():
+            if cached_stream == stream_id and thumbnail.etag == etag and cached_format == image_format:
+                return thumbnail
+        try:
+            path = self._variant_path(stream_id, etag, image_format)
+            return Thumbnail(await asyncio.to_thread(path.read_bytes), etag, image_format)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _stream_dir(self, stream_id: str) -> Path:
+        if not stream_id or '/' in stream_id or '\\' in stream_id or stream_id.startswith('.'):
+            raise ValueError(f"Invalid stream id for thumbnails: {stream_id!r}")
+        return self.cache_dir / stream_id
+
+    def _variant_path(self, stream_id: str, etag: str, image_format: str) -> Path:
+        if not etag.isalnum():
+            raise ValueError("Invalid thumbnail etag")
+        return self._stream_dir(stream_id) / f"{etag}{THUMBNAIL_FORMATS[image_format][0]}"
+
+    def _build(self, stream_id: str, source: _Source, width: int, image_format: str) -> Thumbnail:
+        # Disk cache is keyed by source and variant, so restarts reuse earlier encodes
+        index = self._stream_dir(stream_id) / f"{source.digest}_{width}_{image_format}.etag"
+        try:
+            etag = index.read_text().strip()
+            return Thumbnail(self._variant_path(stream_id, etag, image_format).read_bytes(), etag, image_format)
+        except (FileNotFoundError, ValueError):
+            pass
+
+        from .frame_encoder import EncodeSpec, frame_encoder
+
+        image = _downscale(source.image, width)
+        if image_format == 'webp':
+            spec = EncodeSpec('webp', quality=settings.thumbnail_webp_quality)
+        else:
+            spec = EncodeSpec('jpeg', quality=settings.thumbnail_jpeg_quality, progressive=True)
+        data = frame_encoder.encode(image, spec)[0].tobytes()
+        thumbnail = Thumbnail(data, _digest(data), image_format)
+
+        try:
+            path = self._variant_path(stream_id, thumbnail.etag, image_format)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(data)
+            index.write_text(thumbnail.etag)
+            self._prune(path.parent)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not cache thumbnail for {stream_id} on disk: {e}")
+        return thumbnail
+
+    @staticmethod
+    def _prune(directory: Path):
+        # Frame sources change every frame_interval; keep the newest variants and indexes only
+        entries = sorted(directory.iterdir(), key=lambda p: p.stat().st_mtime, reverse=True)
+        for stale in entries[DISK_ITEMS_PER_STREAM:]:
+            stale.unlink(missing_ok=True)
+
+    async def _load_remote(self, stream_id: str, url: str) -> Optional[_Source]:
+        if any(host in url for host in _PLACEHOLDER_HOSTS):
+            return None
+        # Concurrent requests for the same stream share one download
+        task = self._fetching.get(stream_id)
+        if task is None:
+            task = asyncio.create_task(self._fetch(url))
+            self._fetching[stream_id] = task
+            task.add_done_callback(lambda _: self._fetching.pop(stream_id, None))
+        image = await asyncio.shield(task)
+        if image is None:
+            return None
+        # A frame may have arrived while downloading; it wins
+        current = self._sources.get(stream_id)
+        if current is None or current.origin:
+            # Digest of the URL: stable across restarts, so the disk cache is hit without re-encoding
+            self._sources[stream_id] = _Source(image, _digest(url.encode()), float('-inf'), origin=url)
+        return self._sources[stream_id]
+
+    async def _fetch(self, url: str) -> Optional["np.ndarray"]:
+        import aiohttp
+
+        try:
+            timeout = aiohttp.ClientTimeout(total=10)
+            async with aiohttp.ClientSession(timeout=timeout) as session:
+                async with session.get(url) as response:
+                    if response.status != 200:
+                        logger.warning(f"Thumbnail source {url} returned HTTP {response.status}")
+                        return None
+                    data = await response.read()
+        except Exception as e:
+            logger.warning(f"Thumbnail source {url} failed: {e}")
+            return None
+
+        def decode():
+            import cv2
+            import numpy as np
+
+            image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+            return _downscale(image, max(THUMBNAIL_SIZES.values())) if image is not None else None
+
+        return await asyncio.to_thread(decode)
+
+
+# Global thumbnail service instance
+thumbnail_service = ThumbnailService()
@@ -0,0 +1,444 @@
+"""
+Animal Knowledge Vector Index
+
+Persistent FAISS index over a corpus of animal facts used to ground
+narration. The on-disk index is memory-mapped when loaded, new entries go
+into a small in-memory delta index until the next persist(), and query
+embeddings are kept in an LRU cache keyed by the normalized detection
+class and context so lookups for recurring species skip the embedder.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..core.config import settings
+from ..core.metrics import record_cache_lookup
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+class VectorIndexError(Exception):
+    """Raised when the index cannot be loaded or does not match the embedder"""
+    pass
+
+
+def _words(text: str) -> List[str]:
+    """Lowercase word tokens with simple plural stripping ("zebras" -> "zebra")"""
+    return [
+        w[:-1] if len(w) > 3 and w.endswith('s') and not w.endswith('ss') else w
+        for w in _TOKEN_RE.findall(text.lower())
+    ]
+
+
+def _faiss():
+    # faiss is heavy to import and only needed once the index is used
+    import faiss
+    return faiss
+
+
+class Embedder:
+    """Turns texts into L2-normalized float32 vectors"""
+
+    name = "base"
+    dim = 0
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        raise NotImplementedError
+
+
+class HashingEmbedder(Embedder):
+    """
+    Deterministic bag-of-features embedder for tests and offline use
+
+    Hashes words and word bigrams into signed buckets, so equal texts always
+    map to equal vectors and texts sharing words land close together.
+    """
+
+    name = "hashing"
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def _features(self, text: str) -> List[str]:
+        words = _words(text)
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+                value = int.from_bytes(digest, 'little')
+                vectors[row, value % self.dim] += 1.0 if (value >> 63) else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+class SentenceTransformerEmbedder(Embedder):
+    """sentence-transformers model, loaded on first use"""
+
+    name = "sentence-transformers"
+
+    def __init__(self, model_name: str, batch_size: int = 64):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        with self._lock:
+            if self._model is None:
+                from sentence_transformers import SentenceTransformer
+                logger.info(f"Loading embedding model {self.model_name}")
+                self._model = SentenceTransformer(self.model_name, device='cpu')
+            return self._model
+
+    @property
+    def dim(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = self.model.encode(
+            list(texts), batch_size=self.batch_size, convert_to_numpy=True,
+            normalize_embeddings=True, show_progress_bar=False
+        )
+        return np.ascontiguousarray(vectors, dtype=np.float32)
+
+
+def create_embedder(backend: Optional[str] = None) -> Embedder:
+    """Build the configured embedder ('sentence-transformers' or 'hashing')"""
+    backend = (backend or settings.embedding_backend).lower()
+    if backend == 'hashing':
+        return HashingEmbedder()
+    if backend == 'sentence-transformers':
+        return SentenceTransformerEmbedder(settings.embedding_model, settings.embedding_batch_size)
+    raise VectorIndexError(f"Unknown embedding backend: {backend}")
+
+
+def normalize_query_key(class_name: str, context: Optional[str] = None) -> str:
+    """Cache key for a detection lookup, insensitive to case, spacing and plurals"""
+    key = " ".join(_words(class_name))
+    if context:
+        key = f"{key}|{' '.join(_words(context))}"
+    return key
+
+
+@dataclass
+class KnowledgeEntry:
+    """One fact in the knowledge corpus"""
+    id: str
+    text: str
+    species: Optional[str] = None
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "KnowledgeEntry":
+        known = {'id', 'text', 'species', 'metadata'}
+        metadata = {**data.get('metadata', {}), **{k: v for k, v in data.items() if k not in known}}
+        return cls(id=str(data['id']), text=data['text'], species=data.get('species'), metadata=metadata)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'id': self.id, 'text': self.text, 'species': self.species, 'metadata': self.metadata}
+
+
+def load_corpus(path: Path) -> List[KnowledgeEntry]:
+    """Read a corpus from a JSON list or a JSONL file"""
+    path = Path(path)
+    raw = path.read_text(encoding='utf-8')
+    if path.suffix == '.jsonl':
+        records = [json.loads(line) for line in raw.splitlines() if line.strip()]
+    else:
+        records = json.loads(raw)
+    return [KnowledgeEntry.from_dict(record) for record in records]
+
+
+class VectorIndex:
+    """On-disk inner-product FAISS index with an in-memory delta for incremental adds"""
+
+    INDEX_FILE = "index.faiss"
+    ENTRIES_FILE = "entries.jsonl"
+    META_FILE = "meta.json"
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        embedder: Optional[Embedder] = None,
+        cache_size: Optional[int] = None,
+        batch_size: Optional[int] = None
+    ):
+        self.path = Path(path or settings.vector_index_path)
+        self._embedder = embedder
+        self.cache_size = cache_size or settings.vector_query_cache_size
+        self.batch_size = batch_size or settings.embedding_batch_size
+
+        self.entries: List[KnowledgeEntry] = []
+        self._ids: Dict[str, int] = {}
+        self._main = None  # persisted (memory-mapped) index
+        self._main_size = 0
+        self._delta = None  # entries added since the last persist()
+        self._loaded = False
+        self._lock = threading.RLock()
+
+        # Query embeddings by normalized key, and results by (key, k, generation)
+        self._embedding_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._result_cache: "OrderedDict[Tuple[str, int, int], List[Tuple[KnowledgeEntry, float]]]" = OrderedDict()
+        self._generation = 0
+
+    @property
+    def embedder(self) -> Embedder:
+        if self._embedder is None:
+            self._embedder = create_embedder()
+        return self._embedder
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    # ------------------------------------------------------------------
+    # Loading and persistence
+    # ------------------------------------------------------------------
+
+    def load(self) -> "VectorIndex":
+        """Memory-map the persisted index and read its entries, if they exist"""
+        with self._lock:
+            if self._loaded:
+                return self
+            faiss = _faiss()
+            index_file = self.path / self.INDEX_FILE
+
+            if index_file.exists():
+                meta = json.loads((self.path / self.META_FILE).read_text())
+                if meta.get('embedder') != self.embedder.name or meta.get('dim') != self.embedder.dim:
+                    raise VectorIndexError(
+                        f"Index at {self.path} was built with {meta.get('embedder')}/{meta.get('dim')}, "
+                        f"not {self.embedder.name}/{self.embedder.dim}"
+                    )
+                try:
+                    self._main = faiss.read_index(str(index_file), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+                except RuntimeError:
+                    # Older faiss builds can only mmap IVF lists; read flat indexes normally
+                    self._main = faiss.read_index(str(index_file))
+                self._main_size = self._main.ntotal
+
+                with open(self.path / self.ENTRIES_FILE, encoding='utf-8') as f:
+                    self.entries = [KnowledgeEntry.from_dict(json.loads(line)) for line in f if line.strip()]
+                # Entries appended after the last persist() are re-embedded into the delta
+                pending = self.entries[self._main_size:]
+                self.entries = self.entries[:self._main_size]
+                self._ids = {entry.id: row for row, entry in enumerate(self.entries)}
+                logger.info(f"Loaded knowledge index with {self._main_size} entries from {self.path}")
+                self._loaded = True
+                if pending:
+                    self._add(pending, append_to_disk=False)
+            else:
+                self._loaded = True
+            return self
+
+    def persist(self):
+        """Merge the delta into the on-disk index and re-map it"""
+        with self._lock:
+            self.load()
+            if self._delta is None and self._main is not None:
+                return
+            faiss = _faiss()
+            self.path.mkdir(parents=True, exist_ok=True)
+
+            merged = faiss.IndexFlatIP(self.embedder.dim)
+            if self._main is not None and self._main_size:
+                merged.add(self._main.reconstruct_n(0, self._main_size))
+            if self._delta is not None and self._delta.ntotal:
+                merged.add(self._delta.reconstruct_n(0, self._delta.ntotal))
+
+            index_file = self.path / self.INDEX_FILE
+            tmp = index_file.with_suffix(".tmp")
+            faiss.write_index(merged, str(tmp))
+            os.replace(tmp, index_file)
+
+            entries_file = self.path / self.ENTRIES_FILE
+            tmp = entries_file.with_suffix(".tmp")
+            with open(tmp, 'w', encoding='utf-8') as f:
+                for entry in self.entries:
+                    f.write(json.dumps(entry.to_dict()) + "\n")
+            os.replace(tmp, entries_file)
+
+            (self.path / self.META_FILE).write_text(json.dumps({
+                'embedder': self.embedder.name, 'dim': self.embedder.dim, 'count': len(self.entries)
+            }))
+
+            self._main = None
+            self._delta = None
+            self._loaded = False
+            self.load()
+
+    # ------------------------------------------------------------------
+    # Adding
+    # ------------------------------------------------------------------
+
+    def build(self, entries: Iterable[KnowledgeEntry]):
+        """Replace the whole index with a new corpus and persist it"""
+        with self._lock:
+            self.entries, self._ids = [], {}
+            self._main, self._main_size, self._delta = None, 0, None
+            self._loaded = True
+            for name in (self.INDEX_FILE, self.ENTRIES_FILE, self.META_FILE):
+                (self.path / name).unlink(missing_ok=True)
+            self._add(list(entries), append_to_disk=False)
+            self.persist()
+
+    def add(self, entries: Iterable[KnowledgeEntry]) -> int:
+        """
+        Embed and add entries, skipping ids already present
+
+        Entries are appended to the on-disk entry log right away and become
+        part of the memory-mapped index on the next persist().
+
+        Returns:
+            Number of entries added
+        """
+        with self._lock:
+            self.load()
+            return self._add(list(entries), append_to_disk=True)
+
+    def _add(self, entries: List[KnowledgeEntry], append_to_disk: bool) -> int:
+        seen = set()
+        new = []
+        for entry in entries:
+            if entry.id not in self._ids and entry.id not in seen:
+                seen.add(entry.id)
+                new.append(entry)
+        if not new:
+            return 0
+
+        faiss = _faiss()
+        if self._delta is None:
+            self._delta = faiss.IndexFlatIP(self.embedder.dim)
+        for start in range(0, len(new), self.batch_size):
+            batch = new[start:start + self.batch_size]
+            self._delta.add(self.embedder.embed([entry.text for entry in batch]))
+
+        if append_to_disk:
+            self.path.mkdir(parents=True, exist_ok=True)
+            with open(self.path / self.ENTRIES_FILE, 'a', encoding='utf-8') as f:
+                for entry in new:
+                    f.write(json.dumps(entry.to_dict()) + "\n")
+
+        for entry in new:
+            self._ids[entry.id] = len(self.entries)
+            self.entries.append(entry)
+
+        self._generation += 1
+        self._result_cache.clear()
+        return len(new)
+
+    # ------------------------------------------------------------------
+    # Searching
+    # ------------------------------------------------------------------
+
+    def search_vectors(self, vectors: np.ndarray, k: int = 3) -> List[List[Tuple[KnowledgeEntry, float]]]:
+        """Top-k entries for each query vector, across the mapped index and the delta"""
+        with self._lock:
+            self.load()
+            vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, self.embedder.dim)
+            parts = []
+            if self._main is not None and self._main_size:
+                scores, rows = self._main.search(vectors, min(k, self._main_size))
+                parts.append((scores, rows))
+            if self._delta is not None and self._delta.ntotal:
+                scores, rows = self._delta.search(vectors, min(k, self._delta.ntotal))
+                parts.append((scores, rows + self._main_size))
+            if not parts:
+                return [[] for _ in range(len(vectors))]
+
+            scores = np.concatenate([p[0] for p in parts], axis=1)
+            rows = np.concatenate([p[1] for p in parts], axis=1)
+            order = np.argsort(-scores, axis=1)[:, :k]
+
+            results = []
+            for q in range(len(vectors)):
+                results.append([
+                    (self.entries[rows[q, i]], float(scores[q, i]))
+                    for i in order[q] if rows[q, i] >= 0
+                ])
+            return results
+
+    def search(self, text: str, k: int = 3) -> List[Tuple[KnowledgeEntry, float]]:
+        """Top-k entries for free text (not cached)"""
+        return self.search_vectors(self.embedder.embed([text]), k)[0]
+
+    def _query_embedding(self, key: str) -> Optional[np.ndarray]:
+        vector = self._embedding_cache.get(key)
+        record_cache_lookup('query_embedding', hit=vector is not None)
+        if vector is not None:
+            self._embedding_cache.move_to_end(key)
+        return vector
+
+    def _remember_embedding(self, key: str, vector: np.ndarray):
+        self._embedding_cache[key] = vector
+        self._embedding_cache.move_to_end(key)
+        while len(self._embedding_cache) > self.cache_size:
+            self._embedding_cache.popitem(last=False)
+
+    def query(self, class_name: str, context: Optional[str] = None, k: int = 3) -> List[Tuple[KnowledgeEntry, float]]:
+        """
+        Knowledge entries relevant to a detection
+
+        Args:
+            class_name: Detected class, e.g. "zebra"
+            context: Optional scene or behavior description
+            k: Number of entries to return
+
+        Returns:
+            (entry, cosine similarity) pairs, best first
+        """
+        key = normalize_query_key(class_name, context)
+        with self._lock:
+            result_key = (key, k, self._generation)
+            cached = self._result_cache.get(result_key)
+            if cached is not None:
+                self._result_cache.move_to_end(result_key)
+                return cached
+
+            vector = self._query_embedding(key)
+            if vector is None:
+                vector = self.embedder.embed([key.replace("|", " ")])[0]
+                self._remember_embedding(key, vector)
+
+            results = self.search_vectors(vector, k)[0]
+            self._result_cache[result_key] = results
+            while len(self._result_cache) > self.cache_size:
+                self._result_cache.popitem(last=False)
+            return results
+
+    async def query_async(self, class_name: str, context: Optional[str] = None,
+                          k: int = 3) -> List[Tuple[KnowledgeEntry, float]]:
+        """query() that embeds on a worker thread when the key is not cached yet"""
+        key = normalize_query_key(class_name, context)
+        if key in self._embedding_cache:
+            return self.query(class_name, context, k)
+        return await asyncio.to_thread(self.query, class_name, context, k)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'entries': len(self.entries),
+            'persisted': self._main_size,
+            'pending': self._delta.ntotal if self._delta is not None else 0,
+            'cached_queries': len(self._embedding_cache),
+            'path': str(self.path)
+        }
+
+
+# Global knowledge index instance (loaded on first use)
+knowledge_index = VectorIndex()
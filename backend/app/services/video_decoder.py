@@ -0,0 +1,272 @@
+"""
+Video Decoder Backends
+
+Frame sources used by VideoFrameExtractor. Both backends expose the same
+small read()/release() interface as cv2.VideoCapture:
+
+    opencv  cv2.VideoCapture, decoding every frame at the source resolution
+    ffmpeg  an ffmpeg subprocess that scales and drops frames (fps filter)
+            before anything reaches Python, writes raw BGR frames to a pipe
+            read into one reused buffer, and reconnects to live HLS streams
+
+The backend is chosen with settings.video_decoder_backend or the
+'decoder' key of the extraction config.
+"""
+
+import logging
+import subprocess
+import time
+from fractions import Fraction
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class DecoderError(Exception):
+    """Raised when a frame source cannot be opened"""
+    pass
+
+
+class FrameSource:
+    """Minimal decoder interface"""
+
+    name = "base"
+    # read() may block for long (network waits, reconnect backoff) and belongs in a worker thread
+    threaded_reads = False
+    # seek() can position reads at an arbitrary source frame
+    seekable = False
+
+    @property
+    def fps(self) -> float:
+        """Rate of the frames returned by read()"""
+        raise NotImplementedError
+
+    def read(self) -> Tuple[bool, Optional[np.ndarray]]:
+        raise NotImplementedError
+
+    def seek(self, frame_index: int) -> bool:
+        """Position the next read() at a frame of the source; False if unsupported"""
+        return False
+
+    def release(self):
+        pass
+
+
+class OpenCVSource(FrameSource):
+    """cv2.VideoCapture, optionally downscaling each decoded frame"""
+
+    name = "opencv"
+    seekable = True
+
+    def __init__(self, url: str, size: Optional[Tuple[int, int]] = None):
+        self.url = url
+        self.size = size
+        self._output_size: Optional[Tuple[int, int]] = None
+        self._cap = cv2.VideoCapture(url)
+        if not self._cap.isOpened():
+            raise DecoderError(f"Failed to open video stream: {url}")
+
+    @property
+    def fps(self) -> float:
+        return self._cap.get(cv2.CAP_PROP_FPS) or 30
+
+    def read(self) -> Tuple[bool, Optional[np.ndarray]]:
+        ret, frame = self._cap.read()
+        if ret and self.size:
+            source = (frame.shape[1], frame.shape[0])
+            if self._output_size is None:
+                self._output_size = fit_size(source, *self.size)
+            if source != self._output_size:
+                frame = cv2.resize(frame, self._output_size, interpolation=cv2.INTER_AREA)
+        return ret, frame
+
+    def seek(self, frame_index: int) -> bool:
+        return self._cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+
+    def release(self):
+        self._cap.release()
+
+
+def _even(value: float) -> int:
+    # yuv420 sources need even dimensions for scaling
+    return max(2, int(round(value / 2)) * 2)
+
+
+def fit_size(source: Tuple[int, int], width: Optional[int] = None,
+             height: Optional[int] = None) -> Tuple[int, int]:
+    """Output (width, height) keeping the aspect ratio; never upscales"""
+    src_w, src_h = source
+    scale = 1.0
+    if width:
+        scale = min(scale, width / src_w)
+    if height:
+        scale = min(scale, height / src_h)
+    return _even(src_w * scale), _even(src_h * scale)
+
+
+class FFmpegSource(FrameSource):
+    """
+    Raw BGR frames from an ffmpeg subprocess
+
+    Frames returned by read() are views of one reused buffer and are only
+    valid until the next read(); copy anything that must be kept.
+    """
+
+    name = "ffmpeg"
+    threaded_reads = True
+
+    def __init__(
+        self,
+        url: str,
+        size: Optional[Tuple[int, int]] = None,
+        output_fps: Optional[float] = None,
+        live: Optional[bool] = None,
+        threads: Optional[int] = None,
+        reconnect_attempts: Optional[int] = None,
+        ffmpeg_path: Optional[str] = None
+    ):
+        """
+        Args:
+            url: File path or http(s)/HLS URL
+            size: Maximum (width, height); the source aspect ratio is kept
+            output_fps: Frames per second ffmpeg emits (fps filter), None keeps the source rate
+            live: Reconnect when the stream ends; defaults to True for http(s) URLs
+            threads: Decoder threads, 0 lets ffmpeg decide
+            reconnect_attempts: Consecutive restarts before giving up
+            ffmpeg_path: ffmpeg binary
+        """
+        self.url = url
+        self.live = live if live is not None else url.startswith(('http://', 'https://'))
+        self.threads = threads if threads is not None else settings.ffmpeg_threads
+        self.reconnect_attempts = (reconnect_attempts if reconnect_attempts is not None
+                                   else settings.ffmpeg_reconnect_attempts)
+        self.ffmpeg_path = ffmpeg_path or settings.ffmpeg_path
+
+        source_size, source_fps = self._probe()
+        self.width, self.height = fit_size(source_size, *(size or (None, None)))
+        self.source_fps = source_fps
+        self.output_fps = output_fps if output_fps and output_fps < source_fps else None
+
+        self._frame_bytes = self.width * self.height * 3
+        self._buffer = bytearray(self._frame_bytes)
+        self._view = memoryview(self._buffer)
+        self._frame = np.frombuffer(self._buffer, dtype=np.uint8).reshape(self.height, self.width, 3)
+        self._process: Optional[subprocess.Popen] = None
+        self._failures = 0
+        self._start()
+
+    def _probe(self) -> Tuple[Tuple[int, int], float]:
+        import ffmpeg
+
+        try:
+            info = ffmpeg.probe(self.url, select_streams='v:0')
+        except ffmpeg.Error as e:
+            stderr = (e.stderr or b"").decode(errors='replace').strip()
+            raise DecoderError(f"Failed to probe video stream {self.url}: {stderr or e}")
+        streams = [s for s in info.get('streams', []) if s.get('codec_type') == 'video']
+        if not streams:
+            raise DecoderError(f"No video stream in {self.url}")
+        stream = streams[0]
+        rate = stream.get('avg_frame_rate') or stream.get('r_frame_rate') or "30/1"
+        try:
+            fps = float(Fraction(rate))
+        except (ValueError, ZeroDivisionError):
+            fps = 0.0
+        return (int(stream['width']), int(stream['height'])), fps or 30.0
+
+    def command(self):
+        cmd = [self.ffmpeg_path, '-hide_banner', '-loglevel', 'error', '-nostdin']
+        if self.live:
+            cmd += ['-reconnect', '1', '-reconnect_streamed', '1',
+                    '-reconnect_on_network_error', '1', '-reconnect_delay_max', '5']
+        cmd += ['-threads', str(self.threads), '-i', self.url, '-an', '-sn', '-dn']
+
+        filters = []
+        if self.output_fps:
+            filters.append(f"fps={self.output_fps:.6g}")
+        filters.append(f"scale={self.width}:{self.height}:flags=area")
+        cmd += ['-vf', ",".join(filters), '-pix_fmt', 'bgr24', '-f', 'rawvideo', 'pipe:1']
+        return cmd
+
+    def _start(self):
+        try:
+            self._process = subprocess.Popen(
+                self.command(), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                bufsize=self._frame_bytes * 2
+            )
+        except FileNotFoundError:
+            raise DecoderError(f"ffmpeg binary not found: {self.ffmpeg_path}")
+
+    def _stop(self):
+        process, self._process = self._process, None
+        if process is None:
+            return
+        if process.poll() is None:
+            process.kill()
+        process.stdout.close()
+        process.wait()
+
+    @property
+    def fps(self) -> float:
+        return self.output_fps or self.source_fps
+
+    def _read_into_buffer(self) -> bool:
+        stdout = self._process.stdout
+        filled = 0
+        while filled < self._frame_bytes:
+            count = stdout.readinto(self._view[filled:])
+            if not count:
+                return False
+            filled += count
+        return True
+
+    def read(self) -> Tuple[bool, Optional[np.ndarray]]:
+        while self._process is not None:
+            if self._read_into_buffer():
+                self._failures = 0
+                return True, self._frame
+
+            self._stop()
+            if not self.live or self._failures >= self.reconnect_attempts:
+                break
+            # Live streams end on playlist or network hiccups; restart at the live edge
+            self._failures += 1
+            delay = min(2 ** (self._failures - 1), 10)
+            logger.warning(f"ffmpeg stream ended, reconnecting in {delay}s "
+                           f"(attempt {self._failures}/{self.reconnect_attempts})")
+            time.sleep(delay)
+            self._start()
+        return False, None
+
+    def release(self):
+        self._stop()
+
+
+def open_source(
+    url: str,
+    backend: Optional[str] = None,
+    size: Optional[Tuple[int, int]] = None,
+    output_fps: Optional[float] = None,
+    live: Optional[bool] = None
+) -> FrameSource:
+    """
+    Open a frame source with the configured backend
+
+    Args:
+        url: File path or stream URL
+        backend: 'opencv' or 'ffmpeg', defaults to settings.video_decoder_backend
+        size: Maximum output (width, height)
+        output_fps: Desired frame rate; only the ffmpeg backend drops frames itself
+        live: Treat the source as a live stream (ffmpeg reconnects)
+    """
+    backend = (backend or settings.video_decoder_backend).lower()
+    if backend == 'opencv':
+        return OpenCVSource(url, size=size)
+    if backend == 'ffmpeg':
+        return FFmpegSource(url, size=size, output_fps=output_fps, live=live)
+    raise ValueError(f"Unknown video decoder backend: {backend}")
@@ -1,18 +1,161 @@
-import yt_dlp
 import asyncio
+import time
 from typing import Optional, Dict, Any, List
-from urllib.parse import urlparse
-import re
+from urllib.parse import urlparse, parse_qs
+from datetime import datetime
 from loguru import logger
 
-from ..models.stream import StreamMetadata, StreamInfo, StreamCategory, StreamStatus
+from ..models.stream import (
+    StreamMetadata, StreamInfo, StreamCategory, StreamStatus, StreamQuality, StreamPurpose, StreamVariant
+)
 from ..core.config import settings
+from ..core.metrics import YTDLP_EXTRACTION_DURATION, YTDLP_EXTRACTION_FAILURES
+from .category_classifier import category_classifier
+from .youtube_urls import parse_youtube_url
+
+
+def _googlevideo_param(url: Optional[str], name: str) -> Optional[str]:
+    """Read a parameter from a googlevideo URL (query string or /name/value/ path segments)"""
+    if not url:
+        return None
+    
+    parsed = urlparse(str(url))
+    values = parse_qs(parsed.query).get(name)
+    if values:
+        return values[0]
+    
+    # Manifest and live segment URLs carry their parameters as path segments
+    segments = parsed.path.split('/')
+    for idx in range(len(segments) - 1):
+        if segments[idx] == name:
+            return segments[idx + 1]
+    return None
+
+
+def hls_url_expiry(url: Optional[str]) -> Optional[datetime]:
+    """Return the expiry time of a googlevideo HLS URL, if it carries one"""
+    expire = _googlevideo_param(url, 'expire')
+    try:
+        return datetime.fromtimestamp(int(expire)) if expire else None
+    except (ValueError, OverflowError, OSError):
+        return None
+
+
+def hls_url_video_id(url: Optional[str]) -> Optional[str]:
+    """Return the YouTube video ID a googlevideo manifest or segment URL belongs to"""
+    video_id = _googlevideo_param(url, 'id')
+    # Live URLs suffix the video ID with a broadcast sequence, e.g. Ihr_nwydXi0.1
+    return video_id.split('.')[0] if video_id else None
+
+
+def is_hls_manifest_url(url: str) -> bool:
+    """Check whether a URL points at an HLS playlist rather than a media segment"""
+    parsed = urlparse(url)
+    return '/api/manifest/' in parsed.path or parsed.path.endswith('.m3u8')
+
+
+def is_hls_format(fmt: Dict[str, Any]) -> bool:
+    """Multiple ways to identify HLS formats in yt-dlp output"""
+    protocol = (fmt.get('protocol') or '').lower()
+    return ((fmt.get('ext') or '').lower() == 'm3u8' or
+            'hls' in protocol or
+            'm3u8' in (fmt.get('url') or '') or
+            'm3u8_native' in protocol)
+
+
+def select_hls_format(formats: List[Dict[str, Any]], target_height: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """
+    Pick an HLS variant
+
+    Without a target the tallest (then highest bitrate) variant wins. With a
+    target the smallest variant at least target_height tall wins, falling
+    back to the tallest one when none reaches the target.
+    """
+    if not formats:
+        return None
+
+    def rank(fmt):
+        return (fmt.get('height') or 0, fmt.get('tbr') or 0, fmt.get('quality') or 0)
+
+    if target_height:
+        sufficient = [fmt for fmt in formats if (fmt.get('height') or 0) >= target_height]
+        if sufficient:
+            return min(sufficient, key=rank)
+    return max(formats, key=rank)
+
+
+# Minimum variant height per quality; BEST always takes the tallest variant
+QUALITY_HEIGHTS = {
+    StreamQuality.LOW: 360,
+    StreamQuality.MEDIUM: 720,
+    StreamQuality.HIGH: 1080,
+    StreamQuality.BEST: None,
+}
+
+
+def default_quality(purpose: StreamPurpose) -> StreamQuality:
+    """Quality used when a consumer doesn't ask for one"""
+    if purpose == StreamPurpose.ANALYSIS:
+        try:
+            return StreamQuality(settings.frame_extraction_quality)
+        except ValueError:
+            logger.warning(f"Unknown frame_extraction_quality {settings.frame_extraction_quality!r}, using medium")
+            return StreamQuality.MEDIUM
+    if purpose == StreamPurpose.THUMBNAIL:
+        return StreamQuality.LOW
+    return StreamQuality.BEST
+
+
+def build_variant_ladder(formats: List[Dict[str, Any]]) -> List[StreamVariant]:
+    """HLS video variants from yt-dlp formats, smallest (then lowest bitrate) first"""
+    variants = []
+    for fmt in formats:
+        if not is_hls_format(fmt) or fmt.get('vcodec') == 'none' or not fmt.get('url'):
+            continue
+        variants.append(StreamVariant(
+            format_id=str(fmt.get('format_id') or ''),
+            url=fmt['url'],
+            width=fmt.get('width'),
+            height=fmt.get('height'),
+            fps=fmt.get('fps'),
+            tbr=fmt.get('tbr'),
+            vcodec=fmt.get('vcodec')
+        ))
+    variants.sort(key=lambda v: (v.height or 0, v.tbr or 0))
+    return variants
+
+
+def select_variant(
+    ladder: List[StreamVariant],
+    purpose: StreamPurpose,
+    quality: Optional[StreamQuality] = None,
+    target_height: Optional[int] = None
+) -> Optional[StreamVariant]:
+    """
+    Pick the variant for a purpose
+
+    The smallest variant at least as tall as the quality's height wins
+    (target_height overrides the quality), so analysis and thumbnails
+    download no more than they use; playback defaults to the best variant.
+    """
+    if not ladder:
+        return None
+    target = target_height or QUALITY_HEIGHTS[StreamQuality(quality or default_quality(purpose))]
+    if target:
+        for variant in ladder:
+            if (variant.height or 0) >= target:
+                return variant
+    return ladder[-1]
 
 
 class YouTubeService:
     """Service for interacting with YouTube streams using yt-dlp"""
     
     def __init__(self):
+        self.classifier = category_classifier
+        # Latest HLS variant ladder per stream ID, refreshed with every metadata extraction
+        self.variant_ladders: Dict[str, List[StreamVariant]] = {}
+        
         # Enhanced yt-dlp options based on Context7 documentation and live stream analysis
         self.ydl_opts = {
             'quiet': True,
@@ -37,6 +180,8 @@ class YouTubeService:
     
     async def get_stream_metadata(self, url: str) -> Optional[StreamMetadata]:
         """Extract metadata from a YouTube URL"""
+        start = time.perf_counter()
+        metadata = None
         try:
             # Run yt-dlp in a thread to avoid blocking
             loop = asyncio.get_event_loop()
@@ -47,9 +192,16 @@ class YouTubeService:
         except Exception as e:
             logger.error(f"Error extracting metadata from {url}: {e}")
             return None
+        finally:
+            YTDLP_EXTRACTION_DURATION.observe(time.perf_counter() - start)
+            if metadata is None:
+                YTDLP_EXTRACTION_FAILURES.inc()
     
     def _extract_metadata(self, url: str) -> Optional[StreamMetadata]:
         """Synchronous metadata extraction"""
+        # Imported on first extraction: yt-dlp is slow to import and not needed to boot the API
+        import yt_dlp
+
         try:
             with yt_dlp.YoutubeDL(self.ydl_opts) as ydl:
                 # Extract info without downloading
@@ -82,6 +234,10 @@ class YouTubeService:
                     formats=info.get('formats', [])
                 )
                 
+                metadata.variants = build_variant_ladder(info.get('formats', []))
+                if metadata.variants:
+                    self.variant_ladders[metadata.id] = metadata.variants
+                
                 # Extract HLS URL for live streams
                 hls_url = self._extract_hls_url(info)
                 if hls_url:
@@ -94,49 +250,31 @@ class YouTubeService:
                         metadata.best_video_url = best_format.get('url')
                         logger.info(f"Using best format URL: {metadata.best_video_url}")
                 
+                metadata.hls_expires_at = hls_url_expiry(metadata.best_video_url)
+                if metadata.hls_expires_at:
+                    logger.info(f"Stream URL expires at: {metadata.hls_expires_at.isoformat()}")
+                
                 return metadata
                 
         except Exception as e:
             logger.error(f"yt-dlp extraction failed for {url}: {e}")
             return None
     
-    def _extract_hls_url(self, info: Dict[str, Any]) -> Optional[str]:
-        """Extract HLS manifest URL from yt-dlp info using enhanced detection"""
-        formats = info.get('formats', [])
-        
-        # Enhanced HLS detection based on successful live stream analysis
-        hls_formats = []
-        for fmt in formats:
-            protocol = fmt.get('protocol', '').lower()
-            ext = fmt.get('ext', '').lower()
-            format_note = fmt.get('format_note', '').lower()
-            url = fmt.get('url', '')
-            
-            # Multiple ways to identify HLS formats
-            if (ext == 'm3u8' or 
-                'hls' in protocol or 
-                'm3u8' in url or 
-                'm3u8_native' in protocol):
-                hls_formats.append(fmt)
+    def _extract_hls_url(self, info: Dict[str, Any], target_height: Optional[int] = None) -> Optional[str]:
+        """
+        Extract HLS manifest URL from yt-dlp info using enhanced detection
+
+        Args:
+            info: yt-dlp info dict
+            target_height: Pick the smallest variant at least this tall instead of the tallest
+        """
+        hls_formats = [fmt for fmt in info.get('formats', []) if is_hls_format(fmt)]
         
         if hls_formats:
-            # For live streams, prefer formats with higher quality and bitrate
+            best_hls = select_hls_format(hls_formats, target_height)
             if info.get('is_live', False):
-                # Sort by height (resolution), then by total bitrate for live streams
-                best_hls = max(
-                    hls_formats, 
-                    key=lambda x: (
-                        x.get('height', 0), 
-                        x.get('tbr', 0),  # Total bitrate
-                        x.get('quality', 0)
-                    )
-                )
                 logger.info(f"Selected live HLS format: {best_hls.get('format_id')} "
                           f"({best_hls.get('height', 'N/A')}p @ {best_hls.get('tbr', 'N/A')}kbps)")
-                return best_hls.get('url')
-            
-            # For non-live content, prefer by quality
-            best_hls = max(hls_formats, key=lambda x: (x.get('height', 0), x.get('quality', 0)))
             return best_hls.get('url')
         
         # Fallback to main URL if available
@@ -146,6 +284,38 @@ class YouTubeService:
         logger.warning("No HLS formats found in stream")
         return None
     
+    def get_variant(
+        self,
+        stream_id: str,
+        purpose: StreamPurpose,
+        quality: Optional[StreamQuality] = None,
+        target_height: Optional[int] = None
+    ) -> Optional[StreamVariant]:
+        """Variant for a purpose from the stream's last extracted ladder"""
+        return select_variant(self.variant_ladders.get(stream_id, []), purpose, quality, target_height)
+    
+    def forget(self, stream_id: str):
+        self.variant_ladders.pop(stream_id, None)
+    
+    async def get_hls_url(
+        self,
+        url: str,
+        purpose: StreamPurpose = StreamPurpose.ANALYSIS,
+        quality: Optional[StreamQuality] = None,
+        target_height: Optional[int] = None
+    ) -> Optional[str]:
+        """
+        Resolve a YouTube URL to a fresh HLS variant URL for a purpose
+
+        Analysis defaults to settings.frame_extraction_quality, so it pulls
+        the smallest variant that quality needs instead of the best one.
+        """
+        metadata = await self.get_stream_metadata(url)
+        if not metadata:
+            return None
+        variant = select_variant(metadata.variants or [], purpose, quality, target_height)
+        return variant.url if variant else (str(metadata.best_video_url) if metadata.best_video_url else None)
+    
     def _get_best_format(self, formats: List[Dict]) -> Optional[Dict]:
         """Get the best overall format"""
         if not formats:
@@ -156,7 +326,7 @@ class YouTubeService:
         
         if video_formats:
             # Sort by quality (height, then quality score)
-            return max(video_formats, key=lambda x: (x.get('height', 0), x.get('quality', 0)))
+            return max(video_formats, key=lambda x: (x.get('height') or 0, x.get('quality') or 0))
         
         # If no video formats, return best audio
         audio_formats = [f for f in formats if f.get('acodec') != 'none']
@@ -194,6 +364,7 @@ class YouTubeService:
             status=status,
             uploader=metadata.uploader,
             hls_url=metadata.best_video_url,
+            hls_expires_at=metadata.hls_expires_at,
             webpage_url=metadata.webpage_url
         )
         
@@ -201,30 +372,7 @@ class YouTubeService:
     
     def _detect_category(self, title: str, description: str) -> StreamCategory:
         """Auto-detect stream category based on title and description"""
-        text = f"{title} {description}".lower()
-        
-        # Define keywords for each category
-        category_keywords = {
-            StreamCategory.SAFARI: ['safari', 'kruger', 'serengeti', 'africa', 'lion', 'elephant', 'rhino'],
-            StreamCategory.AQUARIUM: ['aquarium', 'fish', 'coral', 'reef', 'underwater', 'marine life'],
-            StreamCategory.BIRDS: ['bird', 'eagle', 'nest', 'hawk', 'owl', 'falcon', 'avian'],
-            StreamCategory.ZOO: ['zoo', 'panda', 'tiger', 'bear', 'monkey', 'giraffe'],
-            StreamCategory.MARINE: ['ocean', 'whale', 'dolphin', 'shark', 'sea', 'marine'],
-            StreamCategory.WILDLIFE: ['wildlife', 'nature', 'wild', 'forest', 'jungle'],
-            StreamCategory.CONSERVATION: ['conservation', 'rescue', 'sanctuary', 'rehabilitation']
-        }
-        
-        # Score each category
-        category_scores = {}
-        for category, keywords in category_keywords.items():
-            score = sum(1 for keyword in keywords if keyword in text)
-            if score > 0:
-                category_scores[category] = score
-        
-        # Return category with highest score, default to wildlife
-        if category_scores:
-            return max(category_scores, key=category_scores.get)
-        return StreamCategory.WILDLIFE
+        return self.classifier.classify(title, description)
     
     def _format_duration(self, duration: Optional[int]) -> Optional[str]:
         """Format duration in seconds to human readable string"""
@@ -242,30 +390,30 @@ class YouTubeService:
     
     def is_valid_youtube_url(self, url: str) -> bool:
         """Check if URL is a valid YouTube URL"""
-        youtube_patterns = [
-            r'(?:https?://)?(?:www\.)?youtube\.com/watch\?v=[\w-]+',
-            r'(?:https?://)?(?:www\.)?youtube\.com/live/[\w-]+',
-            r'(?:https?://)?youtu\.be/[\w-]+',
-            r'(?:https?://)?(?:www\.)?youtube\.com/channel/[\w-]+/live',
-            r'(?:https?://)?(?:www\.)?youtube\.com/c/[\w-]+/live',
-            r'(?:https?://)?(?:www\.)?youtube\.com/@[\w-]+/live'
-        ]
-        
-        return any(re.match(pattern, url) for pattern in youtube_patterns)
+        return parse_youtube_url(url) is not None
     
     async def get_live_streams(self, channel_urls: List[str]) -> List[StreamInfo]:
         """Get live streams from multiple channels"""
-        streams = []
+        live_metadata = []
         
         for url in channel_urls:
             try:
                 metadata = await self.get_stream_metadata(url)
                 if metadata and metadata.is_live:
-                    stream_info = await self.convert_to_stream_info(metadata)
-                    streams.append(stream_info)
+                    live_metadata.append(metadata)
             except Exception as e:
                 logger.error(f"Error processing channel {url}: {e}")
         
+        # Classify all streams in one pass
+        categories = self.classifier.classify_batch(
+            (metadata.title, metadata.description or "") for metadata in live_metadata
+        )
+        
+        streams = []
+        for metadata, category in zip(live_metadata, categories):
+            stream_info = await self.convert_to_stream_info(metadata, category)
+            streams.append(stream_info)
+        
         return streams
 
 
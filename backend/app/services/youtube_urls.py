@@ -0,0 +1,71 @@
+"""
+YouTube URL Parsing
+
+Validates YouTube URLs and extracts the canonical video or channel ID
+without any network access. Patterns are compiled once at import time.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class YouTubeURL:
+    """Canonical identity of a YouTube URL"""
+    kind: str  # 'video', 'channel', 'custom' or 'handle'
+    id: str
+
+    @property
+    def is_video(self) -> bool:
+        return self.kind == 'video'
+
+    @property
+    def key(self) -> str:
+        """Stable key for duplicate detection, e.g. 'video:Ihr_nwydXi0'"""
+        return f"{self.kind}:{self.id}"
+
+    @property
+    def canonical_url(self) -> str:
+        if self.kind == 'video':
+            return f"https://www.youtube.com/watch?v={self.id}"
+        if self.kind == 'channel':
+            return f"https://www.youtube.com/channel/{self.id}/live"
+        if self.kind == 'custom':
+            return f"https://www.youtube.com/c/{self.id}/live"
+        return f"https://www.youtube.com/@{self.id}/live"
+
+
+_PREFIX = r'^(?:https?://)?(?:(?:www|m)\.)?'
+
+# (kind, pattern) pairs; the first group of each pattern is the ID
+_YOUTUBE_PATTERNS = [
+    ('video', re.compile(_PREFIX + r'youtube\.com/watch\?(?:[^#]*&)?v=([\w-]+)', re.IGNORECASE)),
+    ('video', re.compile(_PREFIX + r'youtube\.com/live/([\w-]+)', re.IGNORECASE)),
+    ('video', re.compile(r'^(?:https?://)?youtu\.be/([\w-]+)', re.IGNORECASE)),
+    ('channel', re.compile(_PREFIX + r'youtube\.com/channel/([\w-]+)/live', re.IGNORECASE)),
+    ('custom', re.compile(_PREFIX + r'youtube\.com/c/([\w-]+)/live', re.IGNORECASE)),
+    ('handle', re.compile(_PREFIX + r'youtube\.com/@([\w.-]+)/live', re.IGNORECASE)),
+]
+
+
+def parse_youtube_url(url: str) -> Optional[YouTubeURL]:
+    """
+    Parse a YouTube URL into its canonical identity
+
+    Args:
+        url: Watch, live, short-link or channel live URL
+
+    Returns:
+        YouTubeURL, or None if the URL is not a supported YouTube URL
+    """
+    url = url.strip()
+    for kind, pattern in _YOUTUBE_PATTERNS:
+        match = pattern.match(url)
+        if match:
+            value = match.group(1)
+            # Channel names and handles are case-insensitive, video IDs are not
+            if kind in ('custom', 'handle'):
+                value = value.lower()
+            return YouTubeURL(kind=kind, id=value)
+    return None
@@ -0,0 +1,8 @@
+"""
+Offline benchmarks for the Wildlife Narration backend
+
+Run from the backend directory, e.g.:
+
+    python -m benchmarks.frame_pipeline --output bench_results/frame_pipeline.json
+    python -m benchmarks.proxy_load run --players 50 --duration 60 --spawn-server
+"""
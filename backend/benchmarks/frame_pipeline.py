@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Frame Extraction Pipeline Benchmark
+
+Measures frames/sec, CPU time per frame, peak RSS and latency percentiles
+of enhance_frame, extract_frame_features and extract_frames_from_stream
+across resolutions and configurations, using synthetic video served from
+localhost. Each case runs in a fresh process so peak RSS is per case.
+
+Usage (from the backend directory):
+    python -m benchmarks.frame_pipeline --output bench_results/$(git rev-parse --short HEAD).json
+    python -m benchmarks.frame_pipeline --compare bench_results/old.json bench_results/new.json
+    python -m benchmarks.frame_pipeline --configs raw --decoders opencv,ffmpeg
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List
+
+from benchmarks.synthetic_video import LocalMediaServer, prepare_source
+
+RESOLUTIONS = {
+    "360p": (640, 360),
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+    "2160p": (3840, 2160),
+}
+
+PIPELINE_CONFIGS = {
+    "raw": {'enhance_frames': False, 'extract_features': False},
+    "enhance": {'enhance_frames': True, 'extract_features': False},
+    "features": {'enhance_frames': False, 'extract_features': True},
+    "full": {'enhance_frames': True, 'extract_features': True},
+}
+
+# Metrics where a lower value is better, used when comparing runs
+LOWER_IS_BETTER = {'cpu_ms_per_frame', 'peak_rss_mb', 'p50_ms', 'p90_ms', 'p99_ms', 'mean_ms'}
+
+
+def summarize_latencies(samples: List[float]) -> Dict[str, float]:
+    """Latency percentiles in milliseconds from samples in seconds"""
+    if not samples:
+        return {}
+    ordered = sorted(s * 1000 for s in samples)
+    last = len(ordered) - 1
+    return {
+        'p50_ms': round(ordered[int(round(0.50 * last))], 3),
+        'p90_ms': round(ordered[int(round(0.90 * last))], 3),
+        'p99_ms': round(ordered[int(round(0.99 * last))], 3),
+        'mean_ms': round(statistics.fmean(ordered), 3),
+    }
+
+
+def _run_case(case: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one benchmark case; executed in a fresh spawned process"""
+    # The app creates working directories relative to the cwd on import
+    os.chdir(case['workdir'])
+    sys.path.insert(0, case['backend_dir'])
+
+    import cv2
+    from app.services.frame_extraction import FrameProcessor, VideoFrameExtractor
+
+    latencies: List[float] = []
+    frames = 0
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+
+    if case['kind'] in ('enhance_frame', 'extract_frame_features'):
+        cap = cv2.VideoCapture(case['source'])
+        sample_frames = []
+        while len(sample_frames) < case['frames']:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            sample_frames.append(frame)
+        cap.release()
+
+        processor = FrameProcessor()
+        operation = getattr(processor, case['kind'])
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        for frame in sample_frames:
+            start = time.perf_counter()
+            operation(frame)
+            latencies.append(time.perf_counter() - start)
+        frames = len(sample_frames)
+
+    else:
+        extractor = VideoFrameExtractor()
+        config = {
+            'interval_seconds': case['interval_seconds'],
+            'max_frames': case['frames'],
+            'save_frames': False,
+            'decoder': case['decoder'],
+            **PIPELINE_CONFIGS[case['config']]
+        }
+
+        async def consume():
+            count = 0
+            last = time.perf_counter()
+            async for _ in extractor.extract_frames_from_stream(case['source'], case['name'], config):
+                now = time.perf_counter()
+                latencies.append(now - last)
+                last = now
+                count += 1
+            return count
+
+        frames = asyncio.run(consume())
+
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    return {
+        'name': case['name'],
+        'kind': case['kind'],
+        'resolution': case['resolution'],
+        'config': case.get('config'),
+        'decoder': case.get('decoder'),
+        'frames': frames,
+        'fps': round(frames / wall, 3) if wall > 0 else 0.0,
+        'cpu_ms_per_frame': round(cpu * 1000 / frames, 3) if frames else None,
+        # ru_maxrss is reported in kilobytes on Linux and bytes on macOS
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss /
+                             (1024 * 1024 if sys.platform == 'darwin' else 1024), 1),
+        **summarize_latencies(latencies),
+    }
+
+
+def build_cases(args, sources: Dict[str, str], workdir: Path) -> List[Dict[str, Any]]:
+    backend_dir = str(Path(__file__).resolve().parent.parent)
+    cases = []
+    for label in args.resolutions:
+        common = {'resolution': label, 'source': sources[label], 'workdir': str(workdir),
+                  'backend_dir': backend_dir}
+        for kind in ('enhance_frame', 'extract_frame_features'):
+            cases.append({**common, 'name': f"{kind}/{label}", 'kind': kind, 'frames': args.micro_frames})
+        for config in args.configs:
+            for decoder in args.decoders:
+                # opencv keeps the original case names so older result files still compare
+                suffix = "" if decoder == 'opencv' else f"/{decoder}"
+                cases.append({**common, 'name': f"pipeline/{label}/{config}{suffix}", 'kind': 'pipeline',
+                              'config': config, 'decoder': decoder, 'frames': args.pipeline_frames,
+                              'interval_seconds': args.interval})
+    return cases
+
+
+def collect_metadata() -> Dict[str, Any]:
+    def git(*cmd):
+        try:
+            return subprocess.run(["git", *cmd], capture_output=True, text=True, check=True).stdout.strip()
+        except Exception:
+            return None
+
+    import cv2
+    import numpy
+
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'commit': git("rev-parse", "HEAD"),
+        'dirty': bool(git("status", "--porcelain", "--untracked-files=no")),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'opencv': cv2.__version__,
+        'numpy': numpy.__version__,
+    }
+
+
+def run(args) -> Dict[str, Any]:
+    cache_dir = Path(args.cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    workdir = Path(tempfile.mkdtemp(prefix="frame_bench_"))
+
+    paths = {}
+    for label in args.resolutions:
+        print(f"🎞️  Preparing synthetic {label} source...")
+        paths[label] = prepare_source(cache_dir, RESOLUTIONS[label], args.fps, args.duration)
+
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    with LocalMediaServer(cache_dir) as server:
+        sources = {label: server.url_for(path) for label, path in paths.items()}
+        for case in build_cases(args, sources, workdir):
+            print(f"⏱️  {case['name']}...", end=" ", flush=True)
+            with ctx.Pool(1) as pool:
+                result = pool.apply(_run_case, (case,))
+            results.append(result)
+            print(f"{result['fps']} fps, {result.get('cpu_ms_per_frame')} ms CPU/frame, "
+                  f"p99 {result.get('p99_ms')} ms, {result['peak_rss_mb']} MB peak")
+
+    return {'meta': collect_metadata(), 'args': vars(args), 'results': results}
+
+
+def compare(old_path: str, new_path: str):
+    """Print per-case metric deltas between two result files"""
+    old = {r['name']: r for r in json.loads(Path(old_path).read_text())['results']}
+    new = {r['name']: r for r in json.loads(Path(new_path).read_text())['results']}
+
+    metrics = ['fps', 'cpu_ms_per_frame', 'peak_rss_mb', 'p50_ms', 'p99_ms']
+    print(f"{'case':<40}" + "".join(f"{m:>20}" for m in metrics))
+    for name in sorted(old.keys() & new.keys()):
+        row = f"{name:<40}"
+        for metric in metrics:
+            before, after = old[name].get(metric), new[name].get(metric)
+            if not before or after is None:
+                row += f"{'n/a':>20}"
+                continue
+            change = (after - before) / before * 100
+            better = change < 0 if metric in LOWER_IS_BETTER else change > 0
+            marker = "+" if better else "-" if abs(change) >= 5 else " "
+            row += f"{after:>11.2f} ({change:+5.1f}%){marker}"
+        print(row)
+
+    for name in sorted(old.keys() ^ new.keys()):
+        print(f"{name:<40} only in {'old' if name in old else 'new'} results")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the frame extraction pipeline offline")
+    parser.add_argument("--resolutions", type=lambda s: s.split(","), default=["360p", "720p", "1080p"],
+                        help=f"Comma-separated subset of {','.join(RESOLUTIONS)}")
+    parser.add_argument("--configs", type=lambda s: s.split(","), default=list(PIPELINE_CONFIGS),
+                        help=f"Comma-separated subset of {','.join(PIPELINE_CONFIGS)}")
+    parser.add_argument("--decoders", type=lambda s: s.split(","), default=["opencv"],
+                        help="Comma-separated decoder backends for pipeline cases (opencv,ffmpeg)")
+    parser.add_argument("--fps", type=int, default=30, help="Synthetic source frame rate")
+    parser.add_argument("--duration", type=float, default=20.0, help="Synthetic source length in seconds")
+    parser.add_argument("--micro-frames", type=int, default=30, help="Frames per enhance/features case")
+    parser.add_argument("--pipeline-frames", type=int, default=30, help="Frames per pipeline case")
+    parser.add_argument("--interval", type=float, default=0.5, help="Pipeline extraction interval (seconds)")
+    parser.add_argument("--cache-dir", default=str(Path(tempfile.gettempdir()) / "wildlife_bench_media"),
+                        help="Where synthetic media is kept between runs")
+    parser.add_argument("--output", help="Write JSON results to this file")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two result files")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    unknown = [r for r in args.resolutions if r not in RESOLUTIONS] + \
+              [c for c in args.configs if c not in PIPELINE_CONFIGS]
+    if unknown:
+        sys.exit(f"Unknown resolution/config: {', '.join(unknown)}")
+
+    report = run(args)
+
+    if args.output:
+        output = Path(args.output)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, indent=2))
+        print(f"\n💾 Results saved to: {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,502 @@
+#!/usr/bin/env python3
+"""
+Video Proxy Load Test
+
+Measures how many concurrent HLS viewers one backend instance can serve
+through /api/v1/proxy/video/ and /api/v1/proxy/playlist/. It has two parts:
+
+  * a fake googlevideo origin serving a live sliding-window playlist and
+    segments with configurable latency, bandwidth and error rate
+  * a client swarm simulating N players that poll the playlist and fetch
+    new segments through the proxy
+
+Throughput, segment latency percentiles, error rates and the server's CPU
+and memory use are reported and optionally written as JSON.
+
+Usage (from the backend directory):
+    python -m benchmarks.proxy_load run --players 50 --duration 60 --spawn-server
+    python -m benchmarks.proxy_load origin --port 9100 --latency-ms 80
+    python -m benchmarks.proxy_load swarm --target http://localhost:8001 --origin http://127.0.0.1:9100
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import signal
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import quote
+
+import aiohttp
+from aiohttp import web
+
+VIDEO_ID = "LoadTest0001"
+
+
+# ---------------------------------------------------------------------------
+# Fake origin
+# ---------------------------------------------------------------------------
+
+@dataclass
+class OriginConfig:
+    segment_seconds: float = 2.0
+    segment_bytes: int = 500_000
+    window: int = 5
+    latency_ms: float = 50.0
+    jitter_ms: float = 20.0
+    bandwidth_kbps: float = 0.0  # per response, 0 = unlimited
+    error_rate: float = 0.0
+    expire_seconds: int = 6 * 3600
+
+
+class FakeOrigin:
+    """Serves a googlevideo-shaped live HLS stream"""
+
+    def __init__(self, config: OriginConfig):
+        self.config = config
+        self.started = time.time()
+        self.expire = int(self.started + config.expire_seconds)
+        self.payload = os.urandom(64 * 1024)
+        self.requests = {'manifest': 0, 'segment': 0, 'errors': 0}
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get('/api/manifest/hls_playlist/{tail:.*}', self.playlist)
+        app.router.add_route('*', '/videoplayback/{tail:.*}', self.segment)
+        return app
+
+    def manifest_url(self, base_url: str) -> str:
+        return (f"{base_url}/api/manifest/hls_playlist/expire/{self.expire}"
+                f"/id/{VIDEO_ID}.1/itag/95/source/yt_live_broadcast/file/index.m3u8")
+
+    async def _delay(self):
+        latency = self.config.latency_ms + random.uniform(-self.config.jitter_ms, self.config.jitter_ms)
+        if latency > 0:
+            await asyncio.sleep(latency / 1000)
+
+    def _fail(self) -> Optional[web.Response]:
+        if self.config.error_rate and random.random() < self.config.error_rate:
+            self.requests['errors'] += 1
+            return web.Response(status=random.choice([403, 500, 503]))
+        return None
+
+    async def playlist(self, request: web.Request) -> web.Response:
+        self.requests['manifest'] += 1
+        await self._delay()
+        failure = self._fail()
+        if failure:
+            return failure
+
+        base = f"{request.scheme}://{request.host}"
+        latest = int((time.time() - self.started) / self.config.segment_seconds)
+        first = max(0, latest - self.config.window + 1)
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:3",
+            f"#EXT-X-TARGETDURATION:{int(self.config.segment_seconds + 0.999)}",
+            f"#EXT-X-MEDIA-SEQUENCE:{first}",
+        ]
+        for sq in range(first, latest + 1):
+            lines.append(f"#EXTINF:{self.config.segment_seconds:.3f},")
+            lines.append(f"{base}/videoplayback/id/{VIDEO_ID}.1/itag/95/expire/{self.expire}/sq/{sq}/file/seg.ts")
+        return web.Response(text="\n".join(lines) + "\n", content_type="application/vnd.apple.mpegurl")
+
+    async def segment(self, request: web.Request) -> web.StreamResponse:
+        self.requests['segment'] += 1
+        await self._delay()
+        failure = self._fail()
+        if failure:
+            return failure
+
+        size = self.config.segment_bytes
+        response = web.StreamResponse(headers={'Content-Type': 'video/mp2t', 'Content-Length': str(size)})
+        await response.prepare(request)
+        if request.method == 'HEAD':
+            return response
+
+        chunk_size = len(self.payload)
+        bytes_per_second = self.config.bandwidth_kbps * 1000 / 8
+        sent = 0
+        while sent < size:
+            chunk = self.payload[:min(chunk_size, size - sent)]
+            await response.write(chunk)
+            sent += len(chunk)
+            if bytes_per_second:
+                await asyncio.sleep(len(chunk) / bytes_per_second)
+        await response.write_eof()
+        return response
+
+
+async def start_origin(config: OriginConfig, host: str, port: int):
+    origin = FakeOrigin(config)
+    runner = web.AppRunner(origin.app(), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    port = runner.addresses[0][1]
+    return origin, runner, f"http://{host}:{port}"
+
+
+# ---------------------------------------------------------------------------
+# Client swarm
+# ---------------------------------------------------------------------------
+
+@dataclass
+class SwarmStats:
+    segment_latencies: List[float] = field(default_factory=list)
+    segment_ttfb: List[float] = field(default_factory=list)
+    playlist_latencies: List[float] = field(default_factory=list)
+    bytes: int = 0
+    segments: int = 0
+    playlists: int = 0
+    errors: Dict[str, int] = field(default_factory=dict)
+
+    def error(self, kind: str):
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+
+SEGMENT_RE = re.compile(r'^(?!#)(\S+)$', re.MULTILINE)
+
+
+async def player(session: aiohttp.ClientSession, target: str, manifest_url: str,
+                 stats: SwarmStats, deadline: float, poll_seconds: float):
+    """One simulated viewer polling the playlist and fetching new segments"""
+    playlist_url = f"{target}/api/v1/proxy/video/?url={quote(manifest_url, safe='')}"
+    seen = set()
+
+    while time.monotonic() < deadline:
+        cycle_start = time.monotonic()
+        try:
+            start = time.perf_counter()
+            async with session.get(playlist_url) as response:
+                body = await response.text()
+                if response.status != 200:
+                    stats.error(f"playlist_{response.status}")
+                    await asyncio.sleep(poll_seconds)
+                    continue
+            stats.playlist_latencies.append(time.perf_counter() - start)
+            stats.playlists += 1
+
+            for segment_url in SEGMENT_RE.findall(body):
+                if segment_url in seen or time.monotonic() >= deadline:
+                    continue
+                seen.add(segment_url)
+
+                proxied = f"{target}/api/v1/proxy/video/?url={quote(segment_url, safe='')}"
+                start = time.perf_counter()
+                async with session.get(proxied) as response:
+                    received = 0
+                    first_byte = None
+                    async for chunk in response.content.iter_chunked(64 * 1024):
+                        if first_byte is None:
+                            first_byte = time.perf_counter() - start
+                        received += len(chunk)
+                if response.status != 200:
+                    stats.error(f"segment_{response.status}")
+                elif received == 0:
+                    # The proxy answers upstream failures with an empty 200 body
+                    stats.error("segment_empty")
+                else:
+                    stats.segment_latencies.append(time.perf_counter() - start)
+                    stats.segment_ttfb.append(first_byte or 0.0)
+                    stats.bytes += received
+                    stats.segments += 1
+
+        except asyncio.TimeoutError:
+            stats.error("timeout")
+        except aiohttp.ClientError as e:
+            stats.error(type(e).__name__)
+
+        await asyncio.sleep(max(0.0, poll_seconds - (time.monotonic() - cycle_start)))
+
+
+async def run_swarm(target: str, manifest_url: str, players: int, duration: float,
+                    ramp_seconds: float, poll_seconds: float) -> SwarmStats:
+    stats = SwarmStats()
+    connector = aiohttp.TCPConnector(limit=0)
+    timeout = aiohttp.ClientTimeout(total=60)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        deadline = time.monotonic() + duration
+        tasks = []
+        for i in range(players):
+            tasks.append(asyncio.create_task(player(session, target, manifest_url, stats, deadline, poll_seconds)))
+            if ramp_seconds:
+                await asyncio.sleep(ramp_seconds / players)
+        await asyncio.gather(*tasks)
+    return stats
+
+
+# ---------------------------------------------------------------------------
+# Server process sampling
+# ---------------------------------------------------------------------------
+
+class ProcessSampler:
+    """Samples CPU and RSS of a process from /proc (Linux only)"""
+
+    def __init__(self, pid: int, interval: float = 1.0):
+        self.pid = pid
+        self.interval = interval
+        self.cpu_percent: List[float] = []
+        self.rss_mb: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+        self._ticks = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+    def _cpu_seconds(self) -> Optional[float]:
+        try:
+            fields = Path(f"/proc/{self.pid}/stat").read_text().rsplit(")", 1)[1].split()
+            return (int(fields[11]) + int(fields[12])) / self._ticks
+        except (OSError, IndexError, ValueError):
+            return None
+
+    def _rss(self) -> Optional[float]:
+        try:
+            for line in Path(f"/proc/{self.pid}/status").read_text().splitlines():
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+        except OSError:
+            pass
+        return None
+
+    async def _run(self):
+        last_cpu, last_time = self._cpu_seconds(), time.monotonic()
+        while True:
+            await asyncio.sleep(self.interval)
+            cpu, now = self._cpu_seconds(), time.monotonic()
+            if cpu is not None and last_cpu is not None:
+                self.cpu_percent.append((cpu - last_cpu) / (now - last_time) * 100)
+            rss = self._rss()
+            if rss is not None:
+                self.rss_mb.append(rss)
+            last_cpu, last_time = cpu, now
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        return {
+            'cpu_percent_mean': round(statistics.fmean(self.cpu_percent), 1) if self.cpu_percent else None,
+            'cpu_percent_max': round(max(self.cpu_percent), 1) if self.cpu_percent else None,
+            'rss_mb_peak': round(max(self.rss_mb), 1) if self.rss_mb else None,
+        }
+
+
+def spawn_server(port: int, show_logs: bool = False) -> subprocess.Popen:
+    """Start the API under uvicorn without reload, from the backend directory"""
+    backend_dir = Path(__file__).resolve().parent.parent
+    env = {**os.environ, 'STREAM_REFRESH_ENABLED': 'false'}
+    output = None if show_logs else subprocess.DEVNULL
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=backend_dir, env=env, stdout=output, stderr=output
+    )
+
+
+async def wait_for_server(target: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.get(f"{target}/health") as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.25)
+    raise RuntimeError(f"Server at {target} did not become healthy")
+
+
+# ---------------------------------------------------------------------------
+# Reporting
+# ---------------------------------------------------------------------------
+
+def percentiles_ms(samples: List[float]) -> Dict[str, Optional[float]]:
+    if not samples:
+        return {'p50_ms': None, 'p99_ms': None}
+    ordered = sorted(samples)
+    last = len(ordered) - 1
+    return {
+        'p50_ms': round(ordered[int(round(0.50 * last))] * 1000, 1),
+        'p99_ms': round(ordered[int(round(0.99 * last))] * 1000, 1),
+    }
+
+
+def build_report(args, stats: SwarmStats, duration: float, server: Dict, origin: Optional[FakeOrigin]) -> Dict:
+    attempts = stats.segments + sum(v for k, v in stats.errors.items() if not k.startswith("playlist"))
+    return {
+        'players': args.players,
+        'duration_s': round(duration, 1),
+        'segments': stats.segments,
+        'playlists': stats.playlists,
+        'throughput_mbps': round(stats.bytes * 8 / duration / 1e6, 2) if duration else 0,
+        'segments_per_s': round(stats.segments / duration, 2) if duration else 0,
+        'segment_latency': percentiles_ms(stats.segment_latencies),
+        'segment_ttfb': percentiles_ms(stats.segment_ttfb),
+        'playlist_latency': percentiles_ms(stats.playlist_latencies),
+        'segment_error_rate': round(1 - stats.segments / attempts, 4) if attempts else 0.0,
+        'errors': stats.errors,
+        'server': server,
+        'origin_requests': origin.requests if origin else None,
+    }
+
+
+def print_report(report: Dict):
+    print("\n" + "=" * 60)
+    print(f"📊 PROXY LOAD TEST: {report['players']} players for {report['duration_s']}s")
+    print("=" * 60)
+    print(f"   Throughput:        {report['throughput_mbps']} Mbit/s ({report['segments_per_s']} segments/s)")
+    print(f"   Segment latency:   p50 {report['segment_latency']['p50_ms']} ms, "
+          f"p99 {report['segment_latency']['p99_ms']} ms")
+    print(f"   Segment TTFB:      p50 {report['segment_ttfb']['p50_ms']} ms, "
+          f"p99 {report['segment_ttfb']['p99_ms']} ms")
+    print(f"   Playlist latency:  p50 {report['playlist_latency']['p50_ms']} ms, "
+          f"p99 {report['playlist_latency']['p99_ms']} ms")
+    print(f"   Segment errors:    {report['segment_error_rate'] * 100:.2f}% {report['errors'] or ''}")
+    server = report['server']
+    if server:
+        print(f"   Server CPU:        mean {server.get('cpu_percent_mean')}%, max {server.get('cpu_percent_max')}%")
+        print(f"   Server RSS peak:   {server.get('rss_mb_peak')} MB")
+
+
+# ---------------------------------------------------------------------------
+# Entry points
+# ---------------------------------------------------------------------------
+
+def origin_config(args) -> OriginConfig:
+    return OriginConfig(
+        segment_seconds=args.segment_seconds,
+        segment_bytes=args.segment_kb * 1024,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        bandwidth_kbps=args.bandwidth_kbps,
+        error_rate=args.error_rate,
+    )
+
+
+async def cmd_origin(args):
+    origin, runner, base_url = await start_origin(origin_config(args), args.host, args.port)
+    print(f"🛰️  Fake origin listening on {base_url}")
+    print(f"   Manifest: {origin.manifest_url(base_url)}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+async def cmd_swarm(args, origin: Optional[FakeOrigin] = None, manifest_url: Optional[str] = None) -> Dict:
+    if manifest_url is None:
+        manifest_url = FakeOrigin(origin_config(args)).manifest_url(args.origin.rstrip("/"))
+
+    server_process = None
+    target = args.target.rstrip("/")
+    if args.spawn_server:
+        port = args.server_port
+        server_process = spawn_server(port, args.server_logs)
+        target = f"http://127.0.0.1:{port}"
+
+    try:
+        await wait_for_server(target)
+        sampler = ProcessSampler(server_process.pid if server_process else args.server_pid) \
+            if (server_process or args.server_pid) else None
+        if sampler:
+            sampler.start()
+
+        print(f"🚀 {args.players} players → {target} for {args.duration}s")
+        start = time.monotonic()
+        stats = await run_swarm(target, manifest_url, args.players, args.duration,
+                                args.ramp_seconds, args.segment_seconds)
+        elapsed = time.monotonic() - start
+
+        server = {}
+        if sampler:
+            await sampler.stop()
+            server = sampler.summary()
+    finally:
+        if server_process:
+            server_process.send_signal(signal.SIGINT)
+            try:
+                server_process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                server_process.kill()
+
+    report = build_report(args, stats, elapsed, server, origin)
+    print_report(report)
+    if args.output:
+        output = Path(args.output)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps({'args': vars(args), 'report': report}, indent=2, default=str))
+        print(f"\n💾 Results saved to: {output}")
+    return report
+
+
+async def cmd_run(args):
+    origin, runner, base_url = await start_origin(origin_config(args), args.host, args.port)
+    try:
+        await cmd_swarm(args, origin, origin.manifest_url(base_url))
+    finally:
+        await runner.cleanup()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load-test the video proxy against a fake origin")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_origin_args(p):
+        p.add_argument("--host", default="127.0.0.1", help="Origin bind address")
+        p.add_argument("--port", type=int, default=0, help="Origin port (0 = random)")
+        p.add_argument("--segment-seconds", type=float, default=2.0, help="Segment duration")
+        p.add_argument("--segment-kb", type=int, default=500, help="Segment size in KiB")
+        p.add_argument("--latency-ms", type=float, default=50.0, help="Added origin latency")
+        p.add_argument("--jitter-ms", type=float, default=20.0, help="Latency jitter (+/-)")
+        p.add_argument("--bandwidth-kbps", type=float, default=0.0, help="Per-response bandwidth cap")
+        p.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests failing")
+
+    def add_swarm_args(p):
+        p.add_argument("--target", default="http://localhost:8001", help="Backend base URL")
+        p.add_argument("--players", type=int, default=20, help="Concurrent simulated players")
+        p.add_argument("--duration", type=float, default=30.0, help="Test length in seconds")
+        p.add_argument("--ramp-seconds", type=float, default=5.0, help="Spread player start over this time")
+        p.add_argument("--spawn-server", action="store_true", help="Start the backend under uvicorn")
+        p.add_argument("--server-port", type=int, default=8011, help="Port for --spawn-server")
+        p.add_argument("--server-logs", action="store_true", help="Show the spawned server's log output")
+        p.add_argument("--server-pid", type=int, help="Sample CPU/RSS of an already running server")
+        p.add_argument("--output", help="Write JSON results to this file")
+
+    add_origin_args(sub.add_parser("origin", help="Run only the fake origin"))
+
+    swarm = sub.add_parser("swarm", help="Run only the client swarm against an existing origin")
+    add_origin_args(swarm)
+    add_swarm_args(swarm)
+    swarm.add_argument("--origin", required=True, help="Base URL of a running fake origin")
+
+    run = sub.add_parser("run", help="Run origin and swarm together")
+    add_origin_args(run)
+    add_swarm_args(run)
+
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    command = {'origin': cmd_origin, 'swarm': cmd_swarm, 'run': cmd_run}[args.command]
+    try:
+        asyncio.run(command(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Synthetic Video Sources
+
+Generates deterministic test videos locally and serves them over HTTP,
+as HLS when an ffmpeg binary is available and as a plain file otherwise,
+so benchmarks never depend on live YouTube streams.
+"""
+
+import functools
+import shutil
+import subprocess
+import sys
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+def generate_video(
+    path: Path,
+    resolution: Tuple[int, int] = (1280, 720),
+    fps: int = 30,
+    duration: float = 10.0,
+    seed: int = 0
+) -> Path:
+    """
+    Write a synthetic video with moving shapes over a textured background
+
+    Args:
+        path: Output file (.mp4 or .avi)
+        resolution: (width, height)
+        fps: Frames per second
+        duration: Length in seconds
+        seed: Random seed, so the same arguments always produce the same video
+
+    Returns:
+        The path written
+    """
+    width, height = resolution
+    rng = np.random.default_rng(seed)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    fourcc = cv2.VideoWriter_fourcc(*('mp4v' if path.suffix == '.mp4' else 'MJPG'))
+    writer = cv2.VideoWriter(str(path), fourcc, fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"Could not open video writer for {path}")
+
+    # Static textured background, like a mostly unchanging camera scene
+    background = cv2.GaussianBlur(rng.integers(0, 255, (height, width, 3), dtype=np.uint8), (0, 0), 8)
+    blobs = [
+        (rng.uniform(0, width), rng.uniform(0, height), rng.uniform(-6, 6), rng.uniform(-4, 4),
+         int(rng.integers(height // 20, height // 8)), tuple(int(c) for c in rng.integers(0, 255, 3)))
+        for _ in range(5)
+    ]
+
+    try:
+        for i in range(int(fps * duration)):
+            frame = background.copy()
+            for x, y, dx, dy, radius, color in blobs:
+                cx = int((x + dx * i) % width)
+                cy = int((y + dy * i) % height)
+                cv2.circle(frame, (cx, cy), radius, color, -1)
+            cv2.putText(frame, f"{i:06d}", (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (255, 255, 255), 2)
+            writer.write(frame)
+    finally:
+        writer.release()
+
+    return path
+
+
+def package_hls(video_path: Path, segment_seconds: int = 2) -> Optional[Path]:
+    """Segment a video into an HLS playlist with ffmpeg, if it is installed"""
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        return None
+
+    out_dir = video_path.with_suffix("")
+    out_dir.mkdir(parents=True, exist_ok=True)
+    playlist = out_dir / "index.m3u8"
+    subprocess.run(
+        [ffmpeg, "-y", "-loglevel", "error", "-i", str(video_path),
+         "-c:v", "libx264", "-preset", "veryfast", "-g", "30",
+         "-f", "hls", "-hls_time", str(segment_seconds), "-hls_playlist_type", "vod",
+         str(playlist)],
+        check=True
+    )
+    return playlist
+
+
+class LocalMediaServer:
+    """Serves a directory over HTTP on localhost from a background thread"""
+
+    def __init__(self, root: Path, port: int = 0):
+        handler = functools.partial(_QuietHandler, directory=str(root))
+        self.root = root
+        self.httpd = _QuietServer(("127.0.0.1", port), handler)
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url_for(self, path: Path) -> str:
+        return f"{self.base_url}/{path.relative_to(self.root).as_posix()}"
+
+    def __enter__(self) -> "LocalMediaServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class _QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Decoders routinely hang up mid-response once they have what they need
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    """Static file handler with single-range support, which MP4 demuxers need to seek"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_head(self):
+        range_header = self.headers.get("Range")
+        path = Path(self.translate_path(self.path))
+        if not range_header or not range_header.startswith("bytes=") or not path.is_file():
+            return super().send_head()
+
+        size = path.stat().st_size
+        start_text, _, end_text = range_header[len("bytes="):].split(",")[0].partition("-")
+        if start_text:
+            start = int(start_text)
+            end = min(int(end_text), size - 1) if end_text else size - 1
+        else:
+            start, end = max(0, size - int(end_text)), size - 1
+        if start >= size:
+            self.send_error(416, "Requested Range Not Satisfiable")
+            return None
+
+        f = open(path, "rb")
+        f.seek(start)
+        self.send_response(206)
+        self.send_header("Content-Type", self.guess_type(str(path)))
+        self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+        self._range_remaining = end - start + 1
+        return f
+
+    def copyfile(self, source, outputfile):
+        remaining = getattr(self, "_range_remaining", None)
+        if remaining is None:
+            return super().copyfile(source, outputfile)
+        while remaining > 0:
+            chunk = source.read(min(64 * 1024, remaining))
+            if not chunk:
+                break
+            outputfile.write(chunk)
+            remaining -= len(chunk)
+
+
+def prepare_source(root: Path, resolution: Tuple[int, int], fps: int, duration: float) -> Path:
+    """Generate (or reuse) a synthetic video and its HLS rendition under root"""
+    width, height = resolution
+    video = root / f"synthetic_{width}x{height}_{fps}fps_{int(duration)}s.mp4"
+    if not video.exists():
+        generate_video(video, resolution, fps, duration)
+
+    playlist = video.with_suffix("") / "index.m3u8"
+    if playlist.exists():
+        return playlist
+    return package_hls(video) or video
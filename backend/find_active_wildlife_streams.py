@@ -4,13 +4,15 @@ Find Active Wildlife Live Streams
 This script searches for currently active wildlife live streams on YouTube
 """
 
+import argparse
 import asyncio
-import yt_dlp
 import json
 from datetime import datetime
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from loguru import logger
 
+from app.services.stream_scanner import StreamScanEngine
+
 # List of popular wildlife stream channels and URLs to check
 WILDLIFE_STREAM_CANDIDATES = [
     # EXPLORE.org channels (reliable wildlife streams)
@@ -33,98 +35,36 @@ WILDLIFE_STREAM_CANDIDATES = [
 ]
 
 class LiveStreamFinder:
-    def __init__(self):
-        self.ydl_opts = {
-            'quiet': True,
-            'no_warnings': True,
-            'extract_flat': False,
-            'noplaylist': True,
-            'ignoreerrors': True,  # Don't stop on errors
-            'geo_bypass': True,
-            'extractor_args': {
-                'youtube': {
-                    'player_client': ['web', 'ios'],  # Try multiple clients
-                    'player_skip': [],
-                    'formats': ['complete'],
-                }
-            }
-        }
-    
-    async def check_stream_status(self, url: str) -> Dict[str, Any]:
-        """Check if a stream is currently live"""
-        logger.info(f"🔍 Checking: {url}")
-        
-        try:
-            loop = asyncio.get_event_loop()
-            result = await loop.run_in_executor(
-                None, self._check_stream_sync, url
-            )
-            return result
-        except Exception as e:
-            logger.error(f"❌ Error checking {url}: {e}")
-            return {
-                'url': url,
-                'status': 'error',
-                'error': str(e),
-                'is_live': False
-            }
-    
-    def _check_stream_sync(self, url: str) -> Dict[str, Any]:
-        """Synchronously check stream status"""
-        try:
-            with yt_dlp.YoutubeDL(self.ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
-                
-                if not info:
-                    return {
-                        'url': url,
-                        'status': 'no_info',
-                        'is_live': False
-                    }
-                
-                # Extract key information
-                result = {
-                    'url': url,
-                    'video_id': info.get('id', ''),
-                    'title': info.get('title', ''),
-                    'uploader': info.get('uploader', ''),
-                    'is_live': info.get('is_live', False),
-                    'live_status': info.get('live_status', 'unknown'),
-                    'concurrent_viewers': info.get('concurrent_view_count', 0),
-                    'view_count': info.get('view_count', 0),
-                    'thumbnail': info.get('thumbnail', ''),
-                    'status': 'success'
-                }
-                
-                # Check for HLS formats if live
-                if result['is_live']:
-                    formats = info.get('formats', [])
-                    hls_formats = [f for f in formats if f.get('ext') == 'm3u8' or 'hls' in f.get('protocol', '').lower()]
-                    
-                    if hls_formats:
-                        # Get best HLS format
-                        best_hls = max(hls_formats, key=lambda x: (x.get('height', 0), x.get('tbr', 0)))
-                        result['hls_url'] = best_hls.get('url')
-                        result['hls_quality'] = f"{best_hls.get('height', 'N/A')}p"
-                        result['hls_bitrate'] = best_hls.get('tbr', 'N/A')
-                
-                return result
-                
-        except Exception as e:
-            return {
-                'url': url,
-                'status': 'error',
-                'error': str(e),
-                'is_live': False
-            }
-    
-    async def find_active_streams(self, urls: List[str]) -> List[Dict[str, Any]]:
+    def __init__(
+        self,
+        concurrency: int = 4,
+        rate_per_second: float = 2.0,
+        output_path: Optional[str] = None,
+        freshness_minutes: float = 0
+    ):
+        self.engine = StreamScanEngine(
+            concurrency=concurrency,
+            rate_per_second=rate_per_second,
+            output_path=output_path,
+            freshness_seconds=freshness_minutes * 60,
+            on_result=self._log_result
+        )
+    
+    @staticmethod
+    def _log_result(result: Dict[str, Any]):
+        if result.get('status') == 'error':
+            logger.error(f"❌ Error checking {result['url']}: {result.get('error')}")
+        else:
+            logger.info(f"🔍 Checked: {result['url']} ({result.get('live_status', result.get('status'))})")
+    
+    async def find_active_streams(self, urls: List[str]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
         """Find all currently active streams from a list of URLs"""
         logger.info(f"🔍 Checking {len(urls)} potential wildlife streams...")
         
-        # Check all URLs concurrently
-        tasks = [self.check_stream_status(url) for url in urls]
-        results = await asyncio.gather(*tasks)
+        try:
+            results = await self.engine.scan(urls)
+        finally:
+            self.engine.close()
         
         # Filter for live streams
         active_streams = [r for r in results if r.get('is_live', False)]
@@ -173,16 +113,42 @@ class LiveStreamFinder:
             if result.get('error'):
                 print(f"   ❌ Error: {result['error']}")
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Find active wildlife live streams on YouTube")
+    parser.add_argument("urls", nargs="*", help="URLs to check (defaults to the built-in candidates)")
+    parser.add_argument("--urls-file", help="File with one URL per line")
+    parser.add_argument("--concurrency", type=int, default=4, help="Maximum concurrent extractions")
+    parser.add_argument("--rate", type=float, default=2.0, help="Maximum extractions started per second")
+    parser.add_argument("--jsonl", default="wildlife_scan.jsonl", help="Incremental JSONL results file")
+    parser.add_argument("--fresh-minutes", type=float, default=0,
+                        help="Reuse results from the JSONL file newer than this (resume a run)")
+    return parser.parse_args()
+
+
 async def main():
     """Main function to find active wildlife streams"""
+    args = parse_args()
+    
+    candidates = list(args.urls)
+    if args.urls_file:
+        with open(args.urls_file) as f:
+            candidates.extend(line.strip() for line in f if line.strip() and not line.startswith("#"))
+    if not candidates:
+        candidates = WILDLIFE_STREAM_CANDIDATES
+    
     print("🚀 Starting Wildlife Live Stream Finder")
     print(f"⏰ Search Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    print(f"🎯 Checking {len(WILDLIFE_STREAM_CANDIDATES)} potential streams...")
+    print(f"🎯 Checking {len(candidates)} potential streams...")
     
-    finder = LiveStreamFinder()
+    finder = LiveStreamFinder(
+        concurrency=args.concurrency,
+        rate_per_second=args.rate,
+        output_path=args.jsonl,
+        freshness_minutes=args.fresh_minutes
+    )
     
     # Find active streams
-    all_results, active_streams = await finder.find_active_streams(WILDLIFE_STREAM_CANDIDATES)
+    all_results, active_streams = await finder.find_active_streams(candidates)
     
     # Print results
     finder.print_results(all_results, active_streams)
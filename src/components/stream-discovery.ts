@@ -1,6 +1,7 @@
 import { LitElement, html, css } from 'lit';
 import { customElement, property, state } from 'lit/decorators.js';
 import type { Stream } from '../types/stream.js';
+import { apiService } from '../services/api.js';
 
 export type SortOption = 'title' | 'viewer_count' | 'category' | 'recent';
 export type ViewMode = 'grid' | 'list';
@@ -837,7 +838,7 @@ export class StreamDiscovery extends LitElement {
             >
               <img
                 class="stream-thumbnail"
-                src=${stream.thumbnail}
+                src=${apiService.getThumbnailUrl(stream)}
                 alt="Thumbnail for ${stream.title}"
                 loading="lazy"
               />
@@ -7,6 +7,7 @@ export interface StreamInfo {
   title: string;
   description: string;
   thumbnail: string;
+  thumbnail_url?: string;
   viewer_count: number;
   is_live: boolean;
   category: string;
@@ -155,6 +156,17 @@ class ApiService {
     }
   }
 
+  /**
+   * Thumbnail for a stream card, served (resized and cached) by the backend
+   */
+  getThumbnailUrl(stream: { id: string; thumbnail: string; thumbnail_url?: string },
+                  size: 'small' | 'medium' | 'large' = 'medium'): string {
+    if (!stream.thumbnail_url) {
+      return stream.thumbnail;
+    }
+    return `${this.baseUrl}${stream.thumbnail_url}?size=${size}`;
+  }
+
   /**
    * Convert backend StreamInfo to frontend Stream format
    */
@@ -164,6 +176,7 @@ class ApiService {
       title: backendStream.title,
       description: backendStream.description,
       thumbnail: backendStream.thumbnail,
+      thumbnail_url: backendStream.thumbnail_url,
       hls_url: backendStream.hls_url,
       viewer_count: backendStream.viewer_count,
       category: backendStream.category,
@@ -3,6 +3,7 @@ export interface Stream {
   title: string;
   description: string;
   thumbnail: string;
+  thumbnail_url?: string;
   hls_url: string;
   viewer_count: number;
   category: string;